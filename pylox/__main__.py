@@ -1,15 +1,107 @@
-from pylox.pylox import LoxException, LoxIntepreter
+from pylox import tracing
+from pylox.memo import MEMO_SIZE
+from pylox.pylox import ENGINES, IMAGE_SUFFIX, TARGETS, LoxIntepreter
 
 if __name__ == "__main__":
-    USAGE = """
-    pylox [script.lox]
-    """
+    import argparse
     import sys
 
-    interpreter = LoxIntepreter()
-    if len(sys.argv) == 1:
-        interpreter._run_prompt()
-    elif len(sys.argv) == 2:
-        interpreter.run_file(file=sys.argv[1])
-    else:
-        raise LoxException(USAGE)
+    if sys.argv[1:2] == ["compile"]:
+        parser = argparse.ArgumentParser(
+            prog="pylox compile",
+            description="Transpile LOX source into python or compile it into "
+            "a bytecode image",
+        )
+        parser.add_argument("script", help="LOX source file to compile")
+        parser.add_argument(
+            "-o",
+            "--output",
+            help="file to write, defaults to <script>_lox.py or <script>.loxb",
+        )
+        parser.add_argument(
+            "--target",
+            choices=TARGETS,
+            default="python",
+            help="a python module or a bytecode image that pylox runs on the VM",
+        )
+        args = parser.parse_args(sys.argv[2:])
+
+        interpreter = LoxIntepreter()
+        output = interpreter.compile_file(
+            file=args.script, output=args.output, target=args.target
+        )
+        if output is None:
+            sys.exit(1)
+        sys.exit(0)
+
+    parser = argparse.ArgumentParser(prog="pylox")
+    parser.add_argument("script", nargs="?", help="LOX source file to run")
+    parser.add_argument(
+        "--engine",
+        choices=ENGINES,
+        default="ast",
+        help="execute with the tree-walking interpreter, the bytecode VM, "
+        "the closure compiler or as transpiled python",
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="read, parse and execute the script one top level declaration "
+        "at a time instead of all at once",
+    )
+    parser.add_argument(
+        "-O",
+        dest="optimize",
+        type=int,
+        choices=(0, 1),
+        default=1,
+        help="-O0 runs the program as parsed, without the optimizer",
+    )
+    parser.add_argument(
+        "--no-memo",
+        action="store_true",
+        help="do not keep the results of pure functions",
+    )
+    parser.add_argument(
+        "--memo-size",
+        type=int,
+        default=MEMO_SIZE,
+        metavar="N",
+        help=f"results kept per pure function, {MEMO_SIZE} by default",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="always scan, parse and resolve the script instead of loading it "
+        "from, and saving it to, __loxcache__",
+    )
+    parser.add_argument(
+        "--trace",
+        metavar="CATEGORIES",
+        help="comma separated trace categories to record and print on exit: "
+        f"{', '.join(tracing.CATEGORIES)} or all, see also ${tracing.ENV_VAR}",
+    )
+    args = parser.parse_args()
+    if args.trace:
+        try:
+            tracing.enable(args.trace)
+        except tracing.TracingError as error:
+            parser.error(str(error))
+
+    interpreter = LoxIntepreter(
+        engine=args.engine,
+        optimize=bool(args.optimize),
+        memoize=not args.no_memo,
+        memo_size=args.memo_size,
+    )
+    try:
+        if args.script is None:
+            interpreter._run_prompt()
+        elif args.script.endswith(IMAGE_SUFFIX):
+            interpreter.load_compiled(path=args.script)
+        else:
+            interpreter.run_file(
+                file=args.script, stream=args.stream, cache=not args.no_cache
+            )
+    finally:
+        tracing.flush()
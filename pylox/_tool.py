@@ -27,10 +27,13 @@ def define_ast(output_dir, base_name, types, imports=None):
     source += _add_abstract_method(name="accept", class_name=base_name)
     for type_ in types:
         class_name = type_.split(":")[0].strip()
-        class_fields = type_.split(":")[1].strip()
+        class_fields, _, annotations = type_.split(":")[1].partition(";")
         source += (
             define_type(
-                parent_class_name=base_name, class_name=class_name, fields=class_fields
+                parent_class_name=base_name,
+                class_name=class_name,
+                fields=class_fields.strip(),
+                annotations=annotations.strip(),
             )
             + NEWLINE
         )
@@ -56,35 +59,38 @@ def _add_abstract_method(name, class_name):
 
 
 def create_abstract_class(name):
-    return f"class {name}:{NEWLINE}{TAB}{NEWLINE}"
+    """
+    Nodes compare and hash by identity, which is O(1). Structural
+    comparison is available through pylox.tree.ast_equal
+    """
+    source = f"class {name}:{NEWLINE}"
+    source += TAB + "__slots__ = ()" + NEWLINE
+    source += TAB + "_fields = ()" + 2 * NEWLINE
+    return source
 
 
-def define_type(parent_class_name, class_name, fields):
+def define_type(parent_class_name, class_name, fields, annotations=""):
     field_defs = [part.split() for part in fields.split(",")]
-    source = f"class {class_name}({parent_class_name}):" + 2 * NEWLINE
-    source += _add_init_method(field_defs)
+    annotation_names = [name.strip() for name in annotations.split(",") if name.strip()]
+    source = f"class {class_name}({parent_class_name}):" + NEWLINE
+    source += _add_slots(field_defs, annotation_names)
+    source += _add_init_method(field_defs, annotation_names)
     source += _add_accept_method(parent_class_name, class_name)
     source += _add_repr_method(class_name, field_defs)
-    source += _add_eq_method(class_name, field_defs)
-    source += _add_hash_method(class_name, field_defs)
     return source
 
 
-def _add_hash_method(class_name, field_defs):
-    source = TAB + "def __hash__(self):" + NEWLINE
-    return_line = 2 * TAB + "return hash(("
-    for field_def in field_defs:
-        return_line += "self.%s," % (field_def[1])
-    return_line += "))"
-    return source + return_line + 2 * NEWLINE
+def _add_slots(field_defs, annotation_names):
+    names = [field_def[1] for field_def in field_defs]
+    source = TAB + "__slots__ = " + _tuple_literal(names + annotation_names) + NEWLINE
+    source += TAB + "_fields = " + _tuple_literal(names)
+    return source + 2 * NEWLINE
 
 
-def _add_eq_method(class_name, field_defs):
-    source = TAB + "def __eq__(self, other):" + NEWLINE
-    return_line = 2 * TAB + "return isinstance(other, self.__class__)"
-    for field_def in field_defs:
-        return_line += " and self.%s==other.%s" % (field_def[1], field_def[1])
-    return source + return_line + 2 * NEWLINE
+def _tuple_literal(names):
+    if len(names) == 1:
+        return f'("{names[0]}",)'
+    return "(" + ", ".join(f'"{name}"' for name in names) + ")"
 
 
 def _add_repr_method(class_name, field_defs):
@@ -97,7 +103,7 @@ def _add_repr_method(class_name, field_defs):
     return source + return_line + 2 * NEWLINE
 
 
-def _add_init_method(field_defs):
+def _add_init_method(field_defs, annotation_names=()):
     source = (
         TAB
         + "def __init__(self, "
@@ -107,6 +113,8 @@ def _add_init_method(field_defs):
     )
     for field_def in field_defs:
         source += 2 * TAB + f"self.{field_def[1]} = {field_def[1]}" + NEWLINE
+    for name in annotation_names:
+        source += 2 * TAB + f"self.{name} = None" + NEWLINE
     source += NEWLINE
     return source
 
@@ -129,10 +137,18 @@ def generate_ast(directory):
         "Unary: Token operator, Expr right",
         "Literal: object value",
         "Logical: Token operator, Expr left, Expr right",
-        "Variable: Token name",
+        "Variable: Token name; depth, slot",
         "Grouping: Expr expression",
-        "Assign: Token assign_to, Expr to_assign",
-        "Call: Expr callee, List[Expr] arguments",
+        "Assign: Token assign_to, Expr to_assign; depth, slot",
+        "Call: Expr callee, Token paren, List[Expr] arguments; cache",
+        "Subscript: Expr object, Token bracket, Expr index",
+        "SetSubscript: Expr object, Token bracket, Expr index, Expr value",
+        "Slice: Expr object, Token bracket, Expr start, Expr stop",
+        "Map: Token brace, List[Expr] keys, List[Expr] values",
+        "Get: Expr object, Token name; cache",
+        "Set: Expr object, Token name, Expr value; cache",
+        "This: Token keyword; depth, slot",
+        "Super: Token keyword, Token method; depth, slot",
     ]
 
     define_ast(output_dir=output_dir, base_name=base_name, types=TYPES)
@@ -143,11 +159,15 @@ def generate_ast(directory):
         "Expression: Expr expression",
         "Print: Expr expression",
         "Var: Token name, Expr initialiser",
-        "Block: List[Stmt] statements",
+        "Block: List[Stmt] statements; flat",
         "If: Expr condition, Stmt then_branch, Stmt else_branch",
         "While: Expr condition, Stmt statement",
-        "Function: Token name, List[Stmt] body, List[Token] params",
-        "Return: Token keyword, Expr value",
+        "Function: Token name, List[Stmt] body, List[Token] params; pure, generator",
+        "Return: Token keyword, Expr value; tail",
+        "Yield: Token keyword, Expr value",
+        "ForIn: Token keyword, Token name, Expr iterable, Stmt body",
+        "CountedLoop: Expr condition, Stmt statement, Expr increment; step",
+        "Class: Token name, Expr superclass, List[Stmt] methods",
     ]
 
     define_ast(output_dir=output_dir, base_name=base_name, types=TYPES, imports=imports)
@@ -0,0 +1,125 @@
+"""
+The array value: a fixed length sequence of numbers in a contiguous buffer
+
+Every engine evaluates `a[i]`, `a[i] = v` and `a[start:stop]` with
+get_item, set_item and get_slice, which also index the maps of
+pylox.maps, and pylox.natives adds the whole array operations. NumPy is
+not used, the buffer is an array.array of C doubles from the standard
+library
+"""
+from array import array
+
+from pylox.callable import LoxRuntimeError
+from pylox.maps import LoxMap
+from pylox.persistent import PersistentMap, PersistentVector
+
+
+class LoxArray:
+    """
+    An array of numbers stored as C doubles
+
+    `data` is a memoryview of an array.array("d"): a slice is a view that
+    shares the elements of the array it is taken from, and whole array
+    operations loop over the buffer in C instead of in interpreted LOX
+
+    Args:
+        data (memoryview): The elements
+    """
+
+    __slots__ = ("data",)
+
+    def __init__(self, data):
+        self.data = data
+
+    @classmethod
+    def zeros(cls, length):
+        """A new array of `length` zeros"""
+        return cls(memoryview(array("d", bytes(8 * length))))
+
+    @classmethod
+    def of(cls, values):
+        """A new array holding the numbers of the iterable `values`"""
+        return cls(memoryview(array("d", values)))
+
+    def __len__(self):
+        return len(self.data)
+
+    def __iter__(self):
+        return iter(self.data)
+
+    def __str__(self):
+        return "[" + ", ".join(map(str, self.data)) + "]"
+
+    def __repr__(self):
+        return f"<array len={len(self.data)}>"
+
+
+def _position(index):
+    """Return the number `index` as a python int, negative ones count from the end"""
+    if type(index) is int:
+        return index
+    if type(index) is float and index.is_integer():
+        return int(index)
+    raise LoxRuntimeError(msg=f"Array indices should be whole numbers, not {index!r}")
+
+
+def _array(value):
+    if type(value) is not LoxArray:
+        raise LoxRuntimeError(
+            msg=f"Only arrays, maps and vectors can be subscripted, not {value!r}"
+        )
+    return value
+
+
+def get_item(collection, index):
+    """The value of `collection[index]`"""
+    kind = type(collection)
+    if kind is LoxMap or kind is PersistentMap:
+        return collection.get_item(index)
+    if kind is PersistentVector:
+        try:
+            return collection.nth(_position(index))
+        except IndexError:
+            raise LoxRuntimeError(
+                msg=f"Vector index {index} is out of range for length {len(collection)}"
+            )
+    try:
+        return _array(collection).data[_position(index)]
+    except IndexError:
+        raise LoxRuntimeError(
+            msg=f"Array index {index} is out of range for length {len(collection)}"
+        )
+
+
+def set_item(collection, index, value):
+    """Store `value` in `collection[index]` and return it"""
+    if type(collection) is LoxMap:
+        return collection.set_item(index, value)
+    if type(collection) is PersistentMap or type(collection) is PersistentVector:
+        raise LoxRuntimeError(
+            msg=f"Persistent values cannot be changed, {collection!r} needs assoc"
+        )
+    if type(value) is not int and type(value) is not float:
+        raise LoxRuntimeError(msg=f"Arrays can only hold numbers, not {value!r}")
+    try:
+        _array(collection).data[_position(index)] = value
+    except IndexError:
+        raise LoxRuntimeError(
+            msg=f"Array index {index} is out of range for length {len(collection)}"
+        )
+    return value
+
+
+def get_slice(collection, start, stop):
+    """The view `collection[start:stop]`, a missing bound is None
+
+    Bounds are clamped to the array like python slices, and the view
+    shares its elements with `collection`
+    """
+    if type(collection) is not LoxArray:
+        raise LoxRuntimeError(msg=f"Only arrays can be sliced, not {collection!r}")
+    if start is not None:
+        start = _position(start)
+    if stop is not None:
+        stop = _position(stop)
+    return LoxArray(collection.data[start:stop])
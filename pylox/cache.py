@@ -0,0 +1,128 @@
+"""
+On-disk cache of resolved programs, the `__pycache__` of pylox
+
+After a successful parse and resolve the statements, with the depth and
+slot annotations written by the resolver, are pickled into
+`__loxcache__/<script>.loxc` next to the script, or `<script>.O0.loxc`
+for programs compiled without optimizations. A cache file starts with
+MAGIC and a digest of the source text and of the pylox front end, so it
+is ignored as soon as either changes:
+
+    MAGIC (4 bytes) | sha256 digest (32 bytes) | pickled List[Stmt]
+
+Files are written to a temporary file and renamed into place, so
+concurrent runs never read a partially written cache. Caching is best
+effort: an unreadable, stale or unwritable cache falls back to the
+front end
+"""
+import hashlib
+import os
+import pathlib
+import pickle
+import tempfile
+
+MAGIC = b"LOXC"
+CACHE_DIR = "__loxcache__"
+SUFFIX = ".loxc"
+
+# The modules that define the cached form, a change to any of them
+# invalidates every cache file
+_FRONT_END = (
+    "tokens",
+    "scanner",
+    "parser",
+    "resolver",
+    "optimizer",
+    "tree",
+    "expr",
+    "stmt",
+    "values",
+    "cache",
+)
+
+# Where the modules of _FRONT_END are read from
+_PACKAGE = pathlib.Path(__file__).parent
+
+_signature = None
+
+
+def _front_end_signature():
+    global _signature
+    if _signature is None:
+        digest = hashlib.sha256(MAGIC)
+        for name in _FRONT_END:
+            digest.update((_PACKAGE / f"{name}.py").read_bytes())
+        _signature = digest.digest()
+    return _signature
+
+
+def cache_path(script, optimized=True):
+    """Return the cache file of `script`
+
+    Args:
+        script (pathlib.Path): The LOX source file
+        optimized (bool): Whether the cached program went through the optimizer
+    """
+    script = pathlib.Path(script)
+    name = script.name if optimized else script.name + ".O0"
+    return script.parent / CACHE_DIR / (name + SUFFIX)
+
+
+def source_digest(source):
+    """Return the key of `source` for the current pylox front end"""
+    digest = hashlib.sha256(_front_end_signature())
+    digest.update(source.encode("utf-8"))
+    return digest.digest()
+
+
+def load(script, source, optimized=True):
+    """Return the cached statements of `script`, or None on a cache miss
+
+    Args:
+        script (pathlib.Path): The LOX source file
+        source (str): Its current content
+        optimized (bool): Load the optimized program
+    """
+    try:
+        with open(cache_path(script, optimized), "rb") as cachefile:
+            header = cachefile.read(len(MAGIC) + 32)
+            if header != MAGIC + source_digest(source):
+                return None
+            return pickle.load(cachefile)
+    except Exception:
+        return None
+
+
+def store(script, source, statements, optimized=True):
+    """Cache the resolved `statements` of `script`
+
+    Args:
+        script (pathlib.Path): The LOX source file
+        source (str): The content `statements` were compiled from
+        statements (List[Stmt]): The resolved program
+        optimized (bool): Whether `statements` went through the optimizer
+
+    Returns:
+        bool: True when the cache file was written
+    """
+    path = cache_path(script, optimized)
+    try:
+        path.parent.mkdir(exist_ok=True)
+        data = pickle.dumps(statements, protocol=pickle.HIGHEST_PROTOCOL)
+        fd, temporary = tempfile.mkstemp(
+            prefix=path.name, suffix=".tmp", dir=path.parent
+        )
+    except (OSError, RecursionError, pickle.PicklingError):
+        return False
+    try:
+        with os.fdopen(fd, "wb") as cachefile:
+            cachefile.write(MAGIC + source_digest(source))
+            cachefile.write(data)
+        os.replace(temporary, path)
+    except OSError:
+        try:
+            os.unlink(temporary)
+        except OSError:
+            pass
+        return False
+    return True
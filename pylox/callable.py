@@ -1,5 +1,14 @@
 from typing import List
 
+from pylox import tracing
+from pylox.rope import Rope
+
+
+class LoxRuntimeError(Exception):
+    def __init__(self, token=None, msg=None):
+        self.token = token
+        self.msg = msg
+
 
 class LoxCallable:
     def __init__(self, callee):
@@ -9,6 +18,61 @@ class LoxCallable:
         raise NotImplementedError("Subclasses shlould implement this method")
 
 
-class ReturnVal(Exception):
-    def __init__(self, value):
-        self.value = value
+class TailCall:
+    """
+    The completion of a `return` of a call, which the caller of the
+    returning function makes in its place. `layout` is the inline cache
+    entry of `function`, see ExpressionInterpreter._layout
+    """
+
+    __slots__ = ("function", "layout", "arguments")
+
+    def __init__(self, function, layout, arguments):
+        self.function = function
+        self.layout = layout
+        self.arguments = arguments
+
+
+class NativeFunction(LoxCallable):
+    """
+    A python function that LOX code calls like one of its own
+
+    Python errors raised by `function` become runtime errors of the LOX
+    program. Strings kept as ropes are joined before `function` sees them,
+    so natives only get python strings. Natives are also python callables,
+    so transpiled programs call them directly
+
+    Args:
+        name (str): The global name of the function
+        function (Callable): Called with the LOX arguments
+        arity (int): The number of arguments `function` takes
+    """
+
+    def __init__(self, name, function, arity):
+        self.name = name
+        self.function = function
+        self.arity = arity
+
+    def call(self, interpreter, arguments):
+        if len(arguments) != self.arity:
+            raise LoxRuntimeError(
+                msg=f"Expected {self.arity} arguments but got {len(arguments)}"
+            )
+        if tracing.CALLS:
+            tracing.trace("calls", "call native %s args=%s", self.name, arguments)
+        arguments = [
+            str(argument) if type(argument) is Rope else argument
+            for argument in arguments
+        ]
+        try:
+            return self.function(*arguments)
+        except LoxRuntimeError:
+            raise
+        except (ArithmeticError, IndexError, TypeError, ValueError) as error:
+            raise LoxRuntimeError(msg=f"{self.name}: {error}")
+
+    def __call__(self, *arguments):
+        return self.call(None, list(arguments))
+
+    def __repr__(self):
+        return f"<native fn {self.name}>"
@@ -0,0 +1,200 @@
+"""
+Classes, instances and the shapes that lay out their fields
+
+An instance holds no dict of its fields. It points to a Shape, shared by
+every instance of its class that got the same fields in the same order,
+which maps field names to indices in the instance's `fields` list. Adding
+a field moves the instance to the next shape along a transition that is
+built once and then reused, so a million instances of a class cost a
+million small lists and a handful of shapes
+
+Since a shape belongs to one class and its fields never change, a shape
+tells everything about where a property is: its index when it is a field,
+its method otherwise. `property_cache` and `field_cache` return what the
+inline caches of Get and Set nodes keep per shape, the engines only call
+them when the shape they meet differs from the cached one
+"""
+from pylox.callable import LoxCallable, LoxRuntimeError
+
+
+class Shape:
+    """
+    The layout of the fields of instances of one class
+
+    Args:
+        klass (LoxClass): The class of the instances
+        slots (dict): Maps every field name to its index
+    """
+
+    __slots__ = ("klass", "slots", "transitions")
+
+    def __init__(self, klass, slots):
+        self.klass = klass
+        self.slots = slots
+        # field name -> the shape of instances that add that field
+        self.transitions = {}
+
+    def adding(self, name):
+        """The shape of instances of this shape once they add the field `name`"""
+        shape = self.transitions.get(name)
+        if shape is None:
+            slots = dict(self.slots)
+            slots[name] = len(slots)
+            shape = self.transitions[name] = Shape(self.klass, slots)
+        return shape
+
+    def __repr__(self):
+        return f"<shape {self.klass.name} {list(self.slots)}>"
+
+
+class LoxClass(LoxCallable):
+    """
+    A class: its methods, and the root shape of its instances
+
+    Methods are the functions of the engine that defined the class, each
+    with a `bind(instance)` method returning the function with `this` set
+    to `instance`, and the `arity` that `call` checks for the initializer.
+    They cannot change once the class is defined
+
+    Args:
+        name (str): The name of the class
+        superclass (LoxClass): The class it inherits from, or None
+        methods (dict): Maps method names to functions
+    """
+
+    def __init__(self, name, superclass, methods):
+        self.name = name
+        self.superclass = superclass
+        self.methods = methods
+        # Instances start with no fields
+        self.shape = Shape(self, {})
+        self.initializer = self.find_method("init")
+
+    def find_method(self, name):
+        """The method `name` of the class or of its closest superclass, or None"""
+        klass = self
+        while klass is not None:
+            method = klass.methods.get(name)
+            if method is not None:
+                return method
+            klass = klass.superclass
+        return None
+
+    def call(self, interpreter, arguments):
+        arity = 0 if self.initializer is None else self.initializer.arity
+        if len(arguments) != arity:
+            raise LoxRuntimeError(
+                msg=f"Expected {arity} arguments but got {len(arguments)}"
+            )
+        instance = LoxInstance(self.shape)
+        if self.initializer is not None:
+            self.initializer.bind(instance).call(interpreter, arguments)
+        return instance
+
+    def __call__(self, *arguments):
+        instance = LoxInstance(self.shape)
+        if self.initializer is not None:
+            self.initializer.bind(instance)(*arguments)
+        elif arguments:
+            raise LoxRuntimeError(msg=f"Expected 0 arguments but got {len(arguments)}")
+        return instance
+
+    def __str__(self):
+        return self.name
+
+    __repr__ = __str__
+
+
+class LoxInstance:
+    """
+    An instance of a LoxClass
+
+    Args:
+        shape (Shape): The shape of its fields, `shape.klass` is its class
+        fields (list): The field values, in the order of `shape.slots`
+    """
+
+    __slots__ = ("shape", "fields")
+
+    def __init__(self, shape, fields=None):
+        self.shape = shape
+        self.fields = [] if fields is None else fields
+
+    def __str__(self):
+        return f"{self.shape.klass.name} instance"
+
+    __repr__ = __str__
+
+
+def make_class(name, superclass, methods):
+    """The class `name`, checking that its superclass is a class"""
+    if superclass is not None and type(superclass) is not LoxClass:
+        raise LoxRuntimeError(msg="Superclass must be a class")
+    return LoxClass(name, superclass, methods)
+
+
+def property_cache(instance, name):
+    """What a Get node caches to read the property `name` of `instance`
+
+    Returns:
+        tuple: (shape, index, method), the shape of `instance` with the
+            index of the field `name`, or None and the method `name` when
+            it is not a field
+    """
+    if type(instance) is not LoxInstance:
+        raise LoxRuntimeError(msg=f"Only instances have properties, not {instance!r}")
+    shape = instance.shape
+    index = shape.slots.get(name)
+    if index is not None:
+        return (shape, index, None)
+    method = shape.klass.find_method(name)
+    if method is None:
+        raise LoxRuntimeError(msg=f"Undefined property '{name}'")
+    return (shape, None, method)
+
+
+def field_cache(instance, name):
+    """What a Set node caches to store the field `name` of `instance`
+
+    Returns:
+        tuple: (shape, index, next_shape), the shape of `instance` with the
+            index of the field `name`, and None when the instance has the
+            field already, or the shape it moves to when it adds the
+            field, whose value is then appended at `index`
+    """
+    if type(instance) is not LoxInstance:
+        raise LoxRuntimeError(msg=f"Only instances have fields, not {instance!r}")
+    shape = instance.shape
+    index = shape.slots.get(name)
+    if index is not None:
+        return (shape, index, None)
+    return (shape, len(shape.slots), shape.adding(name))
+
+
+def get_property(instance, name):
+    """The value of `instance.name`, a method comes bound to `instance`"""
+    if type(instance) is LoxInstance:
+        index = instance.shape.slots.get(name)
+        if index is not None:
+            return instance.fields[index]
+    # Not a field, so a method or an error
+    return property_cache(instance, name)[2].bind(instance)
+
+
+def set_property(instance, name, value):
+    """Store `value` in the field `name` of `instance` and return it"""
+    _, index, next_shape = field_cache(instance, name)
+    if next_shape is None:
+        instance.fields[index] = value
+    else:
+        instance.fields.append(value)
+        instance.shape = next_shape
+    return value
+
+
+def get_super(superclass, instance, name):
+    """The method `name` of `superclass`, bound to `instance`"""
+    method = superclass.find_method(name)
+    if method is None:
+        raise LoxRuntimeError(msg=f"Undefined property '{name}'")
+    return method.bind(instance)
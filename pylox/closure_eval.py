@@ -0,0 +1,849 @@
+from typing import List
+
+from pylox import tracing
+from pylox.arrays import get_item, get_slice, set_item
+from pylox.callable import LoxCallable, NativeFunction
+from pylox.classes import (
+    LoxClass,
+    LoxInstance,
+    field_cache,
+    get_super,
+    make_class,
+    property_cache,
+)
+from pylox.environment import Environment, new_frame
+from pylox.expr import Get
+from pylox.expr_eval import _COMPARE, LoxRuntimeError, _runtime_error
+from pylox.iterators import LoxGenerator, iterate
+from pylox.maps import build_map
+from pylox.natives import install as install_natives
+from pylox.rope import Rope, concat
+from pylox.stmt import Block, ForIn, If, While, Yield
+from pylox.tokens import TokenType
+from pylox.values import _is_number, _isTruthy
+from pylox.visitor import Visitor
+
+
+class ClosureFunction(LoxCallable):
+    """
+    A Lox function whose body has been compiled into Python closures
+    """
+
+    __slots__ = ("name", "params", "arity", "body", "closure")
+
+    def __init__(self, name, params, body, closure):
+        self.name = name
+        self.params = params
+        self.arity = len(params)
+        self.body = body
+        self.closure = closure
+
+    def call(self, interpreter, arguments):
+        if tracing.CALLS:
+            tracing.trace("calls", "call %s args=%s", self.name, arguments)
+        completion = self.body(new_frame(self.closure, arguments))
+        if completion is None:
+            return None
+        return completion[0]
+
+    def bind(self, instance):
+        """The method with `this`, one frame above its parameters, set to `instance`"""
+        return ClosureFunction(
+            self.name, self.params, self.body, new_frame(self.closure, [instance])
+        )
+
+    def __repr__(self):
+        return f"<fn {self.name}>"
+
+
+# Statements compiled by ClosureCompiler._suspendable in generator bodies
+_SUSPENDING = frozenset((Block, If, While, ForIn, Yield))
+
+
+def _iterate(value, token):
+    try:
+        return iterate(value)
+    except LoxRuntimeError as error:
+        error.token = token
+        raise
+
+
+def _call_value(function, values, token):
+    """Call the LOX value `function` with `values`, checking the arity of
+    LOX functions and classes"""
+    if type(function) is NativeFunction:
+        try:
+            return function.call(None, values)
+        except LoxRuntimeError as error:
+            error.token = error.token or token
+            raise
+    if type(function) is LoxClass:
+        initializer = function.initializer
+        arity = 0 if initializer is None else initializer.arity
+        if arity != len(values):
+            raise LoxRuntimeError(
+                token=token, msg=f"Expected {arity} arguments but got {len(values)}"
+            )
+        return function.call(None, values)
+    if type(function) is ClosureFunction:
+        return _call_closure(function, values, token)
+    raise LoxRuntimeError(token=token, msg="you can only call functions")
+
+
+def _call_closure(function, values, token):
+    if function.arity != len(values):
+        raise LoxRuntimeError(
+            token=token,
+            msg=f"Expected {function.arity} arguments but got {len(values)}",
+        )
+    if tracing.CALLS:
+        tracing.trace("calls", "call %s args=%s", function.name, values)
+    try:
+        completion = function.body(new_frame(function.closure, values))
+    except RecursionError:
+        raise LoxRuntimeError(token=token, msg="Stack overflow") from None
+    if completion is None:
+        return None
+    return completion[0]
+
+
+def _operands_error(operator, left):
+    return LoxRuntimeError(
+        token=operator,
+        msg=f"Operands for {operator.lexeme} should be int or float not {type(left)}",
+    )
+
+
+class ClosureCompiler(Visitor):
+    """
+    Turn resolved statements into a tree of pre-bound Python closures
+
+    Every expression becomes a callable taking the current environment and
+    returning its value. Every statement becomes a callable returning None
+    on normal completion or a one element tuple holding the value of an
+    executed `return`. Operator dispatch and the resolver's (depth, slot)
+    annotations are decided here, once, instead of on every evaluation
+
+    In the body of a generator function, statements that may `yield`
+    become python generator functions instead, see _suspendable
+    """
+
+    def __init__(self, globals_: Environment):
+        self.globals = globals_
+        self.token = None
+        # Number of enclosing blocks and functions, zero for global code
+        self.scope_depth = 0
+
+    def compile(self, statements: List["Stmt"]):
+        return self._sequence(statements)
+
+    def _compile(self, node):
+        return node.accept(self)
+
+    def _sequence(self, statements):
+        compiled = [self._compile(statement) for statement in statements]
+
+        def sequence(env):
+            for statement in compiled:
+                completion = statement(env)
+                if completion is not None:
+                    return completion
+
+        return sequence
+
+    def _getter(self, expr, name):
+        depth, slot = expr.depth, expr.slot
+        token = self.token
+
+        if depth is None:
+            globals_ = self.globals
+
+            def get_global(env):
+                try:
+                    return globals_[name]
+                except KeyError:
+                    raise LoxRuntimeError(
+                        token=token, msg=f"Token {name} is not defined"
+                    )
+
+            return get_global
+
+        if depth == 0:
+            return lambda env: env[slot]
+        if depth == 1:
+            return lambda env: env.parent[slot]
+        if depth == 2:
+            return lambda env: env.parent.parent[slot]
+
+        def get_at(env):
+            for _ in range(depth):
+                env = env.parent
+            return env[slot]
+
+        return get_at
+
+    def _setter(self, expr, name, value):
+        depth, slot = expr.depth, expr.slot
+        token = self.token
+
+        if depth is None:
+            globals_ = self.globals
+
+            def set_global(env):
+                result = value(env)
+                if name not in globals_:
+                    raise LoxRuntimeError(
+                        token=token,
+                        msg=f"Variable '{name}' is accessed but it was never defined",
+                    )
+                globals_[name] = result
+                return result
+
+            return set_global
+
+        if depth == 0:
+
+            def set_local(env):
+                env[slot] = result = value(env)
+                return result
+
+            return set_local
+
+        def set_at(env):
+            result = value(env)
+            ancestor = env
+            for _ in range(depth):
+                ancestor = ancestor.parent
+            ancestor[slot] = result
+            return result
+
+        return set_at
+
+    def visit_literal_expr(self, expr: "Expr"):
+        value = expr.value
+        return lambda env: value
+
+    def visit_grouping_expr(self, expr: "Expr"):
+        return self._compile(expr.expression)
+
+    def visit_variable_expr(self, expr: "Expr"):
+        self.token = expr.name
+        return self._getter(expr, expr.name.lexeme)
+
+    def visit_assign_expr(self, expr: "Expr"):
+        value = self._compile(expr.to_assign)
+        self.token = expr.assign_to
+        return self._setter(expr, expr.assign_to.lexeme, value)
+
+    def visit_logical_expr(self, expr: "Expr"):
+        left = self._compile(expr.left)
+        right = self._compile(expr.right)
+
+        if expr.operator == TokenType.OR:
+
+            def logical_or(env):
+                value = left(env)
+                if _isTruthy(value):
+                    return value
+                return right(env)
+
+            return logical_or
+
+        def logical_and(env):
+            value = left(env)
+            if not _isTruthy(value):
+                return value
+            return right(env)
+
+        return logical_and
+
+    def visit_unary_expr(self, expr: "Expr"):
+        right = self._compile(expr.right)
+        operator = expr.operator
+        self.token = operator
+
+        if operator.type_ == TokenType.BANG:
+            return lambda env: not _isTruthy(right(env))
+
+        def negate(env):
+            value = right(env)
+            if not _is_number(value):
+                raise LoxRuntimeError(
+                    token=operator, msg="Operand for - should be int or float"
+                )
+            return -(float(value))
+
+        return negate
+
+    def visit_binary_expr(self, expr: "Expr"):
+        left = self._compile(expr.left)
+        right = self._compile(expr.right)
+        operator = expr.operator
+        type_ = operator.type_
+        self.token = operator
+
+        if type_ == TokenType.PLUS:
+
+            def plus(env):
+                a = left(env)
+                b = right(env)
+                if isinstance(a, str):
+                    return concat(a, b)
+                if _is_number(a) and _is_number(b):
+                    return a + b
+                if type(a) is Rope:
+                    return concat(a, b)
+                raise _operands_error(operator, a)
+
+            return plus
+        if type_ == TokenType.MINUS:
+
+            def minus(env):
+                a = left(env)
+                b = right(env)
+                if _is_number(a) and _is_number(b):
+                    return float(a) - float(b)
+                raise _operands_error(operator, a)
+
+            return minus
+        if type_ == TokenType.STAR:
+
+            def star(env):
+                a = left(env)
+                b = right(env)
+                if _is_number(a) and _is_number(b):
+                    return float(a) * float(b)
+                raise _operands_error(operator, a)
+
+            return star
+        if type_ == TokenType.SLASH:
+
+            def slash(env):
+                a = left(env)
+                b = right(env)
+                if not (_is_number(a) and _is_number(b)):
+                    raise _operands_error(operator, a)
+                try:
+                    return float(a) / float(b)
+                except ZeroDivisionError:
+                    raise LoxRuntimeError(operator, msg="ZeroDivisionError")
+
+            return slash
+        if type_ == TokenType.BANG_EQUAL:
+            return lambda env: left(env) != right(env)
+        if type_ == TokenType.EQUAL_EQUAL:
+            return lambda env: left(env) == right(env)
+        if type_ == TokenType.GREATER:
+            return lambda env: left(env) > right(env)
+        if type_ == TokenType.GREATER_EQUAL:
+            return lambda env: left(env) >= right(env)
+        if type_ == TokenType.LESS:
+            return lambda env: left(env) < right(env)
+        if type_ == TokenType.LESS_EQUAL:
+            return lambda env: left(env) <= right(env)
+        raise LoxRuntimeError(token=operator, msg=f"Unknown operator {operator.lexeme}")
+
+    def visit_call_expr(self, expr: "Expr"):
+        if type(expr.callee) is Get:
+            return self._invoke(expr)
+        callee = self._compile(expr.callee)
+        arguments = [self._compile(argument) for argument in expr.arguments]
+        argc = len(arguments)
+        token = expr.paren
+
+        def call(env):
+            function = callee(env)
+            values = [argument(env) for argument in arguments]
+            if type(function) is not ClosureFunction:
+                return _call_value(function, values, token)
+            if function.arity != argc:
+                raise LoxRuntimeError(
+                    token=token,
+                    msg=f"Expected {function.arity} arguments but got {argc}",
+                )
+            if tracing.CALLS:
+                tracing.trace("calls", "call %s args=%s", function.name, values)
+            try:
+                completion = function.body(new_frame(function.closure, values))
+            except RecursionError:
+                raise LoxRuntimeError(token=token, msg="Stack overflow") from None
+            if completion is None:
+                return None
+            return completion[0]
+
+        return call
+
+    def _invoke(self, expr):
+        """Compile the call of a property, `object.name(arguments)`
+
+        Methods found in the inline cache are called with a frame holding
+        `this` made on the spot, no bound method is created
+        """
+        instance_ = self._compile(expr.callee.object)
+        arguments = [self._compile(argument) for argument in expr.arguments]
+        argc = len(arguments)
+        name = expr.callee.name.lexeme
+        token = expr.callee.name
+        cache = (None, None, None)
+
+        def invoke(env):
+            nonlocal cache
+            instance = instance_(env)
+            if type(instance) is not LoxInstance or instance.shape is not cache[0]:
+                try:
+                    cache = property_cache(instance, name)
+                except LoxRuntimeError as error:
+                    error.token = token
+                    raise
+            index = cache[1]
+            if index is not None:
+                function = instance.fields[index]
+                return _call_value(
+                    function, [argument(env) for argument in arguments], token
+                )
+            method = cache[2]
+            values = [argument(env) for argument in arguments]
+            if method.arity != argc:
+                raise LoxRuntimeError(
+                    token=token,
+                    msg=f"Expected {method.arity} arguments but got {argc}",
+                )
+            if tracing.CALLS:
+                tracing.trace("calls", "call %s args=%s", method.name, values)
+            this = new_frame(method.closure, [instance])
+            try:
+                completion = method.body(new_frame(this, values))
+            except RecursionError:
+                raise LoxRuntimeError(token=token, msg="Stack overflow") from None
+            if completion is None:
+                return None
+            return completion[0]
+
+        return invoke
+
+    def visit_get_expr(self, expr: "Expr"):
+        instance_ = self._compile(expr.object)
+        name = expr.name.lexeme
+        token = expr.name
+        # Monomorphic inline cache, see pylox.classes.property_cache. No
+        # instance has the shape None, so the first access fills it
+        cache = (None, None, None)
+
+        def get(env):
+            nonlocal cache
+            instance = instance_(env)
+            if type(instance) is not LoxInstance or instance.shape is not cache[0]:
+                try:
+                    cache = property_cache(instance, name)
+                except LoxRuntimeError as error:
+                    error.token = token
+                    raise
+            index = cache[1]
+            if index is not None:
+                return instance.fields[index]
+            return cache[2].bind(instance)
+
+        return get
+
+    def visit_set_expr(self, expr: "Expr"):
+        instance_ = self._compile(expr.object)
+        value = self._compile(expr.value)
+        name = expr.name.lexeme
+        token = expr.name
+        cache = (None, None, None)
+
+        def set_(env):
+            nonlocal cache
+            instance = instance_(env)
+            result = value(env)
+            if type(instance) is not LoxInstance or instance.shape is not cache[0]:
+                try:
+                    cache = field_cache(instance, name)
+                except LoxRuntimeError as error:
+                    error.token = token
+                    raise
+            _, index, next_shape = cache
+            if next_shape is None:
+                instance.fields[index] = result
+            else:
+                instance.fields.append(result)
+                instance.shape = next_shape
+            return result
+
+        return set_
+
+    def visit_this_expr(self, expr: "Expr"):
+        self.token = expr.keyword
+        return self._getter(expr, "this")
+
+    def visit_super_expr(self, expr: "Expr"):
+        depth, slot = expr.depth, expr.slot
+        name = expr.method.lexeme
+        token = expr.method
+
+        def super_(env):
+            # `this` is alone in the frame below the one holding `super`
+            frame = env
+            for _ in range(depth - 1):
+                frame = frame.parent
+            try:
+                return get_super(frame.parent[slot], frame[0], name)
+            except LoxRuntimeError as error:
+                error.token = token
+                raise
+
+        return super_
+
+    def visit_subscript_expr(self, expr: "Expr"):
+        collection = self._compile(expr.object)
+        index = self._compile(expr.index)
+        token = expr.bracket
+
+        def subscript(env):
+            try:
+                return get_item(collection(env), index(env))
+            except LoxRuntimeError as error:
+                error.token = error.token or token
+                raise
+
+        return subscript
+
+    def visit_setsubscript_expr(self, expr: "Expr"):
+        collection = self._compile(expr.object)
+        index = self._compile(expr.index)
+        value = self._compile(expr.value)
+        token = expr.bracket
+
+        def set_subscript(env):
+            try:
+                return set_item(collection(env), index(env), value(env))
+            except LoxRuntimeError as error:
+                error.token = error.token or token
+                raise
+
+        return set_subscript
+
+    def visit_slice_expr(self, expr: "Expr"):
+        collection = self._compile(expr.object)
+        start = stop = lambda env: None
+        if expr.start is not None:
+            start = self._compile(expr.start)
+        if expr.stop is not None:
+            stop = self._compile(expr.stop)
+        token = expr.bracket
+
+        def slice_(env):
+            try:
+                return get_slice(collection(env), start(env), stop(env))
+            except LoxRuntimeError as error:
+                error.token = error.token or token
+                raise
+
+        return slice_
+
+    def visit_map_expr(self, expr: "Expr"):
+        items = []
+        for key, value in zip(expr.keys, expr.values):
+            items.append(self._compile(key))
+            items.append(self._compile(value))
+        token = expr.brace
+
+        def map_(env):
+            try:
+                return build_map([item(env) for item in items])
+            except LoxRuntimeError as error:
+                error.token = error.token or token
+                raise
+
+        return map_
+
+    def visit_print_stmt(self, stmt: "Stmt"):
+        expression = self._compile(stmt.expression)
+
+        def print_(env):
+            print(expression(env))
+
+        return print_
+
+    def visit_expression_stmt(self, stmt: "Stmt"):
+        expression = self._compile(stmt.expression)
+
+        def expression_statement(env):
+            expression(env)
+
+        return expression_statement
+
+    def _definition(self, name, value):
+        """Return a statement that stores `value(env)` in a new variable"""
+        if self.scope_depth > 0:
+            return lambda env: env.append(value(env))
+
+        globals_ = self.globals
+
+        def define_global(env):
+            globals_[name] = value(env)
+
+        return define_global
+
+    def visit_var_stmt(self, stmt: "Stmt"):
+        if stmt.initialiser is None:
+            return self._definition(stmt.name, lambda env: None)
+        return self._definition(stmt.name, self._compile(stmt.initialiser))
+
+    def visit_block_stmt(self, stmt: "Stmt"):
+        if stmt.flat:
+            return self._sequence(stmt.statements)
+        self.scope_depth += 1
+        body = self._sequence(stmt.statements)
+        self.scope_depth -= 1
+        return lambda env: body(new_frame(env))
+
+    def visit_if_stmt(self, stmt: "Stmt"):
+        condition = self._compile(stmt.condition)
+        then_branch = self._compile(stmt.then_branch)
+        if not stmt.else_branch:
+
+            def if_(env):
+                if _isTruthy(condition(env)):
+                    return then_branch(env)
+
+            return if_
+
+        else_branch = self._compile(stmt.else_branch)
+
+        def if_else(env):
+            if _isTruthy(condition(env)):
+                return then_branch(env)
+            return else_branch(env)
+
+        return if_else
+
+    def visit_while_stmt(self, stmt: "Stmt"):
+        condition = self._compile(stmt.condition)
+        body = self._compile(stmt.statement)
+
+        def while_(env):
+            while _isTruthy(condition(env)):
+                completion = body(env)
+                if completion is not None:
+                    return completion
+
+        return while_
+
+    def visit_countedloop_stmt(self, stmt: "Stmt"):
+        condition = self._compile(stmt.condition)
+        limit = self._compile(stmt.condition.right)
+        body = self._compile(stmt.statement)
+        increment = self._compile(stmt.increment)
+        compare = _COMPARE[stmt.condition.operator.type_]
+        depth, slot = stmt.condition.left.depth, stmt.condition.left.slot
+        step = stmt.step
+
+        def counted_loop(env):
+            frame = env
+            for _ in range(depth):
+                frame = frame.parent
+            value = frame[slot]
+            if type(value) is int or type(value) is float:
+                while compare(value, limit(env)):
+                    completion = body(env)
+                    if completion is not None:
+                        return completion
+                    value = frame[slot]
+                    if type(value) is not int and type(value) is not float:
+                        # A function the body called stored something else
+                        increment(env)
+                        break
+                    value = value + step
+                    frame[slot] = value
+                else:
+                    return None
+
+            while _isTruthy(condition(env)):
+                completion = body(env)
+                if completion is not None:
+                    return completion
+                increment(env)
+
+        return counted_loop
+
+    def visit_forin_stmt(self, stmt: "Stmt"):
+        iterable = self._compile(stmt.iterable)
+        self.scope_depth += 1
+        body = self._compile(stmt.body)
+        self.scope_depth -= 1
+        token = stmt.keyword
+
+        def for_in(env):
+            for value in _iterate(iterable(env), token):
+                completion = body(new_frame(env, [value]))
+                if completion is not None:
+                    return completion
+
+        return for_in
+
+    def visit_yield_stmt(self, stmt: "Stmt"):
+        # Only reached outside of _suspendable, where the Resolver lets no
+        # `yield` through
+        raise LoxRuntimeError(
+            token=stmt.keyword, msg="Cannot yield outside of a generator"
+        )
+
+    def _suspendable_sequence(self, statements):
+        """Compile `statements` into a python generator function of the
+        environment, which yields the values of their `yield` statements
+        and returns their completion"""
+        compiled = []
+        for statement in statements:
+            if type(statement) in _SUSPENDING:
+                compiled.append((True, self._suspendable(statement)))
+            else:
+                compiled.append((False, self._compile(statement)))
+
+        def sequence(env):
+            for suspends, statement in compiled:
+                if suspends:
+                    completion = yield from statement(env)
+                else:
+                    completion = statement(env)
+                if completion is not None:
+                    return completion
+
+        return sequence
+
+    def _suspendable(self, stmt):
+        """Compile a statement of a generator body that may `yield`"""
+        kind = type(stmt)
+        if kind is Yield:
+            value = lambda env: None
+            if stmt.value is not None:
+                value = self._compile(stmt.value)
+
+            def yield_(env):
+                yield value(env)
+
+            return yield_
+        if kind is Block:
+            if stmt.flat:
+                return self._suspendable_sequence(stmt.statements)
+            self.scope_depth += 1
+            body = self._suspendable_sequence(stmt.statements)
+            self.scope_depth -= 1
+            return lambda env: body(new_frame(env))
+        if kind is If:
+            condition = self._compile(stmt.condition)
+            then_branch = self._suspendable_sequence([stmt.then_branch])
+            else_branch = self._suspendable_sequence(
+                [stmt.else_branch] if stmt.else_branch else []
+            )
+
+            def if_(env):
+                if _isTruthy(condition(env)):
+                    return (yield from then_branch(env))
+                return (yield from else_branch(env))
+
+            return if_
+        if kind is While:
+            condition = self._compile(stmt.condition)
+            body = self._suspendable_sequence([stmt.statement])
+
+            def while_(env):
+                while _isTruthy(condition(env)):
+                    completion = yield from body(env)
+                    if completion is not None:
+                        return completion
+
+            return while_
+
+        iterable = self._compile(stmt.iterable)
+        self.scope_depth += 1
+        body = self._suspendable_sequence([stmt.body])
+        self.scope_depth -= 1
+        token = stmt.keyword
+
+        def for_in(env):
+            for value in _iterate(iterable(env), token):
+                completion = yield from body(new_frame(env, [value]))
+                if completion is not None:
+                    return completion
+
+        return for_in
+
+    def visit_function_stmt(self, stmt: "Stmt"):
+        return self._definition(stmt.name.name.lexeme, self._function(stmt))
+
+    def visit_class_stmt(self, stmt: "Stmt"):
+        name = stmt.name.lexeme
+        token = stmt.name
+        superclass = None
+        if stmt.superclass is not None:
+            superclass = self._compile(stmt.superclass)
+        # The frames of `super` and `this`
+        self.scope_depth += 1
+        methods = [
+            (method.name.name.lexeme, self._function(method)) for method in stmt.methods
+        ]
+        self.scope_depth -= 1
+
+        def class_(env):
+            base = None
+            closure = env
+            if superclass is not None:
+                base = superclass(env)
+                closure = new_frame(env, [base])
+            try:
+                return make_class(
+                    name, base, {method: make(closure) for method, make in methods}
+                )
+            except LoxRuntimeError as error:
+                error.token = token
+                raise
+
+        return self._definition(name, class_)
+
+    def _function(self, stmt):
+        """Compile the function `stmt` into a maker of its ClosureFunction in
+        an environment"""
+        name = stmt.name.name.lexeme
+        params = [param.name.lexeme for param in stmt.params]
+        self.scope_depth += 1
+        if stmt.generator:
+            frames = self._suspendable_sequence(stmt.body)
+            # Calls complete at once, returning the suspended body
+            body = lambda env: (LoxGenerator(name, frames(env)),)
+        else:
+            body = self._sequence(stmt.body)
+        self.scope_depth -= 1
+        return lambda env: ClosureFunction(name, params, body, env)
+
+    def visit_return_stmt(self, stmt: "Stmt"):
+        if stmt.value is None:
+            return lambda env: (None,)
+        value = self._compile(stmt.value)
+        return lambda env: (value(env),)
+
+
+class ClosureInterpreter:
+    """
+    Execution engine that compiles every program with ClosureCompiler
+
+    It is a drop-in replacement for ExpressionInterpreter
+    """
+
+    def __init__(self):
+        self.globals = Environment()
+        self.had_runtime_error = False
+        install_natives(self.define_native)
+
+    def define_native(self, name, function, arity):
+        """See ExpressionInterpreter.define_native"""
+        self.globals.define(name, NativeFunction(name, function, arity))
+
+    def interpret(self, statements: List["Stmt"]):
+        program = ClosureCompiler(globals_=self.globals).compile(statements)
+        try:
+            program(self.globals)
+        except LoxRuntimeError as error:
+            self.had_runtime_error = True
+            line = error.token.line if error.token is not None else "?"
+            _runtime_error(error.msg, line)
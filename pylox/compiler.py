@@ -0,0 +1,591 @@
+from typing import List
+
+from pylox.resolver import CompilerError, FunctionType
+from pylox.tokens import TokenType
+from pylox.visitor import Visitor
+
+
+class OpCode:
+    """
+    Instructions understood by pylox.vm.VM
+
+    Operands follow their instruction inline in the code stream
+    """
+
+    CONSTANT = 0
+    NIL = 1
+    POP = 2
+    GET_LOCAL = 3
+    SET_LOCAL = 4
+    GET_GLOBAL = 5
+    DEFINE_GLOBAL = 6
+    SET_GLOBAL = 7
+    GET_UPVALUE = 8
+    SET_UPVALUE = 9
+    CLOSE_UPVALUE = 10
+    EQUAL = 11
+    NOT_EQUAL = 12
+    GREATER = 13
+    GREATER_EQUAL = 14
+    LESS = 15
+    LESS_EQUAL = 16
+    ADD = 17
+    SUBTRACT = 18
+    MULTIPLY = 19
+    DIVIDE = 20
+    NOT = 21
+    NEGATE = 22
+    PRINT = 23
+    JUMP = 24
+    POP_JUMP_IF_FALSE = 25
+    JUMP_IF_FALSE_OR_POP = 26
+    JUMP_IF_TRUE_OR_POP = 27
+    CALL = 28
+    CLOSURE = 29
+    RETURN = 30
+    GET_SUBSCRIPT = 31
+    SET_SUBSCRIPT = 32
+    SLICE = 33
+    BUILD_MAP = 34
+    GET_ITER = 35
+    FOR_ITER = 36
+    CLASS = 37
+    INHERIT = 38
+    METHOD = 39
+    GET_PROPERTY = 40
+    SET_PROPERTY = 41
+    GET_SUPER = 42
+
+    # Number of inline operands of every instruction, CLOSURE is followed
+    # by an extra (is_local, index) pair for each captured upvalue
+    OPERANDS = {
+        CONSTANT: 1,
+        NIL: 0,
+        POP: 0,
+        GET_LOCAL: 1,
+        SET_LOCAL: 1,
+        GET_GLOBAL: 1,
+        DEFINE_GLOBAL: 1,
+        SET_GLOBAL: 1,
+        GET_UPVALUE: 1,
+        SET_UPVALUE: 1,
+        CLOSE_UPVALUE: 0,
+        EQUAL: 0,
+        NOT_EQUAL: 0,
+        GREATER: 0,
+        GREATER_EQUAL: 0,
+        LESS: 0,
+        LESS_EQUAL: 0,
+        ADD: 0,
+        SUBTRACT: 0,
+        MULTIPLY: 0,
+        DIVIDE: 0,
+        NOT: 0,
+        NEGATE: 0,
+        PRINT: 0,
+        JUMP: 1,
+        POP_JUMP_IF_FALSE: 1,
+        JUMP_IF_FALSE_OR_POP: 1,
+        JUMP_IF_TRUE_OR_POP: 1,
+        CALL: 1,
+        CLOSURE: 1,
+        RETURN: 0,
+        GET_SUBSCRIPT: 0,
+        SET_SUBSCRIPT: 0,
+        SLICE: 0,
+        BUILD_MAP: 1,
+        GET_ITER: 0,
+        FOR_ITER: 1,
+        CLASS: 1,
+        INHERIT: 0,
+        METHOD: 1,
+        GET_PROPERTY: 1,
+        SET_PROPERTY: 1,
+        GET_SUPER: 1,
+    }
+
+    BINARY = {
+        TokenType.PLUS: ADD,
+        TokenType.MINUS: SUBTRACT,
+        TokenType.STAR: MULTIPLY,
+        TokenType.SLASH: DIVIDE,
+        TokenType.BANG_EQUAL: NOT_EQUAL,
+        TokenType.EQUAL_EQUAL: EQUAL,
+        TokenType.GREATER: GREATER,
+        TokenType.GREATER_EQUAL: GREATER_EQUAL,
+        TokenType.LESS: LESS,
+        TokenType.LESS_EQUAL: LESS_EQUAL,
+    }
+
+
+OPCODE_NAMES = {
+    value: name
+    for name, value in vars(OpCode).items()
+    if not name.startswith("_") and isinstance(value, int)
+}
+
+
+class Chunk:
+    """
+    A sequence of instructions together with its constant pool
+
+    `lines` runs parallel to `code` so that every position in the code
+    stream, operands included, can be mapped back to a source line
+    """
+
+    def __init__(self):
+        self.code = []
+        self.lines = []
+        self.constants = []
+        self._constant_index = {}
+
+    def write(self, byte: int, line: int):
+        self.code.append(byte)
+        self.lines.append(line)
+
+    def add_constant(self, value):
+        key = (type(value), value)
+        index = self._constant_index.get(key)
+        if index is None:
+            index = len(self.constants)
+            self.constants.append(value)
+            self._constant_index[key] = index
+        return index
+
+
+class CompiledFunction:
+    """
+    The compiled form of a Lox function or of the top level script
+    """
+
+    def __init__(self, name: str, arity: int = 0):
+        self.name = name
+        self.arity = arity
+        self.upvalue_count = 0
+        self.chunk = Chunk()
+
+    def __repr__(self):
+        if self.name is None:
+            return "<script>"
+        return f"<fn {self.name}>"
+
+
+class _Local:
+    __slots__ = ("name", "depth", "is_captured")
+
+    def __init__(self, name, depth):
+        self.name = name
+        self.depth = depth
+        self.is_captured = False
+
+
+class _FunctionState:
+    """
+    Book-keeping for the function that is currently being compiled
+    """
+
+    def __init__(self, enclosing, function, function_type):
+        self.enclosing = enclosing
+        self.function = function
+        self.type_ = function_type
+        # Slot zero holds the callee itself, or `this` in methods
+        name = ""
+        if function_type in (FunctionType.METHOD, FunctionType.INITIALIZER):
+            name = "this"
+        self.locals = [_Local(name=name, depth=0)]
+        self.upvalues = []
+        self.scope_depth = 0
+
+
+class Compiler(Visitor):
+    """
+    Compile a resolved list of statements into bytecode
+
+    The compiler runs after pylox.resolver.Resolver, so the program is
+    already known to be free of scoping errors. Locals are assigned stack
+    slots here and captured variables are turned into upvalues
+    """
+
+    def __init__(self):
+        self.state = None
+        self.line = 0
+
+    def compile(self, statements: List["Stmt"]):
+        self.state = _FunctionState(
+            enclosing=None,
+            function=CompiledFunction(name=None),
+            function_type=FunctionType.NONE,
+        )
+        for statement in statements:
+            self._compile(statement)
+        self._emit_return()
+        return self.state.function
+
+    def _compile(self, node):
+        node.accept(self)
+
+    def _emit(self, *codes):
+        chunk = self.state.function.chunk
+        for code in codes:
+            chunk.write(code, self.line)
+
+    def _emit_constant(self, value):
+        self._emit(OpCode.CONSTANT, self._make_constant(value))
+
+    def _make_constant(self, value):
+        return self.state.function.chunk.add_constant(value)
+
+    def _emit_jump(self, op):
+        self._emit(op, -1)
+        return len(self.state.function.chunk.code) - 1
+
+    def _patch_jump(self, position):
+        code = self.state.function.chunk.code
+        code[position] = len(code)
+
+    def _emit_return(self):
+        self._emit(OpCode.NIL, OpCode.RETURN)
+
+    def _begin_scope(self):
+        self.state.scope_depth += 1
+
+    def _end_scope(self):
+        state = self.state
+        state.scope_depth -= 1
+        while state.locals and state.locals[-1].depth > state.scope_depth:
+            if state.locals[-1].is_captured:
+                self._emit(OpCode.CLOSE_UPVALUE)
+            else:
+                self._emit(OpCode.POP)
+            state.locals.pop()
+
+    def _add_local(self, name):
+        self.state.locals.append(_Local(name=name, depth=self.state.scope_depth))
+
+    def _define_variable(self, name):
+        if self.state.scope_depth > 0:
+            self._add_local(name)
+        else:
+            self._emit(OpCode.DEFINE_GLOBAL, self._make_constant(name))
+
+    def _resolve_local(self, state, name):
+        for slot in range(len(state.locals) - 1, -1, -1):
+            if state.locals[slot].name == name:
+                return slot
+        return None
+
+    def _resolve_upvalue(self, state, name):
+        if state.enclosing is None:
+            return None
+
+        local = self._resolve_local(state.enclosing, name)
+        if local is not None:
+            state.enclosing.locals[local].is_captured = True
+            return self._add_upvalue(state, is_local=1, index=local)
+
+        upvalue = self._resolve_upvalue(state.enclosing, name)
+        if upvalue is not None:
+            return self._add_upvalue(state, is_local=0, index=upvalue)
+        return None
+
+    def _add_upvalue(self, state, is_local, index):
+        upvalue = (is_local, index)
+        if upvalue in state.upvalues:
+            return state.upvalues.index(upvalue)
+        state.upvalues.append(upvalue)
+        state.function.upvalue_count = len(state.upvalues)
+        return len(state.upvalues) - 1
+
+    def _variable_ops(self, name):
+        slot = self._resolve_local(self.state, name)
+        if slot is not None:
+            return OpCode.GET_LOCAL, OpCode.SET_LOCAL, slot
+        upvalue = self._resolve_upvalue(self.state, name)
+        if upvalue is not None:
+            return OpCode.GET_UPVALUE, OpCode.SET_UPVALUE, upvalue
+        return OpCode.GET_GLOBAL, OpCode.SET_GLOBAL, self._make_constant(name)
+
+    def visit_literal_expr(self, expr: "Expr"):
+        if expr.value is None:
+            self._emit(OpCode.NIL)
+        else:
+            self._emit_constant(expr.value)
+
+    def visit_binary_expr(self, expr: "Expr"):
+        self._compile(expr.left)
+        self._compile(expr.right)
+        self.line = expr.operator.line
+        self._emit(OpCode.BINARY[expr.operator.type_])
+
+    def visit_unary_expr(self, expr: "Expr"):
+        self._compile(expr.right)
+        self.line = expr.operator.line
+        if expr.operator.type_ == TokenType.BANG:
+            self._emit(OpCode.NOT)
+        else:
+            self._emit(OpCode.NEGATE)
+
+    def visit_grouping_expr(self, expr: "Expr"):
+        self._compile(expr.expression)
+
+    def visit_logical_expr(self, expr: "Expr"):
+        self._compile(expr.left)
+        if expr.operator == TokenType.OR:
+            end = self._emit_jump(OpCode.JUMP_IF_TRUE_OR_POP)
+        else:
+            end = self._emit_jump(OpCode.JUMP_IF_FALSE_OR_POP)
+        self._compile(expr.right)
+        self._patch_jump(end)
+
+    def visit_variable_expr(self, expr: "Expr"):
+        self.line = expr.name.line
+        get_op, _, arg = self._variable_ops(expr.name.lexeme)
+        self._emit(get_op, arg)
+
+    def visit_assign_expr(self, expr: "Expr"):
+        self._compile(expr.to_assign)
+        self.line = expr.assign_to.line
+        _, set_op, arg = self._variable_ops(expr.assign_to.lexeme)
+        self._emit(set_op, arg)
+
+    def visit_call_expr(self, expr: "Expr"):
+        self._compile(expr.callee)
+        for argument in expr.arguments:
+            self._compile(argument)
+        self.line = expr.paren.line
+        self._emit(OpCode.CALL, len(expr.arguments))
+
+    def visit_get_expr(self, expr: "Expr"):
+        self._compile(expr.object)
+        self.line = expr.name.line
+        self._emit(OpCode.GET_PROPERTY, self._make_constant(expr.name.lexeme))
+
+    def visit_set_expr(self, expr: "Expr"):
+        self._compile(expr.object)
+        self._compile(expr.value)
+        self.line = expr.name.line
+        self._emit(OpCode.SET_PROPERTY, self._make_constant(expr.name.lexeme))
+
+    def visit_this_expr(self, expr: "Expr"):
+        self.line = expr.keyword.line
+        get_op, _, arg = self._variable_ops("this")
+        self._emit(get_op, arg)
+
+    def visit_super_expr(self, expr: "Expr"):
+        self.line = expr.keyword.line
+        for name in ("this", "super"):
+            get_op, _, arg = self._variable_ops(name)
+            self._emit(get_op, arg)
+        self.line = expr.method.line
+        self._emit(OpCode.GET_SUPER, self._make_constant(expr.method.lexeme))
+
+    def visit_subscript_expr(self, expr: "Expr"):
+        self._compile(expr.object)
+        self._compile(expr.index)
+        self.line = expr.bracket.line
+        self._emit(OpCode.GET_SUBSCRIPT)
+
+    def visit_setsubscript_expr(self, expr: "Expr"):
+        self._compile(expr.object)
+        self._compile(expr.index)
+        self._compile(expr.value)
+        self.line = expr.bracket.line
+        self._emit(OpCode.SET_SUBSCRIPT)
+
+    def visit_slice_expr(self, expr: "Expr"):
+        self._compile(expr.object)
+        for bound in (expr.start, expr.stop):
+            if bound is None:
+                self._emit(OpCode.NIL)
+            else:
+                self._compile(bound)
+        self.line = expr.bracket.line
+        self._emit(OpCode.SLICE)
+
+    def visit_map_expr(self, expr: "Expr"):
+        for key, value in zip(expr.keys, expr.values):
+            self._compile(key)
+            self._compile(value)
+        self.line = expr.brace.line
+        self._emit(OpCode.BUILD_MAP, len(expr.keys))
+
+    def visit_print_stmt(self, stmt: "Stmt"):
+        self._compile(stmt.expression)
+        self._emit(OpCode.PRINT)
+
+    def visit_expression_stmt(self, stmt: "Stmt"):
+        self._compile(stmt.expression)
+        self._emit(OpCode.POP)
+
+    def visit_var_stmt(self, stmt: "Stmt"):
+        if stmt.initialiser is None:
+            self._emit(OpCode.NIL)
+        else:
+            self._compile(stmt.initialiser)
+        self._define_variable(stmt.name)
+
+    def visit_block_stmt(self, stmt: "Stmt"):
+        self._begin_scope()
+        for statement in stmt.statements:
+            self._compile(statement)
+        self._end_scope()
+
+    def visit_if_stmt(self, stmt: "Stmt"):
+        self._compile(stmt.condition)
+        else_jump = self._emit_jump(OpCode.POP_JUMP_IF_FALSE)
+        self._compile(stmt.then_branch)
+        if stmt.else_branch:
+            end_jump = self._emit_jump(OpCode.JUMP)
+            self._patch_jump(else_jump)
+            self._compile(stmt.else_branch)
+            self._patch_jump(end_jump)
+        else:
+            self._patch_jump(else_jump)
+
+    def visit_while_stmt(self, stmt: "Stmt"):
+        loop_start = len(self.state.function.chunk.code)
+        self._compile(stmt.condition)
+        exit_jump = self._emit_jump(OpCode.POP_JUMP_IF_FALSE)
+        self._compile(stmt.statement)
+        self._emit(OpCode.JUMP, loop_start)
+        self._patch_jump(exit_jump)
+
+    def visit_countedloop_stmt(self, stmt: "Stmt"):
+        loop_start = len(self.state.function.chunk.code)
+        self._compile(stmt.condition)
+        exit_jump = self._emit_jump(OpCode.POP_JUMP_IF_FALSE)
+        self._compile(stmt.statement)
+        self._compile(stmt.increment)
+        self._emit(OpCode.POP)
+        self._emit(OpCode.JUMP, loop_start)
+        self._patch_jump(exit_jump)
+
+    def visit_forin_stmt(self, stmt: "Stmt"):
+        self._compile(stmt.iterable)
+        self.line = stmt.keyword.line
+        self._emit(OpCode.GET_ITER)
+        # The iterator stays on the stack as a local nothing can name
+        self._begin_scope()
+        self._add_local("")
+        loop_start = len(self.state.function.chunk.code)
+        exit_jump = self._emit_jump(OpCode.FOR_ITER)
+        # FOR_ITER pushes the value, the loop variable of a new scope
+        self._begin_scope()
+        self._add_local(stmt.name.lexeme)
+        self._compile(stmt.body)
+        self._end_scope()
+        self._emit(OpCode.JUMP, loop_start)
+        self._patch_jump(exit_jump)
+        self._end_scope()
+
+    def visit_yield_stmt(self, stmt: "Stmt"):
+        raise CompilerError("Generators are not supported by the vm engine")
+
+    def visit_function_stmt(self, stmt: "Stmt"):
+        name = stmt.name.name.lexeme
+        self.line = stmt.name.name.line
+        if self.state.scope_depth > 0:
+            # Declare the local before compiling the body so that the
+            # function can refer to itself recursively
+            self._add_local(name)
+            self._function(stmt)
+        else:
+            self._function(stmt)
+            self._define_variable(name)
+
+    def visit_class_stmt(self, stmt: "Stmt"):
+        name = stmt.name.lexeme
+        self.line = stmt.name.line
+        self._emit(OpCode.CLASS, self._make_constant(name))
+        self._define_variable(name)
+        get_op, _, arg = self._variable_ops(name)
+        if stmt.superclass is not None:
+            # The superclass stays on the stack as the local `super` of a
+            # scope around the methods, which capture it
+            self._begin_scope()
+            self._compile(stmt.superclass)
+            self._add_local("super")
+            self.line = stmt.name.line
+            self._emit(get_op, arg, OpCode.INHERIT)
+        self._emit(get_op, arg)
+        for method in stmt.methods:
+            function_type = FunctionType.METHOD
+            if method.name.name.lexeme == "init":
+                function_type = FunctionType.INITIALIZER
+            self._function(method, function_type)
+            self._emit(OpCode.METHOD, self._make_constant(method.name.name.lexeme))
+        self._emit(OpCode.POP)
+        if stmt.superclass is not None:
+            self._end_scope()
+
+    def _function(self, stmt: "Stmt", function_type=FunctionType.FUNCTION):
+        name = stmt.name.name.lexeme
+        if stmt.generator:
+            raise CompilerError(
+                f"Generator '{name}' is not supported by the vm engine, "
+                "run it with --engine ast, closure or python"
+            )
+        function = CompiledFunction(name=name, arity=len(stmt.params))
+        self.state = _FunctionState(
+            enclosing=self.state,
+            function=function,
+            function_type=function_type,
+        )
+        self._begin_scope()
+        for param in stmt.params:
+            self._add_local(param.name.lexeme)
+        for statement in stmt.body:
+            self._compile(statement)
+        self._emit_return()
+
+        upvalues = self.state.upvalues
+        self.state = self.state.enclosing
+        self._emit(OpCode.CLOSURE, self._make_constant(function))
+        for is_local, index in upvalues:
+            self._emit(is_local, index)
+
+    def visit_return_stmt(self, stmt: "Stmt"):
+        if self.state.type_ is FunctionType.NONE:
+            raise CompilerError("Cannot return outside of a function")
+        self.line = stmt.keyword.line
+        if stmt.value is None:
+            self._emit(OpCode.NIL)
+        else:
+            self._compile(stmt.value)
+        self._emit(OpCode.RETURN)
+
+
+def disassemble(function: CompiledFunction):
+    """
+    Return a human readable listing of the instructions in `function`
+    """
+    chunk = function.chunk
+    lines = [f"== {function!r} =="]
+    offset = 0
+    while offset < len(chunk.code):
+        op = chunk.code[offset]
+        operands = chunk.code[offset + 1 : offset + 1 + OpCode.OPERANDS[op]]
+        text = f"{offset:04d} {chunk.lines[offset]:4d} {OPCODE_NAMES[op]:<20}"
+        if op in (
+            OpCode.CONSTANT,
+            OpCode.GET_GLOBAL,
+            OpCode.DEFINE_GLOBAL,
+            OpCode.SET_GLOBAL,
+            OpCode.CLOSURE,
+            OpCode.CLASS,
+            OpCode.METHOD,
+            OpCode.GET_PROPERTY,
+            OpCode.SET_PROPERTY,
+            OpCode.GET_SUPER,
+        ):
+            text += f" {operands[0]} ({chunk.constants[operands[0]]!r})"
+        elif operands:
+            text += " " + " ".join(str(operand) for operand in operands)
+        offset += 1 + len(operands)
+        if op == OpCode.CLOSURE:
+            captured = chunk.constants[operands[0]].upvalue_count
+            pairs = chunk.code[offset : offset + 2 * captured]
+            text += " " + str(list(zip(pairs[::2], pairs[1::2])))
+            offset += 2 * captured
+        lines.append(text)
+    return "\n".join(lines)
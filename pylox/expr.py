@@ -1,14 +1,20 @@
 # This file was autogenerated by pylox
-# on June 22, 2022 11:43:26
+# on October 18, 2026 22:29:08
 from pylox.scanner import LoxToken as Token
 
 
 class Expr:
+    __slots__ = ()
+    _fields = ()
+
     def accept(self, visitor: "ExprVisitor"):
         raise NotImplementedError("Subclasses should implement this method")
 
 
 class Binary(Expr):
+    __slots__ = ("left", "operator", "right")
+    _fields = ("left", "operator", "right")
+
     def __init__(self, left: "Expr", operator: "Token", right: "Expr"):
         self.left = left
         self.operator = operator
@@ -20,25 +26,11 @@ class Binary(Expr):
     def __repr__(self):
         return f"{self.__class__.__name__}(left={self.left}, operator={self.operator}, right={self.right})"
 
-    def __eq__(self, other):
-        return (
-            isinstance(other, self.__class__)
-            and self.left == other.left
-            and self.operator == other.operator
-            and self.right == other.right
-        )
-
-    def __hash__(self):
-        return hash(
-            (
-                self.left,
-                self.operator,
-                self.right,
-            )
-        )
-
 
 class Unary(Expr):
+    __slots__ = ("operator", "right")
+    _fields = ("operator", "right")
+
     def __init__(self, operator: "Token", right: "Expr"):
         self.operator = operator
         self.right = right
@@ -51,23 +43,11 @@ class Unary(Expr):
             f"{self.__class__.__name__}(operator={self.operator}, right={self.right})"
         )
 
-    def __eq__(self, other):
-        return (
-            isinstance(other, self.__class__)
-            and self.operator == other.operator
-            and self.right == other.right
-        )
-
-    def __hash__(self):
-        return hash(
-            (
-                self.operator,
-                self.right,
-            )
-        )
-
 
 class Literal(Expr):
+    __slots__ = ("value",)
+    _fields = ("value",)
+
     def __init__(self, value: "object"):
         self.value = value
 
@@ -77,14 +57,11 @@ class Literal(Expr):
     def __repr__(self):
         return f"{self.__class__.__name__}(value={self.value})"
 
-    def __eq__(self, other):
-        return isinstance(other, self.__class__) and self.value == other.value
-
-    def __hash__(self):
-        return hash((self.value,))
-
 
 class Logical(Expr):
+    __slots__ = ("operator", "left", "right")
+    _fields = ("operator", "left", "right")
+
     def __init__(self, operator: "Token", left: "Expr", right: "Expr"):
         self.operator = operator
         self.left = left
@@ -96,27 +73,15 @@ class Logical(Expr):
     def __repr__(self):
         return f"{self.__class__.__name__}(operator={self.operator}, left={self.left}, right={self.right})"
 
-    def __eq__(self, other):
-        return (
-            isinstance(other, self.__class__)
-            and self.operator == other.operator
-            and self.left == other.left
-            and self.right == other.right
-        )
-
-    def __hash__(self):
-        return hash(
-            (
-                self.operator,
-                self.left,
-                self.right,
-            )
-        )
-
 
 class Variable(Expr):
+    __slots__ = ("name", "depth", "slot")
+    _fields = ("name",)
+
     def __init__(self, name: "Token"):
         self.name = name
+        self.depth = None
+        self.slot = None
 
     def accept(self, visitor: "ExprVisitor"):
         return visitor.visit_variable_expr(self)
@@ -124,14 +89,11 @@ class Variable(Expr):
     def __repr__(self):
         return f"{self.__class__.__name__}(name={self.name})"
 
-    def __eq__(self, other):
-        return isinstance(other, self.__class__) and self.name == other.name
-
-    def __hash__(self):
-        return hash((self.name,))
-
 
 class Grouping(Expr):
+    __slots__ = ("expression",)
+    _fields = ("expression",)
+
     def __init__(self, expression: "Expr"):
         self.expression = expression
 
@@ -141,17 +103,16 @@ class Grouping(Expr):
     def __repr__(self):
         return f"{self.__class__.__name__}(expression={self.expression})"
 
-    def __eq__(self, other):
-        return isinstance(other, self.__class__) and self.expression == other.expression
-
-    def __hash__(self):
-        return hash((self.expression,))
-
 
 class Assign(Expr):
+    __slots__ = ("assign_to", "to_assign", "depth", "slot")
+    _fields = ("assign_to", "to_assign")
+
     def __init__(self, assign_to: "Token", to_assign: "Expr"):
         self.assign_to = assign_to
         self.to_assign = to_assign
+        self.depth = None
+        self.slot = None
 
     def accept(self, visitor: "ExprVisitor"):
         return visitor.visit_assign_expr(self)
@@ -159,44 +120,153 @@ class Assign(Expr):
     def __repr__(self):
         return f"{self.__class__.__name__}(assign_to={self.assign_to}, to_assign={self.to_assign})"
 
-    def __eq__(self, other):
-        return (
-            isinstance(other, self.__class__)
-            and self.assign_to == other.assign_to
-            and self.to_assign == other.to_assign
-        )
-
-    def __hash__(self):
-        return hash(
-            (
-                self.assign_to,
-                self.to_assign,
-            )
-        )
-
 
 class Call(Expr):
-    def __init__(self, callee: "Expr", arguments: "List[Expr]"):
+    __slots__ = ("callee", "paren", "arguments", "cache")
+    _fields = ("callee", "paren", "arguments")
+
+    def __init__(self, callee: "Expr", paren: "Token", arguments: "List[Expr]"):
         self.callee = callee
+        self.paren = paren
         self.arguments = arguments
+        self.cache = None
 
     def accept(self, visitor: "ExprVisitor"):
         return visitor.visit_call_expr(self)
 
     def __repr__(self):
-        return f"{self.__class__.__name__}(callee={self.callee}, arguments={self.arguments})"
+        return f"{self.__class__.__name__}(callee={self.callee}, paren={self.paren}, arguments={self.arguments})"
 
-    def __eq__(self, other):
-        return (
-            isinstance(other, self.__class__)
-            and self.callee == other.callee
-            and self.arguments == other.arguments
-        )
 
-    def __hash__(self):
-        return hash(
-            (
-                self.callee,
-                self.arguments,
-            )
+class Subscript(Expr):
+    __slots__ = ("object", "bracket", "index")
+    _fields = ("object", "bracket", "index")
+
+    def __init__(self, object: "Expr", bracket: "Token", index: "Expr"):
+        self.object = object
+        self.bracket = bracket
+        self.index = index
+
+    def accept(self, visitor: "ExprVisitor"):
+        return visitor.visit_subscript_expr(self)
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(object={self.object}, bracket={self.bracket}, index={self.index})"
+
+
+class SetSubscript(Expr):
+    __slots__ = ("object", "bracket", "index", "value")
+    _fields = ("object", "bracket", "index", "value")
+
+    def __init__(self, object: "Expr", bracket: "Token", index: "Expr", value: "Expr"):
+        self.object = object
+        self.bracket = bracket
+        self.index = index
+        self.value = value
+
+    def accept(self, visitor: "ExprVisitor"):
+        return visitor.visit_setsubscript_expr(self)
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(object={self.object}, bracket={self.bracket}, index={self.index}, value={self.value})"
+
+
+class Slice(Expr):
+    __slots__ = ("object", "bracket", "start", "stop")
+    _fields = ("object", "bracket", "start", "stop")
+
+    def __init__(self, object: "Expr", bracket: "Token", start: "Expr", stop: "Expr"):
+        self.object = object
+        self.bracket = bracket
+        self.start = start
+        self.stop = stop
+
+    def accept(self, visitor: "ExprVisitor"):
+        return visitor.visit_slice_expr(self)
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(object={self.object}, bracket={self.bracket}, start={self.start}, stop={self.stop})"
+
+
+class Map(Expr):
+    __slots__ = ("brace", "keys", "values")
+    _fields = ("brace", "keys", "values")
+
+    def __init__(self, brace: "Token", keys: "List[Expr]", values: "List[Expr]"):
+        self.brace = brace
+        self.keys = keys
+        self.values = values
+
+    def accept(self, visitor: "ExprVisitor"):
+        return visitor.visit_map_expr(self)
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(brace={self.brace}, keys={self.keys}, values={self.values})"
+
+
+class Get(Expr):
+    __slots__ = ("object", "name", "cache")
+    _fields = ("object", "name")
+
+    def __init__(self, object: "Expr", name: "Token"):
+        self.object = object
+        self.name = name
+        self.cache = None
+
+    def accept(self, visitor: "ExprVisitor"):
+        return visitor.visit_get_expr(self)
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(object={self.object}, name={self.name})"
+
+
+class Set(Expr):
+    __slots__ = ("object", "name", "value", "cache")
+    _fields = ("object", "name", "value")
+
+    def __init__(self, object: "Expr", name: "Token", value: "Expr"):
+        self.object = object
+        self.name = name
+        self.value = value
+        self.cache = None
+
+    def accept(self, visitor: "ExprVisitor"):
+        return visitor.visit_set_expr(self)
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(object={self.object}, name={self.name}, value={self.value})"
+
+
+class This(Expr):
+    __slots__ = ("keyword", "depth", "slot")
+    _fields = ("keyword",)
+
+    def __init__(self, keyword: "Token"):
+        self.keyword = keyword
+        self.depth = None
+        self.slot = None
+
+    def accept(self, visitor: "ExprVisitor"):
+        return visitor.visit_this_expr(self)
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(keyword={self.keyword})"
+
+
+class Super(Expr):
+    __slots__ = ("keyword", "method", "depth", "slot")
+    _fields = ("keyword", "method")
+
+    def __init__(self, keyword: "Token", method: "Token"):
+        self.keyword = keyword
+        self.method = method
+        self.depth = None
+        self.slot = None
+
+    def accept(self, visitor: "ExprVisitor"):
+        return visitor.visit_super_expr(self)
+
+    def __repr__(self):
+        return (
+            f"{self.__class__.__name__}(keyword={self.keyword}, method={self.method})"
         )
@@ -1,24 +1,30 @@
-import copy
+import operator
 from typing import List
 
-from pylox.callable import ReturnVal
-from pylox.environment import Environment
+from pylox import tracing
+from pylox.arrays import get_item, get_slice, set_item
+from pylox.callable import LoxCallable, LoxRuntimeError, NativeFunction, TailCall
+from pylox.classes import (
+    LoxInstance,
+    field_cache,
+    get_super,
+    make_class,
+    property_cache,
+)
+from pylox.environment import Environment, new_frame
+from pylox.expr import Variable
 from pylox.function import LoxFunction
-from pylox.logging import logger
+from pylox.iterators import LoxGenerator, iterate
+from pylox.maps import build_map
+from pylox.memo import MEMO_SIZE, MISSING, Memo, memo_key
+from pylox.natives import install as install_natives
+from pylox.rope import Rope, concat
+from pylox.stmt import Block, ForIn, If, While, Yield
 from pylox.tokens import TokenType
+from pylox.values import _is_number, _isEqual, _isTruthy
 from pylox.visitor import Expr, Visitor
 
 
-class LoxRuntimeError(Exception):
-    def __init__(self, token=None, msg=None):
-        self.token = token
-        self.msg = msg
-
-
-def _is_number(value):
-    return isinstance(value, (int, float))
-
-
 def _checkNumberOperands(operator, left, right):
     if _is_number(left) and _is_number(right):
         return
@@ -33,28 +39,55 @@ def _checkNumberOperand(operator, operand):
     raise LoxRuntimeError(f"Operand for {operator.lexeme} should be int or float")
 
 
-def _isTruthy(object_):
-    if object_ in ("false", "nil", None):
-        return False
-    if isinstance(object_, bool):
-        return bool(object_)
-    return True
-
-
-def _isEqual(left, right):
-    return left == right
+# The python functions of the comparisons a CountedLoop tests its counter with
+_COMPARE = {
+    TokenType.LESS: operator.lt,
+    TokenType.LESS_EQUAL: operator.le,
+    TokenType.GREATER: operator.gt,
+    TokenType.GREATER_EQUAL: operator.ge,
+    TokenType.BANG_EQUAL: operator.ne,
+}
 
 
 def _runtime_error(msg, line):
     print(msg + " @ [line " + str(line) + "]")
+    tracing.flush()
 
 
 class ExpressionInterpreter(Visitor):
-    def __init__(self):
+    """
+    Tree walking interpreter
+
+    Expressions evaluate to their value. Statements return their
+    completion: None when they complete normally, a one element tuple
+    holding the value of an executed `return`, or a TailCall for a
+    `return` of a call
+
+    The bodies of generator functions run in python generators instead,
+    see generator
+    """
+
+    def __init__(self, memoize=True, memo_size=MEMO_SIZE):
         self.globals = Environment()
         self.environ = self.globals
-
-        self.locals = {}
+        self.had_runtime_error = False
+        # Calls to functions the Resolver found pure go through a Memo
+        # of at most `memo_size` results per declaration
+        self.memoize = memoize
+        self.memo_size = memo_size
+        self.memos = {}
+        install_natives(self.define_native)
+
+    def define_native(self, name, function, arity):
+        """Define the global `name` as a python function LOX code can call
+
+        Args:
+            name (str): The name LOX code calls the function by
+            function (Callable): Called with the LOX arguments, returns a
+                LOX value
+            arity (int): The number of arguments calls must pass
+        """
+        self.globals.define(name, NativeFunction(name, function, arity))
 
     def visit_literal_expr(self, expr: "Expr"):
         return expr.value
@@ -77,8 +110,8 @@ class ExpressionInterpreter(Visitor):
         operator = expr.operator
 
         if operator.type_ == TokenType.PLUS:
-            if isinstance(left, str):
-                return left + str(right)
+            if isinstance(left, str) or type(left) is Rope:
+                return concat(left, right)
             _checkNumberOperands(operator=operator, left=left, right=right)
             return left + right
         if operator.type_ == TokenType.MINUS:
@@ -124,12 +157,10 @@ class ExpressionInterpreter(Visitor):
     def visit_assign_expr(self, expr: "Expr"):
 
         value = self.evaluate(expr.to_assign)
-        name = expr.assign_to.lexeme
-        distance = self.locals.get(expr)
-        if distance is not None:
-            self.environ.assign_at(distance, name, value)
+        if expr.depth is not None:
+            self.environ.assign_at(expr.depth, expr.slot, value)
         else:
-            self.globals.assign(name, value)
+            self.globals.assign(expr.assign_to.lexeme, value)
         return value
 
     def visit_print_stmt(self, stmt: "Stmt"):
@@ -139,7 +170,7 @@ class ExpressionInterpreter(Visitor):
 
     def visit_function_stmt(self, stmt: "Function"):
         function = LoxFunction(stmt=stmt, closure=self.environ)
-        self.environ.define(stmt.name.name.lexeme, function)
+        self._define(stmt.name.name.lexeme, function)
 
     def visit_variable_expr(self, expr: "Expr"):
         value = None
@@ -152,25 +183,37 @@ class ExpressionInterpreter(Visitor):
         return value
 
     def _look_up_variable(self, name, expression):
-        logger.debug(f"_look_up_variable: name={name}, expression={expression}")
-        distance = self.locals.get(expression)
-        if distance is not None:
-            value = self.environ.get_at(distance, name.lexeme)
-            return value
-        logger.debug(f"_look_up_variable: getting {name.lexeme} from globals")
+        if expression.depth is not None:
+            return self.environ.get_at(expression.depth, expression.slot)
+        if tracing.ENV:
+            tracing.trace("env", "global %s", name.lexeme)
         return self.globals.get(name.lexeme)
 
     def visit_expression_stmt(self, stmt: "Stmt"):
         self.evaluate(stmt.expression)
 
     def visit_var_stmt(self, stmt: "Stmt"):
-        value = self.evaluate(stmt.initialiser)
-        self.environ.define(stmt.name, value)
+        value = None
+        if stmt.initialiser is not None:
+            value = self.evaluate(stmt.initialiser)
+        self._define(stmt.name, value)
         return None
 
+    def _define(self, name, value):
+        if self.environ is self.globals:
+            self.globals.define(name, value)
+        else:
+            self.environ.define(value)
+
     def visit_block_stmt(self, block: "Stmt"):
-        block_env = Environment(environment=self.environ)
-        self.execute_block(statements=block.statements, env=block_env)
+        if block.flat:
+            for statement in block.statements:
+                completion = self._execute(statement)
+                if completion is not None:
+                    return completion
+            return None
+        block_env = new_frame(self.environ)
+        return self.execute_block(statements=block.statements, env=block_env)
 
     def visit_if_stmt(self, if_stmt: "Stmt"):
         condition = if_stmt.condition
@@ -178,35 +221,418 @@ class ExpressionInterpreter(Visitor):
         else_branch = if_stmt.else_branch
 
         if _isTruthy(self.evaluate(condition)):
-            self._execute(then_branch)
+            return self._execute(then_branch)
         elif else_branch:
-            self._execute(else_branch)
+            return self._execute(else_branch)
         return None
 
     def visit_while_stmt(self, stmt: "Stmt"):
         while _isTruthy(self.evaluate(stmt.condition)):
-            self._execute(stmt.statement)
+            completion = self._execute(stmt.statement)
+            if completion is not None:
+                return completion
         return None
 
-    def visit_call_expr(self, expr: "Expr"):
+    def visit_countedloop_stmt(self, stmt: "Stmt"):
+        counter = stmt.condition.left
+        frame = self.environ.ancestor(counter.depth)
+        slot = counter.slot
+        value = frame[slot]
+        if type(value) is int or type(value) is float:
+            compare = _COMPARE[stmt.condition.operator.type_]
+            limit = stmt.condition.right
+            body = stmt.statement
+            step = stmt.step
+            while compare(value, limit.accept(self)):
+                completion = body.accept(self)
+                if completion is not None:
+                    return completion
+                value = frame[slot]
+                if type(value) is not int and type(value) is not float:
+                    # A function the body called stored something else
+                    self.evaluate(stmt.increment)
+                    break
+                value = value + step
+                frame[slot] = value
+            else:
+                return None
+
+        while _isTruthy(self.evaluate(stmt.condition)):
+            completion = self._execute(stmt.statement)
+            if completion is not None:
+                return completion
+            self.evaluate(stmt.increment)
+        return None
+
+    def visit_forin_stmt(self, stmt: "Stmt"):
+        values = self._iterate(stmt)
+        previous_env = self.environ
+        body = stmt.body
         try:
-            callee = self.evaluate(expr.callee)
-        except KeyError:
-            callee = None
-        arguments = []
+            for value in values:
+                # A new frame per iteration, closures made by the body keep
+                # the value they saw
+                self.environ = new_frame(previous_env, [value])
+                completion = body.accept(self)
+                if completion is not None:
+                    return completion
+        finally:
+            self.environ = previous_env
+        return None
+
+    def _iterate(self, stmt):
+        """The python iterator over the values of the loop `stmt`"""
+        iterable = self.evaluate(stmt.iterable)
+        try:
+            return iterate(iterable)
+        except LoxRuntimeError as error:
+            error.token = stmt.keyword
+            raise
+
+    def visit_yield_stmt(self, stmt: "Stmt"):
+        # Generator bodies run in _suspendable, which executes `yield` itself
+        raise LoxRuntimeError(
+            token=stmt.keyword, msg="Cannot yield outside of a generator"
+        )
+
+    def generator(self, function, arguments):
+        """Return the LoxGenerator of a call to the generator function `function`"""
+        declaration = function.declaration
+        environment = new_frame(function.closure, arguments[: len(declaration.params)])
+        frames = self._resume(self._suspendable(declaration.body), environment)
+        return LoxGenerator(declaration.name.name.lexeme, frames)
+
+    def _resume(self, frames, environment):
+        """Yield the values of the generator body `frames`
+
+        The body runs in `environment`, which is swapped with the
+        environment of whoever asks for the next value, and then back,
+        at every value
+        """
+        while True:
+            caller_env = self.environ
+            self.environ = environment
+            try:
+                value = next(frames)
+            except StopIteration:
+                return
+            finally:
+                environment = self.environ
+                self.environ = caller_env
+            yield value
+
+    def _suspendable(self, statements):
+        """Execute the statements of a generator body in a python generator
+
+        `yield` suspends it, together with the _suspendable of every
+        enclosing block, `if`, `while` and `for`. Any other statement runs
+        as usual. Returns the completion of `statements`
+
+        Environments are restored without `finally`, a generator that is
+        never resumed again must not change self.environ when collected
+        """
+        for statement in statements:
+            kind = type(statement)
+            if kind is Yield:
+                value = None
+                if statement.value is not None:
+                    value = statement.value.accept(self)
+                yield value
+                continue
+            if kind is Block:
+                if statement.flat:
+                    completion = yield from self._suspendable(statement.statements)
+                else:
+                    previous_env = self.environ
+                    self.environ = new_frame(previous_env)
+                    completion = yield from self._suspendable(statement.statements)
+                    self.environ = previous_env
+            elif kind is If:
+                completion = None
+                if _isTruthy(self.evaluate(statement.condition)):
+                    completion = yield from self._suspendable((statement.then_branch,))
+                elif statement.else_branch:
+                    completion = yield from self._suspendable((statement.else_branch,))
+            elif kind is While:
+                completion = None
+                while completion is None and _isTruthy(
+                    self.evaluate(statement.condition)
+                ):
+                    completion = yield from self._suspendable((statement.statement,))
+            elif kind is ForIn:
+                completion = None
+                values = self._iterate(statement)
+                previous_env = self.environ
+                for value in values:
+                    self.environ = new_frame(previous_env, [value])
+                    completion = yield from self._suspendable((statement.body,))
+                    if completion is not None:
+                        break
+                self.environ = previous_env
+            else:
+                completion = statement.accept(self)
+            if completion is not None:
+                return completion
+        return None
 
+    def _callee(self, expr: "Expr"):
+        """Evaluate the callee and arguments of the call `expr`
+
+        Returns:
+            tuple: The LoxFunction, its layout from the inline cache of
+                `expr` and the arguments
+        """
+        callee_expr = expr.callee
+        if type(callee_expr) is Variable:
+            # Most callees are named, skip the generic dispatch to look them up
+            callee = self.visit_variable_expr(callee_expr)
+        else:
+            try:
+                callee = self.evaluate(callee_expr)
+            except KeyError:
+                callee = None
+        arguments = []
         for argument in expr.arguments:
-            arguments.append(self.evaluate(argument))
-        if not isinstance(callee, LoxFunction):
-            raise LoxRuntimeError(msg="you can only call functions")
-        return callee.call(self, arguments)
+            arguments.append(argument.accept(self))
+
+        # Monomorphic inline cache: the layout of the declaration last called
+        # from this site, re-filled whenever another declaration shows up
+        cache = expr.cache
+        if (
+            cache is None
+            or type(callee) is not LoxFunction
+            or callee.declaration is not cache[0]
+        ):
+            if not isinstance(callee, LoxFunction):
+                if isinstance(callee, LoxCallable):
+                    return callee, None, arguments
+                raise LoxRuntimeError(
+                    token=expr.paren, msg="you can only call functions"
+                )
+            cache = expr.cache = self._layout(callee)
+        if len(arguments) != cache[2]:
+            raise LoxRuntimeError(
+                token=expr.paren,
+                msg=f"Expected {cache[2]} arguments but got {len(arguments)}",
+            )
+        return callee, cache, arguments
+
+    def _layout(self, function):
+        """What call sites cache to call `function` without LoxFunction.call
+
+        A (declaration, body, arity, memo) tuple, shared by every function
+        made from the same declaration. `memo` is None unless the function
+        is pure and memoization is on
+        """
+        declaration = function.declaration
+        memo = None
+        if declaration.pure and self.memoize:
+            memo = self.memos.get(declaration)
+            if memo is None:
+                memo = self.memos[declaration] = Memo(
+                    name=declaration.name.name.lexeme, maxsize=self.memo_size
+                )
+        return (declaration, declaration.body, len(declaration.params), memo)
+
+    def visit_call_expr(self, expr: "Expr"):
+        callee, layout, arguments = self._callee(expr)
+        if layout is None:
+            return self._call_native(expr, callee, arguments)
+        return self.call_function(callee, arguments, layout)
+
+    def call_function(self, callee, arguments, layout=None):
+        """Call the LoxFunction `callee` with `arguments`
+
+        Every call of a LoxFunction goes through here, those of call sites,
+        which pass the `layout` they cached, and those of class initializers
+        and natives alike, so tail calls run in constant stack and pure
+        functions are memoized however they are called
+        """
+        if layout is None:
+            layout = self._layout(callee)
+        key = None
+        memo = layout[3]
+        # A declaration stops being pure when a later declaration assigns
+        # a global it reads
+        if memo is not None and layout[0].pure:
+            key = memo_key(arguments)
+            if key is not None:
+                value = memo.lookup(key)
+                if value is not MISSING:
+                    return value
+
+        # Trampoline: a tail call completes the returning function with a
+        # TailCall, which runs here once its frame is gone
+        previous_env = self.environ
+        while True:
+            declaration, body, _, _ = layout
+            if tracing.CALLS:
+                tracing.trace(
+                    "calls", "call %s args=%s", declaration.name.name.lexeme, arguments
+                )
+            if declaration.generator:
+                value = self.generator(callee, arguments)
+                break
+            self.environ = new_frame(callee.closure, arguments)
+            completion = None
+            try:
+                for statement in body:
+                    completion = statement.accept(self)
+                    if completion is not None:
+                        break
+            except LoxRuntimeError as error:
+                _runtime_error(error.msg, error.token.line)
+                raise
+            finally:
+                self.environ = previous_env
+            if completion is None:
+                value = None
+                break
+            if type(completion) is tuple:
+                value = completion[0]
+                break
+            callee, layout, arguments = (
+                completion.function,
+                completion.layout,
+                completion.arguments,
+            )
+        if key is not None:
+            memo.store(key, value)
+        return value
+
+    def _call_native(self, expr, callee, arguments):
+        try:
+            return callee.call(self, arguments)
+        except LoxRuntimeError as error:
+            # Natives and classes do not know where they are called from
+            if error.token is None:
+                error.token = expr.paren
+            raise
+
+    def visit_subscript_expr(self, expr: "Expr"):
+        collection = expr.object.accept(self)
+        index = expr.index.accept(self)
+        try:
+            return get_item(collection, index)
+        except LoxRuntimeError as error:
+            error.token = expr.bracket
+            raise
+
+    def visit_setsubscript_expr(self, expr: "Expr"):
+        collection = expr.object.accept(self)
+        index = expr.index.accept(self)
+        value = expr.value.accept(self)
+        try:
+            return set_item(collection, index, value)
+        except LoxRuntimeError as error:
+            error.token = expr.bracket
+            raise
+
+    def visit_slice_expr(self, expr: "Expr"):
+        collection = expr.object.accept(self)
+        start = None if expr.start is None else expr.start.accept(self)
+        stop = None if expr.stop is None else expr.stop.accept(self)
+        try:
+            return get_slice(collection, start, stop)
+        except LoxRuntimeError as error:
+            error.token = expr.bracket
+            raise
+
+    def visit_map_expr(self, expr: "Expr"):
+        items = []
+        for key, value in zip(expr.keys, expr.values):
+            items.append(key.accept(self))
+            items.append(value.accept(self))
+        try:
+            return build_map(items)
+        except LoxRuntimeError as error:
+            error.token = expr.brace
+            raise
+
+    def visit_get_expr(self, expr: "Expr"):
+        instance = expr.object.accept(self)
+        # Monomorphic inline cache: where the property is in instances of
+        # the shape last met here, see pylox.classes.property_cache
+        cache = expr.cache
+        if (
+            cache is None
+            or type(instance) is not LoxInstance
+            or instance.shape is not cache[0]
+        ):
+            try:
+                cache = expr.cache = property_cache(instance, expr.name.lexeme)
+            except LoxRuntimeError as error:
+                error.token = expr.name
+                raise
+        index = cache[1]
+        if index is not None:
+            return instance.fields[index]
+        return cache[2].bind(instance)
+
+    def visit_set_expr(self, expr: "Expr"):
+        instance = expr.object.accept(self)
+        value = expr.value.accept(self)
+        cache = expr.cache
+        if (
+            cache is None
+            or type(instance) is not LoxInstance
+            or instance.shape is not cache[0]
+        ):
+            try:
+                cache = expr.cache = field_cache(instance, expr.name.lexeme)
+            except LoxRuntimeError as error:
+                error.token = expr.name
+                raise
+        _, index, next_shape = cache
+        if next_shape is None:
+            instance.fields[index] = value
+        else:
+            instance.fields.append(value)
+            instance.shape = next_shape
+        return value
+
+    def visit_this_expr(self, expr: "Expr"):
+        return self.environ.get_at(expr.depth, expr.slot)
+
+    def visit_super_expr(self, expr: "Expr"):
+        superclass = self.environ.get_at(expr.depth, expr.slot)
+        # `this` is alone in the frame below the one holding `super`
+        instance = self.environ.get_at(expr.depth - 1, 0)
+        try:
+            return get_super(superclass, instance, expr.method.lexeme)
+        except LoxRuntimeError as error:
+            error.token = expr.method
+            raise
+
+    def visit_class_stmt(self, stmt: "Stmt"):
+        superclass = None
+        closure = self.environ
+        if stmt.superclass is not None:
+            superclass = self.evaluate(stmt.superclass)
+            closure = new_frame(closure, [superclass])
+        methods = {
+            method.name.name.lexeme: LoxFunction(stmt=method, closure=closure)
+            for method in stmt.methods
+        }
+        try:
+            klass = make_class(stmt.name.lexeme, superclass, methods)
+        except LoxRuntimeError as error:
+            error.token = stmt.name
+            raise
+        self._define(stmt.name.lexeme, klass)
 
     def visit_return_stmt(self, stmt: "Stmt"):
+        if stmt.tail:
+            callee, layout, arguments = self._callee(stmt.value)
+            if layout is None:
+                return (self._call_native(stmt.value, callee, arguments),)
+            return TailCall(callee, layout, arguments)
+
         value = None
 
         if stmt.value is not None:
             value = self.evaluate(stmt.value)
-            raise ReturnVal(value=value)
+        return (value,)
 
     def evaluate(self, expr: "Expr"):
         return expr.accept(self)
@@ -216,6 +642,7 @@ class ExpressionInterpreter(Visitor):
             for statement in statements:
                 self._execute(statement)
         except LoxRuntimeError as error:
+            self.had_runtime_error = True
             _runtime_error(error.msg, error.token.line)
 
     def _execute(self, statement):
@@ -227,13 +654,11 @@ class ExpressionInterpreter(Visitor):
         try:
             self.environ = env
             for statement in statements:
-                self._execute(statement)
+                completion = self._execute(statement)
+                if completion is not None:
+                    return completion
         except LoxRuntimeError as error:
             _runtime_error(error.msg, error.token.line)
             raise
         finally:
             self.environ = previous_env
-
-    def resolve(self, expr: "Expr", depth: int):
-        logger.debug(f"resolve: expr={expr}, depth={depth}")
-        self.locals[expr] = depth
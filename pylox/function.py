@@ -1,5 +1,5 @@
-from pylox.callable import LoxCallable, ReturnVal
-from pylox.environment import Environment
+from pylox.callable import LoxCallable
+from pylox.environment import Environment, new_frame
 from pylox.stmt import Function
 
 
@@ -8,14 +8,15 @@ class LoxFunction(LoxCallable):
         self.declaration = stmt
         self.closure = closure
 
+    @property
+    def arity(self):
+        return len(self.declaration.params)
+
+    def bind(self, instance):
+        """The method with `this`, one frame above its parameters, set to `instance`"""
+        return LoxFunction(self.declaration, new_frame(self.closure, [instance]))
+
     def call(self, interpreter, arguments):
-        environment = Environment(self.closure)
-        for index, _ in enumerate(self.declaration.params):
-            name = self.declaration.params[index].name.lexeme
-            value = arguments[index]
-            environment.define(name, value)
-        try:
-            interpreter.execute_block(self.declaration.body, env=environment)
-        except ReturnVal as rv:
-            return rv.value
-        return None
+        # Calls from outside a call site, such as those of class initializers,
+        # share the trampoline and memo of call sites
+        return interpreter.call_function(self, arguments)
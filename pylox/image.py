@@ -0,0 +1,304 @@
+"""
+Flat binary images of compiled programs
+
+An image holds the bytecode of pylox.compiler.Compiler for a whole
+program in a handful of arrays, so it can be mapped into memory and run
+without deserializing one python object per node or instruction. Many
+processes running the same image share its pages through the page cache.
+
+Layout, every section starting on an 8 byte boundary:
+
+    header       MAGIC, VERSION, byte order, counts and section offsets
+    functions    8 int32 per function: name, arity, upvalue count,
+                 code start, code length, first constant, constant count
+                 and padding. The script is function 0 and has name -1
+    tags         int32 per constant, one of the TAG_ values
+    values       8 bytes per constant: the int64, float64 or bool itself,
+                 or the index of a string or function
+    offsets      int64 per string plus one, into the strings section
+    strings      utf-8 text of every string, names and literals alike
+    code         int32 instructions and operands of all functions
+    lines        int32 source line of every position in code
+
+Nothing is decoded up front: a function is built the first time it is
+loaded as a constant, and its constants and code the first time it runs
+"""
+import mmap
+import struct
+import sys
+from array import array
+from functools import cached_property
+
+from pylox.compiler import CompiledFunction
+
+MAGIC = b"LOXB"
+VERSION = 1
+SUFFIX = ".loxb"
+
+TAG_INT = 0
+TAG_FLOAT = 1
+TAG_STRING = 2
+TAG_FUNCTION = 3
+TAG_BOOL = 4
+
+_BYTE_ORDERS = ("little", "big")
+
+# MAGIC, VERSION, byte order, function, constant, string and code counts,
+# then the offsets of the eight sections
+_HEADER = struct.Struct("=4sIIIIII4x8q")
+_FUNCTION_FIELDS = 8
+
+
+class ImageError(Exception):
+    pass
+
+
+def _align(stream):
+    stream.write(bytes(-stream.tell() % 8))
+
+
+class _Writer:
+    def __init__(self):
+        self.functions = []
+        self.function_index = {}
+        self.strings = []
+        self.string_index = {}
+
+    def string(self, value):
+        index = self.string_index.get(value)
+        if index is None:
+            index = self.string_index[value] = len(self.strings)
+            self.strings.append(value)
+        return index
+
+    def function(self, function):
+        index = self.function_index.get(id(function))
+        if index is None:
+            index = self.function_index[id(function)] = len(self.functions)
+            self.functions.append(function)
+        return index
+
+    def write(self, script, stream):
+        self.function(script)
+        table = array("i")
+        tags = array("i")
+        values = bytearray()
+        code = array("i")
+        lines = array("i")
+        # Functions found in constant pools are appended while iterating
+        for function in self.functions:
+            chunk = function.chunk
+            name = -1 if function.name is None else self.string(function.name)
+            table.extend(
+                [
+                    name,
+                    function.arity,
+                    function.upvalue_count,
+                    len(code),
+                    len(chunk.code),
+                    len(tags),
+                    len(chunk.constants),
+                    0,
+                ]
+            )
+            for constant in chunk.constants:
+                tag, value = self.constant(constant)
+                tags.append(tag)
+                values += value
+            try:
+                code.extend(chunk.code)
+                lines.extend(chunk.lines)
+            except OverflowError:
+                raise ImageError(f"{function!r} does not fit in 32 bit operands")
+
+        offsets = array("q", [0])
+        blob = bytearray()
+        for string in self.strings:
+            blob += string.encode("utf-8")
+            offsets.append(len(blob))
+
+        stream.write(bytes(_HEADER.size))
+        sections = []
+        for section in (table, tags, values, offsets, blob, code, lines):
+            _align(stream)
+            sections.append(stream.tell())
+            stream.write(section)
+        sections.append(stream.tell())
+        stream.seek(0)
+        stream.write(
+            _HEADER.pack(
+                MAGIC,
+                VERSION,
+                _BYTE_ORDERS.index(sys.byteorder),
+                len(self.functions),
+                len(tags),
+                len(self.strings),
+                len(code),
+                *sections,
+            )
+        )
+
+    def constant(self, value):
+        if isinstance(value, CompiledFunction):
+            return TAG_FUNCTION, struct.pack("=q", self.function(value))
+        if isinstance(value, str):
+            return TAG_STRING, struct.pack("=q", self.string(value))
+        if isinstance(value, bool):
+            return TAG_BOOL, struct.pack("=q", value)
+        if isinstance(value, float):
+            return TAG_FLOAT, struct.pack("=d", value)
+        if isinstance(value, int) and not isinstance(value, bool):
+            try:
+                return TAG_INT, struct.pack("=q", value)
+            except struct.error:
+                pass
+        raise ImageError(f"Cannot store constant {value!r} in an image")
+
+
+def write_image(function, path):
+    """Write the compiled script `function` as an image to `path`
+
+    Args:
+        function (CompiledFunction): The result of Compiler.compile
+        path (pathlib.Path): The image file to write
+    """
+    with open(path, "wb") as stream:
+        _Writer().write(function, stream)
+
+
+class _MappedChunk:
+    """
+    The chunk of a function in an image, decoded when first used
+
+    The code is copied into a list, which the VM indexes about twice as
+    fast as the mapped memory. Lines stay mapped, they are only read to
+    report runtime errors
+    """
+
+    def __init__(self, image, code_start, code_length, first_constant, count):
+        self._image = image
+        self._code = slice(code_start, code_start + code_length)
+        self._constants = range(first_constant, first_constant + count)
+
+    @cached_property
+    def code(self):
+        return self._image.code[self._code].tolist()
+
+    @cached_property
+    def lines(self):
+        return self._image.lines[self._code]
+
+    @cached_property
+    def constants(self):
+        return [self._image.constant(index) for index in self._constants]
+
+
+class Image:
+    """
+    An image file mapped into memory
+
+    Args:
+        path (pathlib.Path): The image file
+    """
+
+    def __init__(self, path):
+        with open(path, "rb") as imagefile:
+            try:
+                self._map = mmap.mmap(imagefile.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                raise ImageError(f"{path} is not a pylox image")
+        buffer = memoryview(self._map)
+        if len(buffer) < _HEADER.size:
+            raise ImageError(f"{path} is not a pylox image")
+        (
+            magic,
+            version,
+            byte_order,
+            self.function_count,
+            constant_count,
+            string_count,
+            code_length,
+            *sections,
+        ) = _HEADER.unpack_from(buffer)
+        if magic != MAGIC:
+            raise ImageError(f"{path} is not a pylox image")
+        if version != VERSION:
+            raise ImageError(f"{path} is an image version {version}, not {VERSION}")
+        if _BYTE_ORDERS[byte_order] != sys.byteorder:
+            raise ImageError(
+                f"{path} was written on a {_BYTE_ORDERS[byte_order]} endian machine"
+            )
+        if sections[-1] > len(buffer):
+            raise ImageError(f"{path} is truncated")
+        table, tags, values, offsets, strings, code, lines, end = sections
+        self._functions = buffer[table:tags].cast("i")
+        self._tags = buffer[tags:values].cast("i")[:constant_count]
+        self._ints = buffer[values:offsets].cast("q")[:constant_count]
+        self._floats = buffer[values:offsets].cast("d")[:constant_count]
+        self._offsets = buffer[offsets:strings].cast("q")[: string_count + 1]
+        self._strings = buffer[strings:code]
+        self.code = buffer[code:lines].cast("i")[:code_length]
+        self.lines = buffer[lines:end].cast("i")[:code_length]
+        self._decoded_strings = {}
+        self._decoded_functions = {}
+
+    def script(self):
+        """Return the top level script, ready for VM.interpret"""
+        return self.function(0)
+
+    def function(self, index):
+        function = self._decoded_functions.get(index)
+        if function is None:
+            start = index * _FUNCTION_FIELDS
+            fields = self._functions[start : start + _FUNCTION_FIELDS]
+            (
+                name,
+                arity,
+                upvalue_count,
+                code_start,
+                code_length,
+                first,
+                count,
+                _,
+            ) = fields
+            function = CompiledFunction(
+                name=None if name < 0 else self.string(name), arity=arity
+            )
+            function.upvalue_count = upvalue_count
+            function.chunk = _MappedChunk(self, code_start, code_length, first, count)
+            self._decoded_functions[index] = function
+        return function
+
+    def string(self, index):
+        string = self._decoded_strings.get(index)
+        if string is None:
+            start, end = self._offsets[index], self._offsets[index + 1]
+            string = sys.intern(str(self._strings[start:end], "utf-8"))
+            self._decoded_strings[index] = string
+        return string
+
+    def constant(self, index):
+        tag = self._tags[index]
+        if tag == TAG_FLOAT:
+            return self._floats[index]
+        if tag == TAG_INT:
+            return self._ints[index]
+        if tag == TAG_STRING:
+            return self.string(self._ints[index])
+        if tag == TAG_FUNCTION:
+            return self.function(self._ints[index])
+        if tag == TAG_BOOL:
+            return bool(self._ints[index])
+        raise ImageError(f"Unknown constant tag {tag}")
+
+
+def load_image(path):
+    """Map the image at `path` and return its top level script
+
+    Args:
+        path (pathlib.Path): An image written by write_image
+
+    Returns:
+        CompiledFunction: The script, decoded lazily from the mapped file
+    """
+    return Image(path).script()
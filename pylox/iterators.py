@@ -0,0 +1,123 @@
+"""
+Generators, ranges and the values `for (x in ...)` loops over
+
+A call to a generator function, a function whose body holds a `yield`,
+runs none of its body and returns a LoxGenerator. Each engine runs the
+body as a python generator, so a suspended call keeps one python frame
+per statement it is suspended in, and a pipeline of generators holds one
+value per stage at a time
+
+`iterate` is the iteration protocol: every engine asks it for the python
+iterator of the value a for-in loop walks, so a loop over a LoxRange is
+driven by a python range and never computes its values in LOX
+"""
+import math
+
+from pylox.arrays import LoxArray
+from pylox.callable import LoxRuntimeError
+from pylox.maps import LoxMap
+from pylox.persistent import PersistentMap, PersistentVector
+
+
+class LoxGenerator:
+    """
+    The values yielded by one call of a generator function
+
+    A generator can be looped over once, later loops find it exhausted
+
+    Args:
+        name (str): The name of the generator function
+        frames (Iterator): The python generator running its body
+    """
+
+    __slots__ = ("name", "frames")
+
+    def __init__(self, name, frames):
+        self.name = name
+        self.frames = frames
+
+    def __iter__(self):
+        return self.frames
+
+    def __str__(self):
+        return f"<generator {self.name}>"
+
+    __repr__ = __str__
+
+
+class LoxRange:
+    """
+    The numbers from `start` up to `stop` excluded, `step` apart
+
+    Nothing is stored, values are computed as they are asked for. When
+    `start` and `step` are ints the values are ints, otherwise floats
+    computed as `start + k * step`, so they do not drift like repeated
+    additions would
+
+    Args:
+        start (int | float): The first value
+        stop (int | float): The finite bound, values stay below it when `step`
+            is positive and above it when `step` is negative
+        step (int | float): The difference between two values, not 0
+    """
+
+    __slots__ = ("start", "stop", "step")
+
+    def __init__(self, start, stop, step):
+        self.start = start
+        self.stop = stop
+        self.step = step
+
+    def _ints(self):
+        """The python range of the values when they are ints, or None"""
+        start, stop, step = self.start, self.stop, self.step
+        if type(start) is not int or type(step) is not int:
+            return None
+        # Round the bound so that the same ints stay on the right side of it
+        stop = math.ceil(stop) if step > 0 else math.floor(stop)
+        return range(start, stop, step)
+
+    def __len__(self):
+        ints = self._ints()
+        if ints is not None:
+            return len(ints)
+        return max(0, math.ceil((self.stop - self.start) / self.step))
+
+    def __iter__(self):
+        ints = self._ints()
+        if ints is not None:
+            return iter(ints)
+        return self._floats()
+
+    def _floats(self):
+        start, step = self.start, self.step
+        for k in range(len(self)):
+            yield start + k * step
+
+    def __str__(self):
+        return f"range({self.start}, {self.stop}, {self.step})"
+
+    __repr__ = __str__
+
+
+def iterate(value):
+    """Return a python iterator over the values `for (x in value)` visits
+
+    Generators give the values they yield, ranges their numbers, arrays
+    and vectors their elements and maps their keys. The keys of a LoxMap
+    are copied first, so that the loop body can change the map
+    """
+    kind = type(value)
+    if kind is LoxGenerator:
+        return value.frames
+    if kind is LoxRange:
+        return iter(value)
+    if kind is LoxArray or kind is PersistentVector:
+        return iter(value)
+    if kind is LoxMap:
+        return iter(list(value.entries))
+    if kind is PersistentMap:
+        return (key for key, _ in value.entries())
+    raise LoxRuntimeError(
+        msg=f"Only generators, ranges, arrays, maps and vectors can be iterated, not {value!r}"
+    )
@@ -0,0 +1,69 @@
+"""
+The map value: a hash table from numbers, strings, booleans and nil to
+any value
+
+A map is written `{key: value, ...}` and read and written with
+subscripts like arrays, pylox.arrays.get_item and set_item hand maps over
+to LoxMap. The entries are a python dict, so keys compare like
+ExpressionInterpreter's `==` and every access takes constant time
+"""
+from pylox.callable import LoxRuntimeError
+from pylox.rope import Rope
+
+_KEY_TYPES = frozenset((int, float, str, bool, type(None)))
+
+
+def map_key(value):
+    """Return `value` as a key of a map, raise a LoxRuntimeError when it cannot be one"""
+    kind = type(value)
+    if kind in _KEY_TYPES:
+        return value
+    if kind is Rope:
+        return str(value)
+    raise LoxRuntimeError(
+        msg=f"Map keys should be numbers, strings, booleans or nil, not {value!r}"
+    )
+
+
+class LoxMap:
+    """
+    A mutable table of entries, kept in insertion order
+
+    Args:
+        entries (dict): The entries, their keys already checked with map_key
+    """
+
+    __slots__ = ("entries",)
+
+    def __init__(self, entries=None):
+        self.entries = {} if entries is None else entries
+
+    def get_item(self, key):
+        """The value of `map[key]`, the key has to be in the map"""
+        try:
+            return self.entries[key]
+        except KeyError:
+            raise LoxRuntimeError(msg=f"Key {key!r} is not in the map")
+
+    def set_item(self, key, value):
+        """Store `value` in `map[key]` and return it"""
+        self.entries[map_key(key)] = value
+        return value
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __str__(self):
+        entries = ", ".join(f"{key}: {value}" for key, value in self.entries.items())
+        return "{" + entries + "}"
+
+    def __repr__(self):
+        return f"<map len={len(self.entries)}>"
+
+
+def build_map(items):
+    """The map of a `{...}` expression, `items` alternates keys and values"""
+    entries = {}
+    for position in range(0, len(items), 2):
+        entries[map_key(items[position])] = items[position + 1]
+    return LoxMap(entries)
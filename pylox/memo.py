@@ -0,0 +1,86 @@
+"""
+Memo tables of pure functions
+
+The Resolver marks a function `pure` when its result only depends on its
+arguments: it reads nothing but its parameters, its own locals and other
+pure global functions, assigns no outer variable and prints nothing.
+ExpressionInterpreter gives every pure function a Memo, and calls with
+number, string, boolean or nil arguments look their result up there
+before running the body
+"""
+from collections import OrderedDict
+
+# Default bound of every table, in entries
+MEMO_SIZE = 4096
+
+# Arguments and results that can be keyed and shared without changing
+# what a program observes
+_VALUE_TYPES = frozenset((int, float, str, bool, type(None)))
+
+# Returned by Memo.lookup when the table has no result for a key
+MISSING = object()
+
+
+def memo_key(arguments):
+    """Return the key of `arguments` in a memo table, None when they have none
+
+    Values that compare equal but print differently, like 1 and 1.0 or
+    0.0 and -0.0, get different keys
+    """
+    key = []
+    for argument in arguments:
+        kind = type(argument)
+        if kind not in _VALUE_TYPES:
+            return None
+        if kind is float and argument == 0:
+            argument = str(argument)
+        key.append(kind)
+        key.append(argument)
+    return tuple(key)
+
+
+class Memo:
+    """
+    The results of a pure function, bounded to the `maxsize` most recently
+    used ones, or unbounded when `maxsize` is None
+
+    Args:
+        name (str): The name of the function, for reports
+        maxsize (int): The number of results to keep
+    """
+
+    __slots__ = ("name", "maxsize", "hits", "misses", "_table")
+
+    def __init__(self, name, maxsize=MEMO_SIZE):
+        self.name = name
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._table = OrderedDict()
+
+    def lookup(self, key):
+        """Return the result stored for `key`, MISSING when there is none"""
+        value = self._table.get(key, MISSING)
+        if value is MISSING:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self._table.move_to_end(key)
+        return value
+
+    def store(self, key, value):
+        """Keep `value` as the result for `key`, results that are objects are not kept"""
+        if type(value) not in _VALUE_TYPES:
+            return
+        table = self._table
+        table[key] = value
+        if self.maxsize is not None and len(table) > self.maxsize:
+            table.popitem(last=False)
+
+    def __len__(self):
+        return len(self._table)
+
+    def __repr__(self):
+        return (
+            f"<memo {self.name} size={len(self)} hits={self.hits} misses={self.misses}>"
+        )
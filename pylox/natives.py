@@ -0,0 +1,299 @@
+"""
+The native library: functions implemented in python that every engine
+defines as globals when it is created
+
+More natives are added with `define_native(name, function, arity)` on an
+engine or on pylox.LoxIntepreter. Heavy work moves out of interpreted
+LOX by calling them
+"""
+import math
+import operator
+import time
+from itertools import repeat
+
+from pylox.arrays import LoxArray
+from pylox.callable import LoxRuntimeError, NativeFunction
+from pylox.iterators import LoxRange
+from pylox.maps import LoxMap, map_key
+from pylox.persistent import PersistentMap, PersistentVector
+
+
+def _number(name, value):
+    if not isinstance(value, (int, float)):
+        raise LoxRuntimeError(msg=f"{name} expects a number, not {value!r}")
+    return value
+
+
+def _string(name, value):
+    if not isinstance(value, str):
+        raise LoxRuntimeError(msg=f"{name} expects a string, not {value!r}")
+    return value
+
+
+def _index(name, value):
+    if not isinstance(value, (int, float)) or value != int(value):
+        raise LoxRuntimeError(msg=f"{name} expects a whole number, not {value!r}")
+    return int(value)
+
+
+def _array(name, value):
+    if type(value) is not LoxArray:
+        raise LoxRuntimeError(msg=f"{name} expects an array, not {value!r}")
+    return value
+
+
+def _map(name, value):
+    if type(value) is not LoxMap:
+        raise LoxRuntimeError(msg=f"{name} expects a map, not {value!r}")
+    return value.entries
+
+
+def _same_length(name, left, right):
+    if len(left) != len(right):
+        raise LoxRuntimeError(
+            msg=f"{name} expects arrays of the same length, not {len(left)} and {len(right)}"
+        )
+
+
+def _unary(name, function):
+    return lambda value: function(_number(name, value))
+
+
+def _binary(name, function):
+    return lambda left, right: function(_number(name, left), _number(name, right))
+
+
+def clock():
+    """Seconds elapsed since an arbitrary point, for timing"""
+    return time.perf_counter()
+
+
+def to_string(value):
+    """The text `print` writes for `value`"""
+    return str(value)
+
+
+# Values whose length `len` returns
+_SIZED = frozenset((LoxArray, LoxRange, LoxMap, PersistentMap, PersistentVector))
+
+
+def length(value):
+    if type(value) in _SIZED:
+        return len(value)
+    return len(_string("len", value))
+
+
+def substr(string, start, end):
+    """The characters of `string` from `start` up to `end` excluded, negative
+    positions count from the end like python slices"""
+    return _string("substr", string)[_index("substr", start) : _index("substr", end)]
+
+
+def fixed(number, digits):
+    """`number` written with `digits` digits after the decimal point"""
+    return f"{_number('fixed', number):.{_index('fixed', digits)}f}"
+
+
+def to_number(string):
+    """The number written in `string`"""
+    string = _string("num", string)
+    try:
+        return int(string)
+    except ValueError:
+        pass
+    try:
+        return float(string)
+    except ValueError:
+        raise LoxRuntimeError(msg=f"num cannot read a number from {string!r}")
+
+
+def new_array(length):
+    """An array of `length` zeros"""
+    length = _index("array", length)
+    if length < 0:
+        raise LoxRuntimeError(msg=f"array expects a length of 0 or more, not {length}")
+    return LoxArray.zeros(length)
+
+
+def new_range(start, stop, step):
+    """The numbers from `start` up to `stop` excluded, `step` apart, computed
+    as `for (x in ...)` asks for them"""
+    for value in (start, stop, step):
+        if not math.isfinite(_number("range", value)):
+            raise LoxRuntimeError(msg=f"range expects finite numbers, not {value!r}")
+    if step == 0:
+        raise LoxRuntimeError(msg="range expects a step other than 0")
+    return LoxRange(start, stop, step)
+
+
+def copy(values):
+    """A new array with the elements of `values`, which a slice only views"""
+    return LoxArray.of(_array("copy", values).data)
+
+
+def _elementwise(name, function):
+    """The native applying `function` to the elements of an array and to
+    those of another array of the same length, or to a number"""
+
+    def elementwise(left, right):
+        left = _array(name, left).data
+        if type(right) is LoxArray:
+            _same_length(name, left, right)
+            right = right.data
+        else:
+            right = repeat(_number(name, right))
+        return LoxArray.of(map(function, left, right))
+
+    return elementwise
+
+
+def total(values):
+    """The sum of the elements of the array or range `values`"""
+    if type(values) is LoxRange:
+        return sum(values)
+    return sum(_array("sum", values).data)
+
+
+def dot(left, right):
+    """The dot product of two arrays of the same length"""
+    left = _array("dot", left)
+    right = _array("dot", right)
+    _same_length("dot", left, right)
+    return sum(map(operator.mul, left.data, right.data))
+
+
+def map_array(function, values):
+    """A new array with the results of the native `function` on every element"""
+    if type(function) is not NativeFunction or function.arity != 1:
+        raise LoxRuntimeError(msg="map expects a native function of 1 argument")
+    return LoxArray.of(map(function.function, _array("map", values).data))
+
+
+def get_entry(table, key):
+    """The value of `key` in the map `table`, nil when it has none"""
+    if type(table) is PersistentMap:
+        return table.get(key)
+    return _map("get", table).get(key)
+
+
+def set_entry(table, key, value):
+    """Store `value` under `key` in the map `table` and return it"""
+    _map("set", table)[map_key(key)] = value
+    return value
+
+
+def has_entry(table, key):
+    if type(table) is PersistentMap:
+        return table.has(key)
+    return key in _map("has", table)
+
+
+def delete_entry(table, key):
+    """Remove `key` from the map `table`, return its value or nil"""
+    return _map("delete", table).pop(key, None)
+
+
+def keys(table):
+    """The keys of the map `table` in insertion order, as a map from 0, 1,
+    2... to the keys, walked with a counter and `len`. The keys of a
+    persistent map are a persistent vector"""
+    if type(table) is PersistentMap:
+        names = PersistentVector()
+        for key, _ in table.entries():
+            names = names.push(key)
+        return names
+    return LoxMap(dict(enumerate(_map("keys", table))))
+
+
+def persistent_map():
+    """An empty persistent map"""
+    return PersistentMap()
+
+
+def persistent_vector():
+    """An empty persistent vector"""
+    return PersistentVector()
+
+
+def _persistent(name, value, *kinds):
+    if type(value) not in kinds:
+        raise LoxRuntimeError(msg=f"{name} expects a persistent value, not {value!r}")
+    return value
+
+
+def assoc(collection, key, value):
+    """A new version of the persistent map or vector `collection` with
+    `value` under `key`, the length of a vector appends"""
+    collection = _persistent("assoc", collection, PersistentMap, PersistentVector)
+    if type(collection) is PersistentMap:
+        return collection.assoc(key, value)
+    try:
+        return collection.assoc(_index("assoc", key), value)
+    except IndexError:
+        raise LoxRuntimeError(
+            msg=f"assoc: index {key} is out of range for length {len(collection)}"
+        )
+
+
+def dissoc(table, key):
+    """A new version of the persistent map `table` without `key`"""
+    return _persistent("dissoc", table, PersistentMap).dissoc(key)
+
+
+def push(vector, value):
+    """A new version of the persistent vector `vector` with `value` appended"""
+    return _persistent("push", vector, PersistentVector).push(value)
+
+
+def pop(vector):
+    """A new version of the persistent vector `vector` without its last element"""
+    return _persistent("pop", vector, PersistentVector).pop()
+
+
+# name -> (function, arity)
+LIBRARY = {
+    "clock": (clock, 0),
+    "abs": (_unary("abs", abs), 1),
+    "floor": (_unary("floor", math.floor), 1),
+    "ceil": (_unary("ceil", math.ceil), 1),
+    "sqrt": (_unary("sqrt", math.sqrt), 1),
+    "exp": (_unary("exp", math.exp), 1),
+    "log": (_unary("log", math.log), 1),
+    "sin": (_unary("sin", math.sin), 1),
+    "cos": (_unary("cos", math.cos), 1),
+    "tan": (_unary("tan", math.tan), 1),
+    "atan": (_unary("atan", math.atan), 1),
+    "pow": (_binary("pow", math.pow), 2),
+    "min": (_binary("min", min), 2),
+    "max": (_binary("max", max), 2),
+    "str": (to_string, 1),
+    "len": (length, 1),
+    "substr": (substr, 3),
+    "fixed": (fixed, 2),
+    "num": (to_number, 1),
+    "array": (new_array, 1),
+    "range": (new_range, 3),
+    "copy": (copy, 1),
+    "add": (_elementwise("add", operator.add), 2),
+    "mul": (_elementwise("mul", operator.mul), 2),
+    "sum": (total, 1),
+    "dot": (dot, 2),
+    "map": (map_array, 2),
+    "get": (get_entry, 2),
+    "set": (set_entry, 3),
+    "has": (has_entry, 2),
+    "delete": (delete_entry, 2),
+    "keys": (keys, 1),
+    "pmap": (persistent_map, 0),
+    "pvec": (persistent_vector, 0),
+    "assoc": (assoc, 3),
+    "dissoc": (dissoc, 2),
+    "push": (push, 2),
+    "pop": (pop, 1),
+}
+
+
+def install(define_native):
+    """Define every function of LIBRARY with `define_native(name, function, arity)`"""
+    for name, (function, arity) in LIBRARY.items():
+        define_native(name, function, arity)
@@ -0,0 +1,438 @@
+"""
+Optimization passes over resolved programs
+
+A pass takes the statements of a program and returns equivalent ones that
+are cheaper to run. Passes run after pylox.resolver.Resolver has checked
+the program, so errors are still reported for code that gets optimized
+away, and may move variables between scopes, so the program has to be
+resolved again afterwards. LoxIntepreter runs every pass in PASSES unless
+optimizations are turned off with -O0
+"""
+import math
+from typing import List
+
+from pylox.expr import Assign, Binary, Literal, Variable
+from pylox.stmt import (
+    Block,
+    Class,
+    CountedLoop,
+    Expression,
+    ForIn,
+    Function,
+    Stmt,
+    Var,
+    While,
+    Yield,
+)
+from pylox.tokens import TokenType
+from pylox.tree import walk
+from pylox.values import _is_number, _isEqual, _isTruthy
+from pylox.visitor import Visitor
+
+# Returned by _fold when the operation has to be left to run time
+_UNFOLDED = object()
+
+
+def _declares(statements):
+    """Return True when `statements` define a variable, function or class"""
+    return any(
+        isinstance(statement, (Var, Function, Class)) for statement in statements
+    )
+
+
+def _fold_unary(type_, right):
+    if type_ == TokenType.BANG:
+        return not _isTruthy(right)
+    if _is_number(right):
+        return -(float(right))
+    return _UNFOLDED
+
+
+def _fold_binary(type_, left, right):
+    """Evaluate `left <type_> right` like ExpressionInterpreter does
+
+    Operations that raise a runtime error, and the comparisons python
+    refuses between their operand types, are not folded
+    """
+    if type_ == TokenType.EQUAL_EQUAL:
+        return _isEqual(left, right)
+    if type_ == TokenType.BANG_EQUAL:
+        return not _isEqual(left, right)
+    if type_ == TokenType.PLUS and isinstance(left, str):
+        return left + str(right)
+    if type_ in _COMPARISONS:
+        if not (
+            (_is_number(left) and _is_number(right))
+            or (isinstance(left, str) and isinstance(right, str))
+        ):
+            return _UNFOLDED
+        return _COMPARISONS[type_](left, right)
+    if not (_is_number(left) and _is_number(right)):
+        return _UNFOLDED
+    if type_ == TokenType.PLUS:
+        return left + right
+    if type_ == TokenType.SLASH and float(right) == 0:
+        return _UNFOLDED
+    return _ARITHMETIC[type_](float(left), float(right))
+
+
+_COMPARISONS = {
+    TokenType.GREATER: lambda left, right: left > right,
+    TokenType.GREATER_EQUAL: lambda left, right: left >= right,
+    TokenType.LESS: lambda left, right: left < right,
+    TokenType.LESS_EQUAL: lambda left, right: left <= right,
+}
+
+_ARITHMETIC = {
+    TokenType.MINUS: lambda left, right: left - right,
+    TokenType.STAR: lambda left, right: left * right,
+    TokenType.SLASH: lambda left, right: left / right,
+}
+
+
+def _literal(value):
+    # Literals are repr'd into transpiled python, which has no inf or nan
+    if value is _UNFOLDED or (isinstance(value, float) and not math.isfinite(value)):
+        return None
+    return Literal(value=value)
+
+
+class Optimizer(Visitor):
+    """
+    Simplify a resolved program:
+
+    - arithmetic, comparisons and string concatenation of literals are
+      folded into a literal
+    - `if` statements whose condition is a literal keep the branch that is
+      taken, `while` loops whose condition is a falsy literal are removed
+    - blocks that declare nothing are spliced into the enclosing statements,
+      or marked `flat` where a single statement is expected, so running
+      them creates no environment
+    - groupings are dropped, the shape of the tree already holds precedence
+
+    Nodes are rewritten in place, every visit returns the node replacing
+    the one visited, None for a statement that is removed
+    """
+
+    def optimize(self, statements: List["Stmt"]):
+        return self._statements(statements)
+
+    def _statements(self, statements):
+        optimized = []
+        for statement in statements:
+            statement = statement.accept(self)
+            if statement is None:
+                continue
+            if isinstance(statement, Block) and not _declares(statement.statements):
+                optimized.extend(statement.statements)
+            else:
+                optimized.append(statement)
+        return optimized
+
+    def _statement(self, statement):
+        """Optimize a statement that cannot be replaced by several"""
+        statement = statement.accept(self)
+        if statement is None:
+            statement = Block(statements=[])
+        if isinstance(statement, Block) and not _declares(statement.statements):
+            if len(statement.statements) == 1:
+                return statement.statements[0]
+            statement.flat = True
+        return statement
+
+    def visit_literal_expr(self, expr: "Expr"):
+        return expr
+
+    def visit_grouping_expr(self, expr: "Expr"):
+        return expr.expression.accept(self)
+
+    def visit_unary_expr(self, expr: "Expr"):
+        expr.right = expr.right.accept(self)
+        if isinstance(expr.right, Literal):
+            folded = _literal(_fold_unary(expr.operator.type_, expr.right.value))
+            if folded is not None:
+                return folded
+        return expr
+
+    def visit_binary_expr(self, expr: "Expr"):
+        expr.left = expr.left.accept(self)
+        expr.right = expr.right.accept(self)
+        if isinstance(expr.left, Literal) and isinstance(expr.right, Literal):
+            folded = _literal(
+                _fold_binary(expr.operator.type_, expr.left.value, expr.right.value)
+            )
+            if folded is not None:
+                return folded
+        return expr
+
+    def visit_logical_expr(self, expr: "Expr"):
+        expr.left = expr.left.accept(self)
+        expr.right = expr.right.accept(self)
+        if isinstance(expr.left, Literal):
+            if _isTruthy(expr.left.value) == (expr.operator == TokenType.OR):
+                return expr.left
+            return expr.right
+        return expr
+
+    def visit_variable_expr(self, expr: "Expr"):
+        return expr
+
+    def visit_assign_expr(self, expr: "Expr"):
+        expr.to_assign = expr.to_assign.accept(self)
+        return expr
+
+    def visit_call_expr(self, expr: "Expr"):
+        expr.callee = expr.callee.accept(self)
+        expr.arguments = [argument.accept(self) for argument in expr.arguments]
+        return expr
+
+    def visit_subscript_expr(self, expr: "Expr"):
+        expr.object = expr.object.accept(self)
+        expr.index = expr.index.accept(self)
+        return expr
+
+    def visit_setsubscript_expr(self, expr: "Expr"):
+        expr.object = expr.object.accept(self)
+        expr.index = expr.index.accept(self)
+        expr.value = expr.value.accept(self)
+        return expr
+
+    def visit_slice_expr(self, expr: "Expr"):
+        expr.object = expr.object.accept(self)
+        if expr.start is not None:
+            expr.start = expr.start.accept(self)
+        if expr.stop is not None:
+            expr.stop = expr.stop.accept(self)
+        return expr
+
+    def visit_map_expr(self, expr: "Expr"):
+        expr.keys = [key.accept(self) for key in expr.keys]
+        expr.values = [value.accept(self) for value in expr.values]
+        return expr
+
+    def visit_get_expr(self, expr: "Expr"):
+        expr.object = expr.object.accept(self)
+        return expr
+
+    def visit_set_expr(self, expr: "Expr"):
+        expr.object = expr.object.accept(self)
+        expr.value = expr.value.accept(self)
+        return expr
+
+    def visit_this_expr(self, expr: "Expr"):
+        return expr
+
+    def visit_super_expr(self, expr: "Expr"):
+        return expr
+
+    def visit_print_stmt(self, stmt: "Stmt"):
+        stmt.expression = stmt.expression.accept(self)
+        return stmt
+
+    def visit_expression_stmt(self, stmt: "Stmt"):
+        stmt.expression = stmt.expression.accept(self)
+        return stmt
+
+    def visit_var_stmt(self, stmt: "Stmt"):
+        if stmt.initialiser is not None:
+            stmt.initialiser = stmt.initialiser.accept(self)
+        return stmt
+
+    def visit_block_stmt(self, stmt: "Stmt"):
+        stmt.statements = self._statements(stmt.statements)
+        return stmt
+
+    def visit_if_stmt(self, stmt: "Stmt"):
+        stmt.condition = stmt.condition.accept(self)
+        if isinstance(stmt.condition, Literal):
+            if _isTruthy(stmt.condition.value):
+                return stmt.then_branch.accept(self)
+            if stmt.else_branch:
+                return stmt.else_branch.accept(self)
+            return None
+        stmt.then_branch = self._statement(stmt.then_branch)
+        if stmt.else_branch:
+            stmt.else_branch = self._statement(stmt.else_branch)
+        return stmt
+
+    def visit_while_stmt(self, stmt: "Stmt"):
+        stmt.condition = stmt.condition.accept(self)
+        if isinstance(stmt.condition, Literal) and not _isTruthy(stmt.condition.value):
+            return None
+        stmt.statement = self._statement(stmt.statement)
+        return stmt
+
+    def visit_forin_stmt(self, stmt: "Stmt"):
+        stmt.iterable = stmt.iterable.accept(self)
+        stmt.body = self._statement(stmt.body)
+        return stmt
+
+    def visit_function_stmt(self, stmt: "Stmt"):
+        stmt.body = self._statements(stmt.body)
+        return stmt
+
+    def visit_class_stmt(self, stmt: "Stmt"):
+        stmt.methods = [method.accept(self) for method in stmt.methods]
+        return stmt
+
+    def visit_return_stmt(self, stmt: "Stmt"):
+        if stmt.value is not None:
+            stmt.value = stmt.value.accept(self)
+        return stmt
+
+    def visit_yield_stmt(self, stmt: "Stmt"):
+        if stmt.value is not None:
+            stmt.value = stmt.value.accept(self)
+        return stmt
+
+    def visit_countedloop_stmt(self, stmt: "Stmt"):
+        stmt.condition = stmt.condition.accept(self)
+        stmt.statement = self._statement(stmt.statement)
+        stmt.increment = stmt.increment.accept(self)
+        return stmt
+
+
+# The comparisons a counted loop may test its counter with
+_COUNTED_COMPARISONS = frozenset(
+    (
+        TokenType.LESS,
+        TokenType.LESS_EQUAL,
+        TokenType.GREATER,
+        TokenType.GREATER_EQUAL,
+        TokenType.BANG_EQUAL,
+    )
+)
+
+
+def _binds(node, name):
+    """Return True when `node` may assign or declare a variable called `name`
+
+    Nested functions are searched too, whatever variable they would see
+    """
+    for child in walk(node):
+        kind = type(child)
+        if kind is Assign and child.assign_to.lexeme == name:
+            return True
+        if kind is Var and child.name == name:
+            return True
+        if kind is Function and (
+            child.name.name.lexeme == name
+            or any(param.name.lexeme == name for param in child.params)
+        ):
+            return True
+        if kind is ForIn and child.name.lexeme == name:
+            return True
+        if kind is Class and child.name.lexeme == name:
+            return True
+    return False
+
+
+def _step(statement, name):
+    """The number `statement` adds to `name` when it is `name = name + number;`"""
+    if type(statement) is not Expression or type(statement.expression) is not Assign:
+        return None
+    assign = statement.expression
+    value = assign.to_assign
+    if (
+        assign.assign_to.lexeme != name
+        or type(value) is not Binary
+        or value.operator.type_ != TokenType.PLUS
+        or type(value.left) is not Variable
+        or value.left.name.lexeme != name
+        or type(value.right) is not Literal
+        or not _is_number(value.right.value)
+    ):
+        return None
+    return value.right.value
+
+
+def _counted(loop):
+    """The CountedLoop running the `while` loop `loop`, or None when it is
+    not counted"""
+    condition = loop.condition
+    if (
+        type(condition) is not Binary
+        or condition.operator.type_ not in _COUNTED_COMPARISONS
+        or type(condition.left) is not Variable
+        or condition.left.depth is None
+    ):
+        return None
+    name = condition.left.name.lexeme
+    body = loop.statement
+    statements = body.statements if type(body) is Block else [body]
+    if not statements:
+        return None
+    step = _step(statements[-1], name)
+    rest = statements[:-1]
+    if (
+        step is None
+        or _binds(condition.right, name)
+        or any(_binds(statement, name) for statement in rest)
+        or any(type(node) is Yield for statement in rest for node in walk(statement))
+    ):
+        return None
+
+    # A declaration left alone in the body still needs the scope of its block
+    if len(rest) == 1 and not _declares(rest):
+        body = rest[0]
+    else:
+        flat = body.flat if type(body) is Block else True
+        body = Block(statements=rest)
+        body.flat = flat and not _declares(rest)
+    counted = CountedLoop(
+        condition=condition, statement=body, increment=statements[-1].expression
+    )
+    counted.step = step
+    return counted
+
+
+class CountedLoops:
+    """
+    Turn counted `while` loops into CountedLoop statements
+
+    A loop is counted when, like the loops `for (var i = 0; i < n; i = i + 1)`
+    desugars to, its condition compares a local variable with `<`, `<=`,
+    `>`, `>=` or `!=`, the last statement of its body adds a number literal
+    to that variable, and nothing else in the condition or the body may
+    assign or declare it. Engines can then compare and step the counter
+    as a python number instead of evaluating the condition and increment
+    expressions; they fall back to doing so when the counter stops being
+    a number. Loops whose body yields are left alone
+    """
+
+    def optimize(self, statements: List["Stmt"]):
+        return [self._rewrite(statement) for statement in statements]
+
+    def _rewrite(self, statement):
+        for field in type(statement)._fields:
+            value = getattr(statement, field)
+            if isinstance(value, list):
+                value = [
+                    self._rewrite(item) if isinstance(item, Stmt) else item
+                    for item in value
+                ]
+            elif isinstance(value, Stmt):
+                value = self._rewrite(value)
+            setattr(statement, field, value)
+        if type(statement) is While:
+            return _counted(statement) or statement
+        return statement
+
+
+PASSES = (Optimizer, CountedLoops)
+
+
+def optimize(statements: List["Stmt"], passes=PASSES):
+    """Run every pass of `passes` over `statements`
+
+    Args:
+        statements (List[Stmt]): A resolved program
+        passes (Iterable[type]): Classes whose instances have an
+            `optimize(statements)` method returning the new statements
+
+    Returns:
+        List[Stmt]: The optimized program, which has to be resolved again
+    """
+    for pass_ in passes:
+        statements = pass_().optimize(statements)
+    return statements
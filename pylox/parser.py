@@ -1,8 +1,37 @@
-from typing import List
-
-from pylox.expr import Assign, Binary, Call, Grouping, Literal, Logical, Unary, Variable
-from pylox.scanner import LoxToken, error
-from pylox.stmt import Block, Expression, Function, If, Print, Return, Var, While
+from typing import Iterable, List, Union
+
+from pylox.expr import (
+    Assign,
+    Binary,
+    Call,
+    Get,
+    Grouping,
+    Literal,
+    Logical,
+    Map,
+    Set,
+    SetSubscript,
+    Slice,
+    Subscript,
+    Super,
+    This,
+    Unary,
+    Variable,
+)
+from pylox.scanner import LoxToken, TokenBuffer, error
+from pylox.stmt import (
+    Block,
+    Class,
+    Expression,
+    ForIn,
+    Function,
+    If,
+    Print,
+    Return,
+    Var,
+    While,
+    Yield,
+)
 from pylox.tokens import TokenType
 
 
@@ -15,6 +44,231 @@ class ParserError(Exception):
         self.message = message
 
 
+class Precedence:
+    """
+    Binding power of the operators, from loosest to tightest
+    """
+
+    NONE = 0
+    ASSIGNMENT = 1
+    OR = 2
+    AND = 3
+    EQUALITY = 4
+    COMPARISON = 5
+    TERM = 6
+    FACTOR = 7
+    UNARY = 8
+    CALL = 9
+
+
+def _binary(left, token, right):
+    return Binary(left=left, operator=token, right=right)
+
+
+def _or(left, token, right):
+    return Logical(operator=TokenType.OR, left=left, right=right)
+
+
+def _and(left, token, right):
+    return Logical(operator=TokenType.AND, left=left, right=right)
+
+
+def _assign(left, token, right):
+    if type(left) is Subscript:
+        return SetSubscript(
+            object=left.object, bracket=left.bracket, index=left.index, value=right
+        )
+    if type(left) is Get:
+        return Set(object=left.object, name=left.name, value=right)
+    # The target is the token before "=", whatever expression it ends
+    return Assign(assign_to=token, to_assign=right)
+
+
+# What the parser does with a token found where an operand is expected
+_UNARY = 1
+_GROUPING = 2
+_LITERAL = 3
+_VARIABLE = 4
+_MAP = 5
+_THIS = 6
+_SUPER = 7
+
+_PREFIX = {
+    TokenType.BANG: _UNARY,
+    TokenType.MINUS: _UNARY,
+    TokenType.LEFT_PAREN: _GROUPING,
+    TokenType.TRUE: _LITERAL,
+    TokenType.FALSE: _LITERAL,
+    TokenType.NIL: _LITERAL,
+    TokenType.NUMBER: _LITERAL,
+    TokenType.STRING: _LITERAL,
+    TokenType.IDENTIFIER: _VARIABLE,
+    TokenType.LEFT_BRACE: _MAP,
+    TokenType.THIS: _THIS,
+    TokenType.SUPER: _SUPER,
+}
+
+# Precedence and node builder of every binary operator
+_INFIX = {
+    TokenType.EQUAL: (Precedence.ASSIGNMENT, _assign),
+    TokenType.OR: (Precedence.OR, _or),
+    TokenType.AND: (Precedence.AND, _and),
+    TokenType.BANG_EQUAL: (Precedence.EQUALITY, _binary),
+    TokenType.EQUAL_EQUAL: (Precedence.EQUALITY, _binary),
+    TokenType.LESS: (Precedence.COMPARISON, _binary),
+    TokenType.LESS_EQUAL: (Precedence.COMPARISON, _binary),
+    TokenType.GREATER: (Precedence.COMPARISON, _binary),
+    TokenType.GREATER_EQUAL: (Precedence.COMPARISON, _binary),
+    TokenType.PLUS: (Precedence.TERM, _binary),
+    TokenType.MINUS: (Precedence.TERM, _binary),
+    TokenType.STAR: (Precedence.FACTOR, _binary),
+    TokenType.SLASH: (Precedence.FACTOR, _binary),
+}
+
+# "and" nests to the right, like assignment: a and (b and c)
+_RIGHT_ASSOCIATIVE = {Precedence.ASSIGNMENT, Precedence.AND}
+
+# Where the expression of an _ExpressionFrame ends
+_TOP = 0
+_CALL = 1
+_SUBSCRIPT = 3
+
+
+class _ExpressionFrame:
+    """
+    The operands and operators of one expression being parsed: the whole
+    expression, the inside of parentheses, one call argument, one bound
+    of a subscript or one key or value of a map
+    """
+
+    __slots__ = ("context", "operands", "operators", "callee", "arguments", "token")
+
+    def __init__(self, context, callee=None, token=None):
+        self.context = context
+        self.operands = []
+        # (precedence, builder, token), the builder is None for unary operators
+        self.operators = []
+        # The called or subscripted expression
+        self.callee = callee
+        # Call arguments, the start of a slice, or the keys and values of a map
+        self.arguments = []
+        # The "[" of a subscript or the "{" of a map
+        self.token = token
+
+    def reduce(self, operand, precedence):
+        """Apply the waiting operators that bind tighter than `precedence`
+
+        Args:
+            operand (Expr): The right operand of the innermost operator
+
+        Returns:
+            Expr: The expression left once those operators are applied
+        """
+        operators = self.operators
+        while operators and operators[-1][0] > precedence:
+            _, build, token = operators.pop()
+            if build is None:
+                operand = Unary(operator=token, right=operand)
+            else:
+                operand = build(self.operands.pop(), token, operand)
+        return operand
+
+    def subscript(self, last):
+        """The subscript or slice ending with the bound `last`"""
+        if self.arguments:
+            return Slice(
+                object=self.callee,
+                bracket=self.token,
+                start=self.arguments[0],
+                stop=last,
+            )
+        return Subscript(object=self.callee, bracket=self.token, index=last)
+
+
+def _returns(statement):
+    """Yield the `return` statements of `statement`, leaving out those of
+    the functions it declares"""
+    kind = type(statement)
+    if kind is Return:
+        yield statement
+    elif kind is Block:
+        for inner in statement.statements:
+            yield from _returns(inner)
+    elif kind is If:
+        yield from _returns(statement.then_branch)
+        if statement.else_branch:
+            yield from _returns(statement.else_branch)
+    elif kind is While:
+        yield from _returns(statement.statement)
+    elif kind is ForIn:
+        yield from _returns(statement.body)
+
+
+def _this(token):
+    """A `this` expression where `token` is, for code the parser adds"""
+    keyword = LoxToken(
+        type_=TokenType.THIS,
+        lexeme="this",
+        literal=None,
+        line=token.line,
+        offset=token.offset,
+    )
+    return This(keyword=keyword)
+
+
+class TokenList:
+    """
+    Adapts a list of LoxToken to the interface of pylox.scanner.TokenBuffer
+    """
+
+    def __init__(self, tokens: List[LoxToken]):
+        self._tokens = tokens
+
+    def __getitem__(self, index):
+        return self._tokens[index]
+
+    def kind(self, index):
+        try:
+            return self[index].type_
+        except IndexError:
+            return TokenType.EOF
+
+    def line(self, index):
+        try:
+            return self[index].line
+        except IndexError:
+            return None
+
+
+class TokenWindow(TokenList):
+    """
+    Tokens pulled lazily from an iterator, indexable like a list
+
+    Parser only ever looks at the current token and the previous one, or
+    at the current token and the next one to tell a for-in loop apart, so
+    the window keeps two tokens and forgets everything before them
+    """
+
+    def __init__(self, tokens: Iterable[LoxToken]):
+        self._tokens = iter(tokens)
+        self._window = []
+        # Index of the first token in the window
+        self._first = 0
+
+    def __getitem__(self, index):
+        if index < self._first:
+            raise IndexError(f"token {index} is no longer available")
+        while index >= self._first + len(self._window):
+            token = next(self._tokens, None)
+            if token is None:
+                raise IndexError(f"token {index} is past the end of the source")
+            self._window.append(token)
+            if len(self._window) > 2:
+                del self._window[0]
+                self._first += 1
+        return self._window[index - self._first]
+
+
 class Parser:
     """
 
@@ -24,21 +278,25 @@ class Parser:
     ========
 
     program -> declaration* EOF ;
-    declaration -> varDeclaration | statement | func_declaration ;
-    func_declaration -> "fun" + "(" parameters? ")" block ;
+    declaration -> class_declaration | varDeclaration | statement | func_declaration ;
+    class_declaration -> "class" IDENTIFIER ( "<" IDENTIFIER )? "{" function* "}" ;
+    func_declaration -> "fun" function ;
+    function -> IDENTIFIER "(" parameters? ")" block ;
     parameters -> IDENTIFIER ("," IDENTIFIER)* ;
-    statement -> expressionStmt | printStatement | block | if_stmt | while_stmt | for_stmt | return_stmt ;
+    statement -> expressionStmt | printStatement | block | if_stmt | while_stmt | for_stmt | for_in_stmt | return_stmt | yield_stmt ;
     return_stmt -> "return" expression? ";" ;
+    yield_stmt -> "yield" expression? ";" ;
     if_stmt -> "if" + "(" expression ")" statement ("else" statement)? ;
     while_stmt -> "while" + "(" expression ")" statement;
     for_stmt -> "for" + "(" ( varDeclaration | expressionStmt | ";" ) +  expression? ";" + expression? ")" statement ;
+    for_in_stmt -> "for" + "(" IDENTIFIER "in" expression ")" statement ;
     varDeclaration -> "var" IDENTIFIER ( "=" expression )? ";" ;
     block -> "{" declaration* "}" ;
     expressionStmt -> expression ";" ;
     printStatement -> print expression ";" ;
 
     expression -> assignment ;
-    assignment -> IDENTIFIER "=" assignment | logic_or ;
+    assignment -> ( IDENTIFIER | call "[" expression "]" | call "." IDENTIFIER ) "=" assignment | logic_or ;
 
     logic_or -> logic_and ( "or" logic_and )* ;
     logic_and -> equality ( "and" logic_and )* ;
@@ -48,9 +306,15 @@ class Parser:
     term -> factor ( ("-" | "+") factor)* ;
     factor -> unary ( ("*" | "/") unary)* ;
     unary ->("!" | "-") unary | call ;
-    call -> primary ("(" arguments ")")*
+    call -> primary ("(" arguments ")" | "[" subscript "]" | "." IDENTIFIER )*
     arguments -> expression ( "," expression)*
-    primary -> NUMBER | STRING | "true" | "false" | "nil" | "(" expression ")" ;
+    subscript -> expression | expression? ":" expression? ;
+    primary -> NUMBER | STRING | "true" | "false" | "nil" | "this" | "super" "." IDENTIFIER | "(" expression ")" | map ;
+    map -> "{" ( entry ( "," entry )* ","? )? "}" ;
+    entry -> expression ":" expression ;
+
+    Expressions are parsed by precedence climbing over the _PREFIX and
+    _INFIX tables rather than one method per rule, see Precedence
     '''
     A parser has two responsibilities:
     a) Given a valid sequence of tokens, produce a corresponding syntaxt tree
@@ -58,17 +322,32 @@ class Parser:
     '''
     """
 
-    def __init__(self, tokens: List[LoxToken]):
+    def __init__(self, tokens: Union[List[LoxToken], TokenBuffer, TokenList]):
+        if isinstance(tokens, list):
+            tokens = TokenList(tokens)
         self._tokens = tokens
         self.current = 0
-        self.line = 0
+        # Kind of the current token, checked without building a LoxToken
+        self._current_kind = tokens.kind(0)
+
+    @property
+    def line(self):
+        """The line of the current token, or of the last one at the end"""
+        if self.current == 0:
+            return 0
+        line = self._tokens.line(self.current)
+        if line is None:
+            return self._tokens.line(self.current - 1)
+        return line
 
     def parse(self):
-        statements = []
+        return list(self.parse_declarations())
+
+    def parse_declarations(self):
+        """Yield the top level declarations, each one as soon as it is parsed"""
         try:
             while not (self.is_at_end()):
-                statements.append(self.declaration())
-            return statements
+                yield self.declaration()
         except ParserError as e:
             error(self.line, message="Encountered parse error")
             raise e
@@ -77,6 +356,8 @@ class Parser:
         try:
             if self.match(TokenType.VAR):
                 return self.var_declaration()
+            elif self.match(TokenType.CLASS):
+                return self.class_declaration()
             elif self.match(TokenType.FUN):
                 return self.func_declaration()
             return self.statement()
@@ -86,9 +367,8 @@ class Parser:
             raise e
 
     def var_declaration(self):
-        name = self.consume(
-            type_=TokenType.IDENTIFIER, msg="Expected identifier"
-        ).lexeme
+        self.consume(type_=TokenType.IDENTIFIER, msg="Expected identifier")
+        name = self._previous().lexeme
 
         initialiser = None
         if self.match(TokenType.EQUAL):
@@ -114,7 +394,7 @@ class Parser:
         if not self._check(TokenType.RIGHT_PAREN):
             parameters.append(self.identifier())
             while self.match(TokenType.COMMA):
-                parameters.append(self.identifiier())
+                parameters.append(self.identifier())
         self.consume(
             TokenType.RIGHT_PAREN,
             "right parenthesis is required after function declaration",
@@ -124,6 +404,46 @@ class Parser:
         body = self.block()
         return Function(name=name, body=body, params=parameters)
 
+    def class_declaration(self):
+        """
+        class_declaration -> "class" IDENTIFIER ( "<" IDENTIFIER )? "{" function* "}" ;
+
+        `init` methods return `this`: a `return;` in their body becomes
+        `return this;` and one more is added at its end
+        """
+        self.consume(TokenType.IDENTIFIER, "Expected class name")
+        name = self._previous()
+        superclass = None
+        if self.match(TokenType.LESS):
+            self.consume(TokenType.IDENTIFIER, "Expected superclass name")
+            superclass = Variable(name=self._previous())
+        self.consume(
+            TokenType.LEFT_BRACE, f"Expected '{{' before the body of {name.lexeme}"
+        )
+        methods = []
+        while not self._check(TokenType.RIGHT_BRACE) and not self.is_at_end():
+            if not self._check(TokenType.IDENTIFIER):
+                self.error(self.peek(), msg="Expected method name")
+            method = self.func_declaration()
+            if method.name.name.lexeme == "init":
+                self._initializer(method)
+            methods.append(method)
+        self.consume(
+            TokenType.RIGHT_BRACE, f"Expected '}}' after the body of {name.lexeme}"
+        )
+        return Class(name=name, superclass=superclass, methods=methods)
+
+    def _initializer(self, method):
+        for statement in method.body:
+            for return_ in _returns(statement):
+                if return_.value is not None:
+                    self.error(
+                        return_.keyword, msg="Can't return a value from an initializer"
+                    )
+                return_.value = _this(return_.keyword)
+        keyword = method.name.name
+        method.body.append(Return(keyword=keyword, value=_this(keyword)))
+
     def statement(self):
         if self.match(TokenType.PRINT):
             return self.print_statement()
@@ -137,16 +457,28 @@ class Parser:
             return self.for_stmt()
         if self.match(TokenType.RETURN):
             return self.return_stmt()
+        if self.match(TokenType.YIELD):
+            return self.yield_stmt()
         return self.expression_statement()
 
     def return_stmt(self):
         keyword = self._previous()
+        value = None
         if not self._check(TokenType.SEMICOLON):
             value = self.expression()
         self.consume(TokenType.SEMICOLON, msg="expect semicolon after return statement")
 
         return Return(keyword=keyword, value=value)
 
+    def yield_stmt(self):
+        keyword = self._previous()
+        value = None
+        if not self._check(TokenType.SEMICOLON):
+            value = self.expression()
+        self.consume(TokenType.SEMICOLON, msg="expect semicolon after yield statement")
+
+        return Yield(keyword=keyword, value=value)
+
     def for_stmt(self):
         """Parse a "for" statement:
 
@@ -154,11 +486,18 @@ class Parser:
             for_stmt -> "for" + "(" ( varDeclaration | expressionStmt | ";" ) +
                 expression? ";" +
                 expression? ")" statement ;
+            for_in_stmt -> "for" + "(" IDENTIFIER "in" expression ")" statement ;
         """
+        keyword = self._previous()
         self.consume(
             TokenType.LEFT_PAREN,
             msg="left parenthesis required for the condition of a 'for' statement",
         )
+        if (
+            self._check(TokenType.IDENTIFIER)
+            and self._tokens.kind(self.current + 1) == TokenType.IN
+        ):
+            return self._for_in(keyword)
         initialiser = None
         condition = None
         increment = None
@@ -202,6 +541,19 @@ class Parser:
 
         return body
 
+    def _for_in(self, keyword):
+        """The rest of a "for" statement looping over the values of an expression"""
+        self._step()
+        name = self._previous()
+        self._step()
+        iterable = self.expression()
+        self.consume(
+            TokenType.RIGHT_PAREN,
+            msg="right parenthesis required after the iterable of a 'for' statement",
+        )
+        body = self.statement()
+        return ForIn(keyword=keyword, name=name, iterable=iterable, body=body)
+
     def while_statement(self):
         """Parse a "while" statement:
 
@@ -253,181 +605,211 @@ class Parser:
         return Expression(expression=expr)
 
     def expression(self):
-        return self.assignment()
-
-    def assignment(self):
-        expr = self.logic_or()
-
-        assign_to = self._previous()
-
-        if self.match(TokenType.EQUAL):
-            to_assign = self.assignment()
-            return Assign(assign_to=assign_to, to_assign=to_assign)
-
-        return expr
-
-    def logic_or(self):
-        expr = self.logic_and()
-
-        while self.match(TokenType.OR):
-            right = self.logic_and()
-            expr = Logical(operator=TokenType.OR, left=expr, right=right)
-
-        return expr
-
-    def logic_and(self):
-        expr = self.equality()
-
-        while self.match(TokenType.AND):
-            right = self.logic_and()
-            expr = Logical(operator=TokenType.AND, left=expr, right=right)
-        return expr
-
-    def equality(self):
-
-        expr = self.comparison()
-
-        while self.match(TokenType.BANG_EQUAL, TokenType.EQUAL_EQUAL):
-            operator = self._previous()
-            right = self.comparison()
-            expr = Binary(left=expr, operator=operator, right=right)
-
-        return expr
-
-    def comparison(self):
-
-        expr = self.term()
-
-        while self.match(
-            TokenType.LESS,
-            TokenType.LESS_EQUAL,
-            TokenType.GREATER,
-            TokenType.GREATER_EQUAL,
-        ):
-            operator = self._previous()
-            right = self.term()
-            expr = Binary(left=expr, operator=operator, right=right)
-
-        return expr
-
-    def term(self):
-
-        expr = self.factor()
-
-        while self.match(TokenType.PLUS, TokenType.MINUS):
-            operator = self._previous()
-            right = self.factor()
-            expr = Binary(left=expr, operator=operator, right=right)
-
-        return expr
+        """Parse an expression by precedence climbing
 
-    def factor(self):
-
-        expr = self.unary()
-
-        while self.match(TokenType.STAR, TokenType.SLASH):
-            operator = self._previous()
-            right = self.unary()
-            expr = Binary(left=expr, operator=operator, right=right)
-
-        return expr
-
-    def unary(self):
-
-        if self.match(TokenType.BANG, TokenType.MINUS):
-            operator = self._previous()
-            right = self.unary()
-            return Unary(operator=operator, right=right)
-
-        call = self.call()
-        return call
-
-    def call(self):
-        expression = self.primary()
+        Operators waiting for their right operand are kept on the explicit
+        stacks of an _ExpressionFrame, and parentheses, call arguments,
+        subscripts and maps open a new frame, so neither long operator
+        chains nor deep nesting recurse in python. The trees are those of the grammar above
+        """
+        frames = []
+        frame = _ExpressionFrame(_TOP)
         while True:
-            if self.match(TokenType.LEFT_PAREN):
-                expression = self._finish_call(callee=expression)
+            # Prefix position, where an operand is expected
+            action = _PREFIX.get(self._current_kind)
+            if action == _UNARY:
+                self._step()
+                frame.operators.append((Precedence.UNARY, None, self._previous()))
+                continue
+            if action == _GROUPING:
+                self._step()
+                frames.append(frame)
+                frame = _ExpressionFrame(_GROUPING)
+                continue
+            if action == _MAP:
+                self._step()
+                brace = self._previous()
+                if not self.match(TokenType.RIGHT_BRACE):
+                    frames.append(frame)
+                    frame = _ExpressionFrame(_MAP, token=brace)
+                    continue
+                operand = Map(brace=brace, keys=[], values=[])
             else:
-                break
-        return expression
-
-    def _finish_call(self, callee):
-        arguments = []
-        if not self._check(TokenType.RIGHT_PAREN):
-            arguments.append(self.expression())
-
-            while self.match(TokenType.COMMA):
-                arguments.append(self.expression())
-
-        self.consume(TokenType.RIGHT_PAREN, "unclosed parenthesis in function call")
-        call = Call(callee=callee, arguments=arguments)
-        return call
-
-    def identifier(self):
-        if self.match(TokenType.IDENTIFIER):
+                operand = self._operand(action)
+
+            # Postfix and infix position, after an operand
+            while True:
+                kind = self._current_kind
+                if kind == TokenType.LEFT_PAREN:
+                    self._step()
+                    if not self._check(TokenType.RIGHT_PAREN):
+                        frames.append(frame)
+                        frame = _ExpressionFrame(_CALL, callee=operand)
+                        break
+                    self._step()
+                    operand = Call(callee=operand, paren=self._previous(), arguments=[])
+                    continue
+                if kind == TokenType.DOT:
+                    self._step()
+                    self.consume(
+                        TokenType.IDENTIFIER, "Expected property name after '.'"
+                    )
+                    operand = Get(object=operand, name=self._previous())
+                    continue
+                if kind == TokenType.LEFT_BRACKET:
+                    self._step()
+                    subscript = _ExpressionFrame(
+                        _SUBSCRIPT, callee=operand, token=self._previous()
+                    )
+                    if self.match(TokenType.COLON):
+                        # A slice from the start
+                        subscript.arguments.append(None)
+                        if self.match(TokenType.RIGHT_BRACKET):
+                            operand = subscript.subscript(None)
+                            continue
+                    frames.append(frame)
+                    frame = subscript
+                    break
+
+                rule = _INFIX.get(kind)
+                if rule is not None:
+                    precedence, build = rule
+                    if precedence in _RIGHT_ASSOCIATIVE:
+                        operand = frame.reduce(operand, precedence)
+                    else:
+                        operand = frame.reduce(operand, precedence - 1)
+                    # An assignment targets the token before "="
+                    token = self._previous() if build is _assign else None
+                    self._step()
+                    if build is _binary:
+                        token = self._previous()
+                    frame.operands.append(operand)
+                    frame.operators.append((precedence, build, token))
+                    break
+
+                operand = frame.reduce(operand, Precedence.NONE)
+                if frame.context == _TOP:
+                    return operand
+                if frame.context == _GROUPING:
+                    self.consume(
+                        type_=TokenType.RIGHT_PAREN,
+                        msg="Expected ')' after left parenthesis",
+                    )
+                    operand = Grouping(expression=operand)
+                elif frame.context == _SUBSCRIPT:
+                    if not frame.arguments and self.match(TokenType.COLON):
+                        # The start of a slice, parse its end in this frame
+                        frame.arguments.append(operand)
+                        if not self._check(TokenType.RIGHT_BRACKET):
+                            break
+                        operand = None
+                    self.consume(
+                        TokenType.RIGHT_BRACKET, "Expected ']' after subscript"
+                    )
+                    operand = frame.subscript(operand)
+                elif frame.context == _MAP:
+                    entries = frame.arguments
+                    entries.append(operand)
+                    if len(entries) % 2:
+                        self.consume(TokenType.COLON, "Expected ':' after map key")
+                        break
+                    if self.match(TokenType.COMMA) and not self._check(
+                        TokenType.RIGHT_BRACE
+                    ):
+                        break
+                    self.consume(
+                        TokenType.RIGHT_BRACE, "Expected '}' after map entries"
+                    )
+                    operand = Map(
+                        brace=frame.token, keys=entries[0::2], values=entries[1::2]
+                    )
+                else:
+                    frame.arguments.append(operand)
+                    if self.match(TokenType.COMMA):
+                        break
+                    self.consume(
+                        TokenType.RIGHT_PAREN, "unclosed parenthesis in function call"
+                    )
+                    operand = Call(
+                        callee=frame.callee,
+                        paren=self._previous(),
+                        arguments=frame.arguments,
+                    )
+                frame = frames.pop()
+
+    def _operand(self, action):
+        """Consume a literal or a variable"""
+        if action == _LITERAL:
+            self._step()
+            kind = self._tokens.kind(self.current - 1)
+            if kind == TokenType.TRUE:
+                return Literal(value="true")
+            if kind == TokenType.FALSE:
+                return Literal(value="false")
+            if kind == TokenType.NIL:
+                return Literal(value=None)
+            return Literal(value=self._previous().literal)
+        if action == _VARIABLE:
+            self._step()
             return Variable(name=self._previous())
+        if action == _THIS:
+            self._step()
+            return This(keyword=self._previous())
+        if action == _SUPER:
+            self._step()
+            keyword = self._previous()
+            self.consume(TokenType.DOT, "Expected '.' after 'super'")
+            self.consume(TokenType.IDENTIFIER, "Expected superclass method name")
+            return Super(keyword=keyword, method=self._previous())
+        self.error(self.peek(), msg="Expected expression")
 
-    def primary(self):
-        if self.match(TokenType.TRUE):
-            return Literal(value="true")
-        if self.match(TokenType.FALSE):
-            return Literal(value="false")
-        if self.match(TokenType.NIL):
-            return Literal(value=None)
-        if self.match(TokenType.NUMBER, TokenType.STRING):
-            return Literal(value=self._previous().literal)
+    def identifier(self):
         if self.match(TokenType.IDENTIFIER):
             return Variable(name=self._previous())
-        elif self.match(TokenType.LEFT_PAREN):
-            expr = self.expression()
-            self.consume(
-                type_=TokenType.RIGHT_PAREN, msg="Expected ')' after left parenthesis"
-            )
-            return Grouping(expression=expr)
-        else:
-            self.error(self.peek(), msg="Expected expression")
 
     def _previous(self):
         return self._tokens[self.current - 1]
 
     def match(self, *types, with_advance=True):
-        for type_ in types:
-            if self._check(type_=type_):
-                if with_advance:
-                    self.advance()
-                return True
-        return False
+        kind = self._current_kind
+        if kind not in types or kind == TokenType.EOF:
+            return False
+        if with_advance:
+            self._step()
+        return True
 
     def _check(self, type_):
-        if self.is_at_end():
-            return False
-        return self.peek().type_ == type_
+        return self._current_kind == type_ and type_ != TokenType.EOF
 
     def is_at_end(self):
-        return self.peek().type_ == TokenType.EOF
+        return self._current_kind == TokenType.EOF
 
     def peek(self):
-        try:
+        if self._tokens.line(self.current) is not None:
             return self._tokens[self.current]
-        except IndexError:
-            previous_offset = self._tokens[self.current - 1].offset
-            return LoxToken(
-                type_=TokenType.EOF,
-                lexeme="\0",
-                literal=None,
-                line=self.line,
-                offset=previous_offset,
-            )
+        # Past the last token
+        return LoxToken(
+            type_=TokenType.EOF,
+            lexeme="\0",
+            literal=None,
+            line=self.line,
+            offset=self._tokens[self.current - 1].offset,
+        )
 
     def advance(self):
-        if not self.is_at_end():
-            self.current += 1
-            self.line = self.peek().line
+        self._step()
         return self._previous()
 
+    def _step(self):
+        """Move past the current token, without building it"""
+        if self._current_kind != TokenType.EOF:
+            self.current += 1
+            self._current_kind = self._tokens.kind(self.current)
+
     def consume(self, type_, msg):
         if self._check(type_):
-            return self.advance()
+            self._step()
+            return
         self.error(token=self.peek(), msg=msg)
 
     def error(self, token, msg):
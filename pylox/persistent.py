@@ -0,0 +1,392 @@
+"""
+Persistent maps and vectors: immutable values whose updates return a new
+version that shares most of its memory with the old one
+
+PersistentMap is a hash array mapped trie, PersistentVector a trie of
+32 wide nodes with the last leaf kept apart as its tail, as in Clojure.
+Reading, adding or replacing an element copies at most one node per
+level, O(log32 n), so keeping every version of a large state costs
+memory proportional to what changed between them
+"""
+from pylox.callable import LoxRuntimeError
+from pylox.maps import map_key
+
+_BITS = 5
+_WIDTH = 1 << _BITS
+_MASK = _WIDTH - 1
+
+# Returned by the find methods of the map nodes for keys they do not hold
+_MISSING = object()
+
+try:
+    _popcount = int.bit_count
+except AttributeError:  # python < 3.10
+
+    def _popcount(value):
+        return bin(value).count("1")
+
+
+def _hash(key):
+    return hash(key) & 0xFFFFFFFF
+
+
+class _Bitmap:
+    """
+    A node of the map trie
+
+    Bit i of `bitmap` tells whether the node has a slot for the keys with
+    the 5 bits i at its level of their hash. `slots` holds them in bit
+    order, each one a (key, value) tuple or a node of the next level
+    """
+
+    __slots__ = ("bitmap", "slots")
+
+    def __init__(self, bitmap, slots):
+        self.bitmap = bitmap
+        self.slots = slots
+
+    def find(self, key, hash_, shift):
+        bit = 1 << ((hash_ >> shift) & _MASK)
+        if not self.bitmap & bit:
+            return _MISSING
+        slot = self.slots[_popcount(self.bitmap & (bit - 1))]
+        if type(slot) is tuple:
+            return slot[1] if slot[0] == key else _MISSING
+        return slot.find(key, hash_, shift + _BITS)
+
+    def assoc(self, key, hash_, shift, value):
+        """Return the node with `key` set to `value`, and whether `key` is new"""
+        bit = 1 << ((hash_ >> shift) & _MASK)
+        index = _popcount(self.bitmap & (bit - 1))
+        slots = self.slots
+        if not self.bitmap & bit:
+            slots = slots[:index] + [(key, value)] + slots[index:]
+            return _Bitmap(self.bitmap | bit, slots), True
+        slot = slots[index]
+        added = False
+        if type(slot) is not tuple:
+            replacement, added = slot.assoc(key, hash_, shift + _BITS, value)
+        elif slot[0] == key:
+            if slot[1] is value:
+                return self, False
+            replacement = (key, value)
+        else:
+            replacement = _pair(slot, (key, value), hash_, shift + _BITS)
+            added = True
+        if replacement is slot:
+            return self, False
+        slots = list(slots)
+        slots[index] = replacement
+        return _Bitmap(self.bitmap, slots), added
+
+    def without(self, key, hash_, shift):
+        """Return the node without `key`, itself when it does not hold it or
+        None when nothing is left"""
+        bit = 1 << ((hash_ >> shift) & _MASK)
+        if not self.bitmap & bit:
+            return self
+        index = _popcount(self.bitmap & (bit - 1))
+        slot = self.slots[index]
+        if type(slot) is tuple:
+            if slot[0] != key:
+                return self
+            replacement = None
+        else:
+            replacement = slot.without(key, hash_, shift + _BITS)
+            if replacement is slot:
+                return self
+            replacement = _single_entry(replacement)
+        if replacement is None:
+            if self.bitmap == bit:
+                return None
+            return _Bitmap(
+                self.bitmap ^ bit, self.slots[:index] + self.slots[index + 1 :]
+            )
+        slots = list(self.slots)
+        slots[index] = replacement
+        return _Bitmap(self.bitmap, slots)
+
+    def entries(self):
+        for slot in self.slots:
+            if type(slot) is tuple:
+                yield slot
+            else:
+                yield from slot.entries()
+
+
+class _Collision:
+    """
+    The entries whose keys have the same hash
+    """
+
+    __slots__ = ("hash", "slots")
+
+    def __init__(self, hash_, slots):
+        self.hash = hash_
+        self.slots = slots
+
+    def find(self, key, hash_, shift):
+        for entry in self.slots:
+            if entry[0] == key:
+                return entry[1]
+        return _MISSING
+
+    def assoc(self, key, hash_, shift, value):
+        if hash_ != self.hash:
+            # Move the collisions one level down, under a node that also
+            # holds the new key
+            node = _Bitmap(1 << ((self.hash >> shift) & _MASK), [self])
+            return node.assoc(key, hash_, shift, value)
+        for index, entry in enumerate(self.slots):
+            if entry[0] == key:
+                if entry[1] is value:
+                    return self, False
+                slots = list(self.slots)
+                slots[index] = (key, value)
+                return _Collision(self.hash, slots), False
+        return _Collision(self.hash, self.slots + [(key, value)]), True
+
+    def without(self, key, hash_, shift):
+        slots = [entry for entry in self.slots if entry[0] != key]
+        if len(slots) == len(self.slots):
+            return self
+        return _Collision(self.hash, slots)
+
+    def entries(self):
+        return iter(self.slots)
+
+
+def _single_entry(node):
+    """The only entry of `node` when it has one, so that its parent holds it
+    directly, otherwise `node` itself"""
+    if node is not None and len(node.slots) == 1 and type(node.slots[0]) is tuple:
+        return node.slots[0]
+    return node
+
+
+def _pair(first, second, hash_, shift):
+    """The node holding the entries `first` and `second` from level `shift` down"""
+    first_hash = _hash(first[0])
+    if first_hash == hash_:
+        return _Collision(hash_, [first, second])
+    first_bit = 1 << ((first_hash >> shift) & _MASK)
+    second_bit = 1 << ((hash_ >> shift) & _MASK)
+    if first_bit == second_bit:
+        return _Bitmap(first_bit, [_pair(first, second, hash_, shift + _BITS)])
+    if first_bit < second_bit:
+        return _Bitmap(first_bit | second_bit, [first, second])
+    return _Bitmap(first_bit | second_bit, [second, first])
+
+
+_EMPTY_NODE = _Bitmap(0, [])
+
+
+class PersistentMap:
+    """
+    An immutable map, keyed like pylox.maps.LoxMap
+
+    Args:
+        root (_Bitmap): The root of the trie
+        count (int): The number of entries
+    """
+
+    __slots__ = ("root", "count")
+
+    def __init__(self, root=_EMPTY_NODE, count=0):
+        self.root = root
+        self.count = count
+
+    def get(self, key, default=None):
+        value = self.root.find(key, _hash(key), 0)
+        return default if value is _MISSING else value
+
+    def get_item(self, key):
+        """The value of `map[key]`, the key has to be in the map"""
+        value = self.root.find(key, _hash(key), 0)
+        if value is _MISSING:
+            raise LoxRuntimeError(msg=f"Key {key!r} is not in the map")
+        return value
+
+    def has(self, key):
+        return self.root.find(key, _hash(key), 0) is not _MISSING
+
+    def assoc(self, key, value):
+        """A new version with `key` set to `value`"""
+        key = map_key(key)
+        root, added = self.root.assoc(key, _hash(key), 0, value)
+        if root is self.root:
+            return self
+        return PersistentMap(root, self.count + added)
+
+    def dissoc(self, key):
+        """A new version without `key`"""
+        root = self.root.without(key, _hash(key), 0)
+        if root is self.root:
+            return self
+        return PersistentMap(_EMPTY_NODE if root is None else root, self.count - 1)
+
+    def entries(self):
+        """The (key, value) pairs, in no particular order"""
+        return self.root.entries()
+
+    def __len__(self):
+        return self.count
+
+    def __str__(self):
+        entries = ", ".join(f"{key}: {value}" for key, value in self.entries())
+        return "{" + entries + "}"
+
+    def __repr__(self):
+        return f"<persistent map len={self.count}>"
+
+
+class PersistentVector:
+    """
+    An immutable sequence of any values
+
+    Elements are stored in leaves of 32 under a trie of 32 wide nodes,
+    the last leaf, `tail`, is kept out of the trie so that appending
+    usually copies the tail only. Nodes are python lists that are never
+    changed once built
+
+    Args:
+        count (int): The number of elements
+        shift (int): The bit shift of the level below the root
+        root (list): The root of the trie
+        tail (list): The last leaf
+    """
+
+    __slots__ = ("count", "shift", "root", "tail")
+
+    def __init__(self, count=0, shift=_BITS, root=None, tail=None):
+        self.count = count
+        self.shift = shift
+        self.root = [] if root is None else root
+        self.tail = [] if tail is None else tail
+
+    def _tail_offset(self):
+        if self.count < _WIDTH:
+            return 0
+        return ((self.count - 1) >> _BITS) << _BITS
+
+    def _leaf(self, index):
+        if index >= self._tail_offset():
+            return self.tail
+        node = self.root
+        for level in range(self.shift, 0, -_BITS):
+            node = node[(index >> level) & _MASK]
+        return node
+
+    def nth(self, index):
+        """The element at `index`, negative ones count from the end"""
+        if index < 0:
+            index += self.count
+        if not 0 <= index < self.count:
+            raise IndexError(index)
+        return self._leaf(index)[index & _MASK]
+
+    def push(self, value):
+        """A new version with `value` appended"""
+        count = self.count
+        if count - self._tail_offset() < _WIDTH:
+            return PersistentVector(
+                count + 1, self.shift, self.root, self.tail + [value]
+            )
+        shift = self.shift
+        if (count >> _BITS) > (1 << shift):
+            # The trie is full, grow it by one level
+            root = [self.root, _path(shift, self.tail)]
+            shift += _BITS
+        else:
+            root = self._push_tail(shift, self.root, self.tail)
+        return PersistentVector(count + 1, shift, root, [value])
+
+    def _push_tail(self, level, parent, leaf):
+        index = ((self.count - 1) >> level) & _MASK
+        node = list(parent)
+        if level == _BITS:
+            child = leaf
+        elif index < len(parent):
+            child = self._push_tail(level - _BITS, parent[index], leaf)
+        else:
+            child = _path(level - _BITS, leaf)
+        if index < len(node):
+            node[index] = child
+        else:
+            node.append(child)
+        return node
+
+    def assoc(self, index, value):
+        """A new version with `value` at `index`, which may be the length to append"""
+        if index < 0:
+            index += self.count
+        if index == self.count:
+            return self.push(value)
+        if not 0 <= index < self.count:
+            raise IndexError(index)
+        if index >= self._tail_offset():
+            tail = list(self.tail)
+            tail[index & _MASK] = value
+            return PersistentVector(self.count, self.shift, self.root, tail)
+        root = _assoc(self.shift, self.root, index, value)
+        return PersistentVector(self.count, self.shift, root, self.tail)
+
+    def pop(self):
+        """A new version without the last element"""
+        count = self.count
+        if count == 0:
+            raise IndexError("pop from an empty vector")
+        if count == 1:
+            return PersistentVector()
+        if count - self._tail_offset() > 1:
+            return PersistentVector(count - 1, self.shift, self.root, self.tail[:-1])
+        tail = self._leaf(count - 2)
+        root = self._pop_tail(self.shift, self.root)
+        shift = self.shift
+        if root is None:
+            root = []
+        elif shift > _BITS and len(root) == 1:
+            root = root[0]
+            shift -= _BITS
+        return PersistentVector(count - 1, shift, root, tail)
+
+    def _pop_tail(self, level, node):
+        index = ((self.count - 2) >> level) & _MASK
+        if level > _BITS:
+            child = self._pop_tail(level - _BITS, node[index])
+            if child is None:
+                return node[:index] or None
+            return node[:index] + [child]
+        return node[:index] or None
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        for start in range(0, self._tail_offset(), _WIDTH):
+            yield from self._leaf(start)
+        yield from self.tail
+
+    def __str__(self):
+        return "[" + ", ".join(map(str, self)) + "]"
+
+    def __repr__(self):
+        return f"<persistent vector len={self.count}>"
+
+
+def _path(level, node):
+    """`node` under a chain of single child nodes down from `level`"""
+    while level > 0:
+        node = [node]
+        level -= _BITS
+    return node
+
+
+def _assoc(level, node, index, value):
+    node = list(node)
+    if level == 0:
+        node[index & _MASK] = value
+    else:
+        child = (index >> level) & _MASK
+        node[child] = _assoc(level - _BITS, node[child], index, value)
+    return node
@@ -1,12 +1,21 @@
 import pathlib
 import sys
 
+from pylox import cache as _cache
+from pylox import tracing
+from pylox.closure_eval import ClosureInterpreter
+from pylox.compiler import Compiler
 from pylox.expr_eval import ExpressionInterpreter as Interpreter
-from pylox.logging import logger
+from pylox.image import SUFFIX as IMAGE_SUFFIX
+from pylox.image import ImageError, load_image, write_image
+from pylox.memo import MEMO_SIZE
+from pylox.optimizer import optimize
 from pylox.parser import Parser as LoxParser
-from pylox.parser import ParserError
-from pylox.resolver import CompilerError, Resolver
-from pylox.scanner import LoxScanner
+from pylox.parser import ParserError, TokenWindow
+from pylox.resolver import CompilerError, PureFunctions, Resolver
+from pylox.scanner import RegexScanner, read_chunks, stream_tokens
+from pylox.transpiler import TranspiledInterpreter, Transpiler, compile_module
+from pylox.vm import VM
 
 LOGO = r"""
   _     _____  __
@@ -25,20 +34,77 @@ class LoxException(Exception):
     pass
 
 
+ENGINES = ("ast", "vm", "closure", "python")
+TARGETS = ("python", "image")
+
+
 class LoxIntepreter:
-    def __init__(self):
+    def __init__(self, engine="ast", optimize=True, memoize=True, memo_size=MEMO_SIZE):
+        """
+        Args:
+            engine (str): One of ENGINES
+            optimize (bool): Run the optimizer over programs before they run
+            memoize (bool): Let the tree-walking interpreter keep the results
+                of pure functions
+            memo_size (int): The number of results kept per pure function,
+                None for no bound
+        """
+        if engine not in ENGINES:
+            raise LoxException(
+                f"Unknown engine '{engine}', expected one of {', '.join(ENGINES)}"
+            )
         self.had_error = False
-        self.interpreter = Interpreter()
+        self.engine = engine
+        self.optimize = optimize
+        # Pure global functions, known to every declaration resolved later
+        self.pure_functions = PureFunctions()
+        if engine == "closure":
+            self.interpreter = ClosureInterpreter()
+        elif engine == "python":
+            self.interpreter = TranspiledInterpreter()
+        else:
+            self.interpreter = Interpreter(memoize=memoize, memo_size=memo_size)
+        self.vm = VM() if engine == "vm" else None
+        # Natives added with define_native, on top of the native library
+        self.natives = {}
+
+    def define_native(self, name, function, arity):
+        """Define the global `name` as a python function LOX code can call
+
+        Arguments are checked against `arity`, and python errors raised by
+        `function` are reported as LOX runtime errors
+
+        Args:
+            name (str): The name LOX code calls the function by
+            function (Callable): Called with the LOX arguments, returns a
+                LOX value
+            arity (int): The number of arguments calls must pass
+        """
+        self.natives[name] = (function, arity)
+        self.interpreter.define_native(name, function, arity)
+        if self.vm is not None:
+            self.vm.define_native(name, function, arity)
+
+    def run_file(self, file=None, stream=False, cache=False):
+        """Run a file containing LOX source code, the prompt without a file
 
-    def run_file(self, file=None):
+        Args:
+            file (str | pathlib.Path): The file to run
+            stream (bool): Execute the file while it is being read
+            cache (bool): Load the resolved program from, or save it to, the
+                `__loxcache__` directory next to the file. Not used when
+                streaming
+        """
         if not file:
             self._run_prompt()
         else:
             filepath = pathlib.Path(file)
         if not filepath.exists():
             raise LoxException("file %s does not exist" % filepath)
+        elif stream:
+            self.run_stream(chunks=read_chunks(filepath))
         else:
-            self._run_file(file=filepath)
+            self._run_file(file=filepath, cache=cache)
 
     def _run_prompt(self):
         """Run LOX source code line by line"""
@@ -53,17 +119,27 @@ class LoxIntepreter:
             # Do not kill all the interactιve session because of one line
             self.had_error = False
 
-    def _run_file(self, file):
+    def _run_file(self, file, cache=False):
         """Run a file containing LOX source code
 
         Args:
             file (pathlib.Path): The file to run
+            cache (bool): Use the compiled cache of the file
         """
         with open(file, "r") as sourcefile:
             source = sourcefile.read()
         if self.had_error:
             sys.exit(1)
-        self.run(source=source)
+        if not cache:
+            return self.run(source=source)
+
+        statements = _cache.load(file, source, optimized=self.optimize)
+        if statements is None:
+            statements = self._front_end(source=source)
+            if self.had_error:
+                return self._report_compiler_error()
+            _cache.store(file, source, statements, optimized=self.optimize)
+        return self._execute(statements=statements)
 
     def run(self, source):
         """Run raw LOX source code in the form of string
@@ -71,30 +147,192 @@ class LoxIntepreter:
         Args:
             source (string): The LOX source code to run
         """
-        scanner = LoxScanner(source=source)
-        tokens = scanner.scan_tokens()
+        statements = self._front_end(source=source)
+        result = None
+
+        if not self.had_error:
+            result = self._execute(statements=statements)
+        else:
+            self._report_compiler_error()
+        return result
+
+    def run_stream(self, chunks):
+        """Run LOX source code as it is read, one top level declaration at a time
+
+        Every declaration is resolved and executed as soon as it is parsed,
+        so the front end holds a single declaration and the current chunk
+        of source at a time. Declarations before a compiler error have
+        already run when it is reported. Execution stops at the first
+        runtime error, like `run`
+
+        Args:
+            chunks (Iterable[str]): Successive pieces of the LOX source code
+        """
+        parser = LoxParser(tokens=TokenWindow(stream_tokens(chunks)))
+        resolver = Resolver(
+            interpreter=self.interpreter, pure_functions=self.pure_functions
+        )
+        engine = self.vm if self.engine == "vm" else self.interpreter
+        declarations = parser.parse_declarations()
+        while True:
+            try:
+                statement = next(declarations, None)
+                if statement is None:
+                    return
+                resolver.resolve(statement)
+            except (ParserError, CompilerError) as e:
+                self.had_error = True
+                self.error = e
+                self._report_compiler_error()
+                return
+            self._execute(statements=self._optimize([statement]))
+            if engine.had_runtime_error or self.had_error:
+                return
+
+    def compile_file(self, file, output=None, target="python"):
+        """Compile a file containing LOX source code ahead of time
+
+        Args:
+            file (pathlib.Path): The file to compile
+            output (pathlib.Path): Where to write the result, defaults to the
+                name of `file` with a `_lox.py` suffix for python and a
+                `.loxb` suffix for images
+            target (str): "python" to transpile into a python module,
+                "image" to write VM bytecode that `load_compiled` runs
+        """
+        if target not in TARGETS:
+            raise LoxException(
+                f"Unknown target '{target}', expected one of {', '.join(TARGETS)}"
+            )
+        filepath = pathlib.Path(file)
+        if not filepath.exists():
+            raise LoxException("file %s does not exist" % filepath)
+        if output is None and target == "image":
+            output = filepath.with_suffix(IMAGE_SUFFIX)
+        elif output is None:
+            output = filepath.with_name(filepath.stem + "_lox.py")
+
+        with open(filepath, "r") as sourcefile:
+            source = sourcefile.read()
+        statements = self._front_end(source=source)
+        if self.had_error:
+            return self._report_compiler_error()
+
+        if target == "image":
+            try:
+                write_image(Compiler().compile(statements), output)
+            except (CompilerError, ImageError) as e:
+                self.had_error = True
+                self.error = e
+                return self._report_compiler_error()
+            return pathlib.Path(output)
+
+        module = Transpiler(source_name=str(filepath)).transpile(statements)
+        try:
+            compile_module(module, str(output))
+        except CompilerError as e:
+            self.had_error = True
+            self.error = e
+            return self._report_compiler_error()
+        with open(output, "w") as outfile:
+            outfile.write(module)
+        return pathlib.Path(output)
+
+    def load_compiled(self, path):
+        """Run an image written by `compile_file` on the VM
+
+        The image is mapped into memory rather than read, and functions are
+        only decoded when they are first used
+
+        Args:
+            path (pathlib.Path): The image file to run
+        """
+        filepath = pathlib.Path(path)
+        if not filepath.exists():
+            raise LoxException("file %s does not exist" % filepath)
+        try:
+            script = load_image(filepath)
+        except ImageError as e:
+            raise LoxException(str(e))
+        if self.vm is None:
+            self.vm = VM()
+            for name, (function, arity) in self.natives.items():
+                self.vm.define_native(name, function, arity)
+        return self.vm.interpret(script)
+
+    def _report_compiler_error(self):
+        print("Compiler error: " + str(self.error))
+        tracing.flush()
+
+    def _front_end(self, source):
+        """Scan, parse, resolve and optimize raw LOX source code
+
+        Args:
+            source (string): The LOX source code
+
+        Returns:
+            List[Stmt]: The resolved statements, errors are recorded in
+                `had_error` and `error`
+        """
+        scanner = RegexScanner(source=source)
+        tokens = scanner.scan_buffer()
 
         parser = LoxParser(tokens=tokens)
-        resolver = Resolver(interpreter=self.interpreter)
+        resolver = Resolver(
+            interpreter=self.interpreter, pure_functions=self.pure_functions
+        )
         statements = []
         try:
             statements = parser.parse()
         except ParserError as e:
             self.had_error = True
             self.error = e
-        logger.debug("Finished parsing")
 
         try:
             resolver.resolve_all(statements)
         except CompilerError as e:
             self.had_error = True
             self.error = e
-        logger.debug("Finished resolving")
-        result = None
+        if self.had_error:
+            return statements
+        return self._optimize(statements)
 
-        if not self.had_error:
-            result = self.interpreter.interpret(statements=statements)
-        else:
-            print("Compiler error: " + str(self.error))
-        logger.debug("Finished interpreting")
-        return result
+    def _optimize(self, statements):
+        """Run the optimizer over resolved statements and resolve the result
+
+        Args:
+            statements (List[Stmt]): The resolved program
+
+        Returns:
+            List[Stmt]: The optimized program, `statements` itself when
+                optimizations are turned off
+        """
+        if not self.optimize:
+            return statements
+        statements = optimize(statements)
+        Resolver(
+            interpreter=self.interpreter, pure_functions=self.pure_functions
+        ).resolve_all(statements)
+        return statements
+
+    def _execute(self, statements):
+        """Execute resolved statements with the selected engine
+
+        Args:
+            statements (List[Stmt]): The resolved program
+        """
+        if self.engine == "vm":
+            try:
+                function = Compiler().compile(statements)
+            except CompilerError as e:
+                self.had_error = True
+                self.error = e
+                return self._report_compiler_error()
+            return self.vm.interpret(function)
+        try:
+            return self.interpreter.interpret(statements=statements)
+        except CompilerError as e:
+            # Raised by the python engine for programs python cannot compile
+            self.had_error = True
+            self.error = e
+            return self._report_compiler_error()
@@ -1,6 +1,7 @@
 from typing import List, Union
 
-from pylox.logging import logger
+from pylox import tracing
+from pylox.expr import Call
 from pylox.visitor import Visitor
 
 
@@ -13,33 +14,101 @@ class CompilerError(Exception):
 class FunctionType:
     NONE = "NONE"
     FUNCTION = "FUNCTION"
+    METHOD = "METHOD"
+    INITIALIZER = "INITIALIZER"
+
+
+class ClassType:
+    NONE = "NONE"
+    CLASS = "CLASS"
+    SUBCLASS = "SUBCLASS"
+
+
+class PureFunctions:
+    """
+    The global functions found pure so far, shared by the resolvers of one
+    session so purity survives from one REPL line or streamed declaration
+    to the next
+    """
+
+    def __init__(self):
+        # name -> the pure declaration the global holds
+        self.functions = {}
+        # name -> the pure declarations that read the global
+        self.readers = {}
+
+    def invalidate(self, name):
+        """The global `name` is redefined or assigned, so no function that
+        reads it is pure anymore"""
+        self.functions.pop(name, None)
+        for declaration in self.readers.pop(name, ()):
+            declaration.pure = False
+            reader = declaration.name.name.lexeme
+            if self.functions.get(reader) is declaration:
+                self.invalidate(reader)
+
+
+class _FunctionFacts:
+    """What the body of the function being resolved does, for purity"""
+
+    def __init__(self, statement, base):
+        self.statement = statement
+        # Index in Resolver.scopes of the scope holding the parameters
+        self.base = base
+        self.impure = False
+        self.globals = set()
+        self.yields = False
+        self.returns_value = False
 
 
 class Resolver(Visitor):
     """
     Resolve variables in the tokens
+
+    Functions are annotated `pure` when they read nothing but their
+    parameters, their own locals and pure global functions, assign no
+    outer variable, print nothing and declare no nested function. A
+    global function stops being pure as soon as a global it reads is
+    redefined or assigned
+
+    Functions whose body holds a `yield` are annotated `generator`
+
+    Methods find `this` one scope above their parameters, and the methods
+    of a subclass find `super` one more scope above. Reading or storing a
+    property makes a function impure, instances change
     """
 
-    def __init__(self, interpreter):
+    def __init__(self, interpreter, pure_functions=None):
         self.interpreter = interpreter
         self.current_function = FunctionType.NONE
+        self.current_class = ClassType.NONE
         self.scopes = []
+        # Parallel to scopes, maps every local name to its slot in the frame
+        self.slots = []
+        if pure_functions is None:
+            pure_functions = PureFunctions()
+        self.pure_functions = pure_functions
+        # One _FunctionFacts per function being resolved, innermost last
+        self.facts = []
 
     def resolve_all(self, statements: List[Union["Stmt", "Expr"]]):
         for statement in statements:
             self.resolve(statement=statement)
 
     def resolve(self, statement: Union["Stmt", "Expr"]):
-        logger.debug(f"Resolving {statement}")
         statement.accept(self)
 
     def begin_scope(self):
-        logger.debug("begin_scope")
+        if tracing.RESOLVER:
+            tracing.trace("resolver", "begin_scope depth=%s", len(self.scopes))
         self.scopes.append({})
+        self.slots.append({})
 
     def end_scope(self):
-        logger.debug("end_scope")
+        if tracing.RESOLVER:
+            tracing.trace("resolver", "end_scope depth=%s", len(self.scopes))
         self.scopes.pop()
+        self.slots.pop()
 
     def visit_literal_expr(self, expr: "Expr"):
         pass
@@ -56,11 +125,16 @@ class Resolver(Visitor):
 
     def visit_print_stmt(self, stmt: "Stmt"):
         self.resolve(stmt.expression)
+        if self.facts:
+            self.facts[-1].impure = True
 
     def visit_expression_stmt(self, stmt: "Stmt"):
         self.resolve(stmt.expression)
 
     def visit_block_stmt(self, stmt: "Stmt"):
+        if stmt.flat:
+            self.resolve_all(stmt.statements)
+            return
         self.begin_scope()
         self.resolve_all(stmt.statements)
         self.end_scope()
@@ -72,44 +146,178 @@ class Resolver(Visitor):
     def visit_assign_expr(self, expr: "Expr"):
         self.resolve(expr.to_assign)
         self.resolve_local(expr, expr.assign_to)
+        if expr.depth is None:
+            self.pure_functions.invalidate(expr.assign_to.lexeme)
+        if self.facts and (expr.depth is None or self._reads_outside(expr)):
+            self.facts[-1].impure = True
 
     def visit_function_stmt(self, stmt: "Stmt"):
+        if not self.scopes:
+            self.pure_functions.invalidate(stmt.name.name.lexeme)
+        if self.facts:
+            self.facts[-1].impure = True
         self.declare(stmt.name.name.lexeme)
         self.define(stmt.name.name.lexeme)
         self._resolve_function(statement=stmt, function_type=FunctionType.FUNCTION)
 
+    def visit_class_stmt(self, stmt: "Stmt"):
+        name = stmt.name.lexeme
+        if not self.scopes:
+            self.pure_functions.invalidate(name)
+        if self.facts:
+            self.facts[-1].impure = True
+        self.declare(name)
+        self.define(name)
+
+        enclosing_class = self.current_class
+        self.current_class = ClassType.CLASS
+        if stmt.superclass is not None:
+            if stmt.superclass.name.lexeme == name:
+                raise CompilerError("A class can't inherit from itself")
+            self.current_class = ClassType.SUBCLASS
+            self.resolve(stmt.superclass)
+            self.begin_scope()
+            self.declare("super")
+            self.define("super")
+
+        self.begin_scope()
+        self.declare("this")
+        self.define("this")
+        for method in stmt.methods:
+            function_type = FunctionType.METHOD
+            if method.name.name.lexeme == "init":
+                function_type = FunctionType.INITIALIZER
+            self._resolve_function(statement=method, function_type=function_type)
+        self.end_scope()
+
+        if stmt.superclass is not None:
+            self.end_scope()
+        self.current_class = enclosing_class
+
     def _resolve_function(self, statement, function_type):
+        is_global = not self.scopes
         self.begin_scope()
 
         enclosing_function = self.current_function
         self.current_function = function_type
+        facts = _FunctionFacts(statement, base=len(self.scopes) - 1)
+        self.facts.append(facts)
 
         for param in statement.params:
             self.declare(param.name.lexeme)
             self.define(param.name.lexeme)
 
         self.resolve_all(statement.body)
+        self.facts.pop()
         self.end_scope()
         self.current_function = enclosing_function
+        self._decide_generator(facts)
+        self._decide_purity(facts, is_global)
+
+    def _decide_generator(self, facts):
+        statement = facts.statement
+        # The optimizer may remove the only `yield`, calls must still
+        # return a generator when the program is resolved again
+        statement.generator = bool(statement.generator or facts.yields)
+        if statement.generator and facts.returns_value:
+            raise CompilerError(
+                f"Cannot return a value from generator '{statement.name.name.lexeme}'"
+            )
+        if statement.generator and tracing.RESOLVER:
+            tracing.trace("resolver", "generator %s", statement.name.name.lexeme)
+
+    def _decide_purity(self, facts, is_global):
+        statement = facts.statement
+        name = statement.name.name.lexeme
+        pure_functions = self.pure_functions
+        statement.pure = not facts.impure and all(
+            (is_global and global_ == name) or global_ in pure_functions.functions
+            for global_ in facts.globals
+        )
+        if not statement.pure:
+            return
+        if is_global:
+            pure_functions.functions[name] = statement
+        for global_ in facts.globals:
+            pure_functions.readers.setdefault(global_, []).append(statement)
+        if tracing.RESOLVER:
+            tracing.trace("resolver", "pure %s", name)
+
+    def _reads_outside(self, expr):
+        """Return True when the resolved `expr` names a local of an enclosing
+        function"""
+        return expr.depth is not None and (
+            len(self.scopes) - 1 - expr.depth < self.facts[-1].base
+        )
 
     def visit_variable_expr(self, expr: "Expr"):
         if self.scopes and self.scopes[-1].get(expr.name.lexeme) is False:
             raise CompilerError("Can't read local variable in its own initializer")
         self.resolve_local(expr, expr.name)
+        if self.facts:
+            if expr.depth is None:
+                self.facts[-1].globals.add(expr.name.lexeme)
+            elif self._reads_outside(expr):
+                self.facts[-1].impure = True
         return None
 
+    def visit_this_expr(self, expr: "Expr"):
+        if self.current_class is ClassType.NONE:
+            raise CompilerError("Can't use 'this' outside of a class")
+        self.resolve_local(expr, expr.keyword)
+        if self.facts and self._reads_outside(expr):
+            self.facts[-1].impure = True
+
+    def visit_super_expr(self, expr: "Expr"):
+        if self.current_class is ClassType.NONE:
+            raise CompilerError("Can't use 'super' outside of a class")
+        if self.current_class is not ClassType.SUBCLASS:
+            raise CompilerError("Can't use 'super' in a class with no superclass")
+        self.resolve_local(expr, expr.keyword)
+        if self.facts and self._reads_outside(expr):
+            self.facts[-1].impure = True
+
+    def visit_get_expr(self, expr: "Expr"):
+        self.resolve(expr.object)
+        if self.facts:
+            self.facts[-1].impure = True
+
+    def visit_set_expr(self, expr: "Expr"):
+        self.resolve(expr.object)
+        self.resolve(expr.value)
+        if self.facts:
+            self.facts[-1].impure = True
+
     def resolve_local(self, expr: "Expr", name: "Token"):
-        logger.debug(f"resolve_local: expr={expr}, token={name}")
+        """Store the (depth, slot) of a local variable on `expr`
+
+        Both are left as None for globals, which are looked up by name
+        """
         for i in range(len(self.scopes) - 1, -1, -1):
 
             if name.lexeme in self.scopes[i].keys():
-                logger.debug(
-                    f"resolve_local: resolve {name} at {len(self.scopes) - 1 - i} "
-                )
-                self.interpreter.resolve(expr, len(self.scopes) - 1 - i)
+                depth = len(self.scopes) - 1 - i
+                slot = self.slots[i][name.lexeme]
+                if tracing.RESOLVER:
+                    tracing.trace(
+                        "resolver",
+                        "local %s line=%s depth=%s slot=%s",
+                        name.lexeme,
+                        name.line,
+                        depth,
+                        slot,
+                    )
+                expr.depth = depth
+                expr.slot = slot
                 return
+        if tracing.RESOLVER:
+            tracing.trace("resolver", "global %s line=%s", name.lexeme, name.line)
+        expr.depth = None
+        expr.slot = None
 
     def visit_var_stmt(self, stmt: "Stmt"):
+        if not self.scopes:
+            self.pure_functions.invalidate(stmt.name)
         self.declare(stmt.name)
         if stmt.initialiser is not None:
             self.resolve(stmt.initialiser)
@@ -125,7 +333,10 @@ class Resolver(Visitor):
         if name in scope:
             raise CompilerError(f"Already a variable called '{name}' defined in scope")
         scope[name] = False
-        logger.debug(f"declare: scope={scope}")
+        slots = self.slots[-1]
+        slots[name] = len(slots)
+        if tracing.RESOLVER:
+            tracing.trace("resolver", "declare %s slot=%s", name, slots[name])
 
     def define(self, name):
         if not self.scopes:
@@ -134,7 +345,8 @@ class Resolver(Visitor):
         # Get the last scope
         scope = self.scopes[-1]
         scope[name] = True
-        logger.debug(f"define: scope={scope}")
+        if tracing.RESOLVER:
+            tracing.trace("resolver", "define %s", name)
 
     def visit_if_stmt(self, stmt: "Stmt"):
         self.resolve(stmt.condition)
@@ -146,13 +358,64 @@ class Resolver(Visitor):
         self.resolve(stmt.condition)
         self.resolve(stmt.statement)
 
+    def visit_forin_stmt(self, stmt: "Stmt"):
+        self.resolve(stmt.iterable)
+        # The loop variable is the only local of a scope of its own, a new
+        # one for every iteration
+        self.begin_scope()
+        self.declare(stmt.name.lexeme)
+        self.define(stmt.name.lexeme)
+        self.resolve(stmt.body)
+        self.end_scope()
+
+    def visit_countedloop_stmt(self, stmt: "Stmt"):
+        self.resolve(stmt.condition)
+        self.resolve(stmt.statement)
+        self.resolve(stmt.increment)
+
     def visit_call_expr(self, expr: "Expr"):
         self.resolve(expr.callee)
         for argument in expr.arguments:
             self.resolve(argument)
 
+    def visit_subscript_expr(self, expr: "Expr"):
+        self.resolve(expr.object)
+        self.resolve(expr.index)
+
+    def visit_setsubscript_expr(self, expr: "Expr"):
+        self.resolve(expr.object)
+        self.resolve(expr.index)
+        self.resolve(expr.value)
+
+    def visit_slice_expr(self, expr: "Expr"):
+        self.resolve(expr.object)
+        if expr.start is not None:
+            self.resolve(expr.start)
+        if expr.stop is not None:
+            self.resolve(expr.stop)
+
+    def visit_map_expr(self, expr: "Expr"):
+        for key, value in zip(expr.keys, expr.values):
+            self.resolve(key)
+            self.resolve(value)
+
     def visit_return_stmt(self, stmt: "Stmt"):
         if self.current_function is FunctionType.NONE:
             raise CompilerError("Cannot return outside of a function")
         if stmt.value != None:
             self.resolve(stmt.value)
+            self.facts[-1].returns_value = True
+        # The value of a returned call is the value of the function, the
+        # interpreter can run it after leaving the current call
+        stmt.tail = isinstance(stmt.value, Call)
+        if stmt.tail and tracing.RESOLVER:
+            tracing.trace("resolver", "tail call line=%s", stmt.keyword.line)
+
+    def visit_yield_stmt(self, stmt: "Stmt"):
+        if self.current_function is FunctionType.NONE:
+            raise CompilerError("Cannot yield outside of a function")
+        if stmt.value is not None:
+            self.resolve(stmt.value)
+        # Every call of a generator returns a new generator, it cannot be memoized
+        self.facts[-1].impure = True
+        self.facts[-1].yields = True
@@ -0,0 +1,108 @@
+"""
+Lazy concatenation of long strings
+
+LOX strings are python strings, and `s = s + "..."` copies `s` every
+time, so a loop building a report runs in quadratic time. Once the
+result of a concatenation reaches ROPE_MINIMUM characters it becomes a
+Rope instead: a list of the pieces that are joined only when the text is
+needed, to be printed, compared or hashed. Every engine concatenates
+with concat
+"""
+
+# Shorter results are joined right away, copying them costs less than
+# keeping their pieces
+ROPE_MINIMUM = 256
+
+
+class Rope:
+    """
+    A string kept as the first `count` pieces of `chunks`
+
+    Appending to the rope that ends the list extends the list in place,
+    the new rope shares it with a larger count, so appending in a loop is
+    linear. Appending to an older rope copies its own pieces first, ropes
+    are values and never change
+
+    Args:
+        chunks (list): Python strings, possibly shared with other ropes
+        count (int): The number of leading pieces of `chunks` this rope holds
+        length (int): The total length of those pieces
+    """
+
+    __slots__ = ("_chunks", "_count", "_length", "_text")
+
+    def __init__(self, chunks, count, length):
+        self._chunks = chunks
+        self._count = count
+        self._length = length
+        self._text = None
+
+    def append(self, text):
+        """This rope followed by the python string `text`, as a new rope"""
+        chunks = self._chunks
+        if len(chunks) != self._count:
+            chunks = chunks[: self._count]
+        chunks.append(text)
+        return Rope(chunks, self._count + 1, self._length + len(text))
+
+    def __str__(self):
+        text = self._text
+        if text is None:
+            chunks = self._chunks
+            if len(chunks) == self._count:
+                text = "".join(chunks)
+                # Later appends start from the joined text
+                self._chunks = [text]
+                self._count = 1
+            else:
+                text = "".join(chunks[: self._count])
+            self._text = text
+        return text
+
+    def __len__(self):
+        return self._length
+
+    def __eq__(self, other):
+        if type(other) is Rope:
+            return self._length == other._length and str(self) == str(other)
+        if type(other) is str:
+            return self._length == len(other) and str(self) == other
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(str(self))
+
+    def __lt__(self, other):
+        return _text(self) < _text(other)
+
+    def __le__(self, other):
+        return _text(self) <= _text(other)
+
+    def __gt__(self, other):
+        return _text(self) > _text(other)
+
+    def __ge__(self, other):
+        return _text(self) >= _text(other)
+
+    def __repr__(self):
+        return repr(str(self))
+
+
+def _text(value):
+    """The python string of a rope, any other value unchanged"""
+    if type(value) is Rope:
+        return str(value)
+    return value
+
+
+def concat(left, right):
+    """The value of `left + right` when `left` is a string or a Rope
+
+    Like ExpressionInterpreter, `right` is converted with str
+    """
+    right = str(right)
+    if type(left) is Rope:
+        return left.append(right)
+    if len(left) + len(right) < ROPE_MINIMUM:
+        return left + right
+    return Rope([left, right], 2, len(left) + len(right))
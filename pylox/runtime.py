@@ -0,0 +1,172 @@
+"""
+Runtime support for Python modules generated by pylox.transpiler
+
+The generated code imports these helpers under `_lox_` prefixed aliases,
+so the helpers must keep exactly the semantics of ExpressionInterpreter
+"""
+import re
+
+from pylox.arrays import get_item, get_slice, set_item
+from pylox.callable import NativeFunction
+from pylox.classes import get_property, get_super, make_class, set_property
+from pylox.expr_eval import LoxRuntimeError, _runtime_error
+from pylox.iterators import LoxGenerator, iterate
+from pylox.maps import build_map
+from pylox.natives import install as install_natives
+from pylox.rope import Rope, concat
+from pylox.values import _is_number, _isTruthy
+
+is_truthy = _isTruthy
+
+_TAKES_ARGUMENTS = re.compile(
+    r"takes (\d+) positional arguments? but (\d+) (?:was|were) given"
+)
+_MISSING_ARGUMENTS = re.compile(r"missing \d+ required positional arguments?: '(\w+)'")
+
+
+def _operands_error(symbol, left):
+    return LoxRuntimeError(
+        msg=f"Operands for {symbol} should be int or float not {type(left)}"
+    )
+
+
+def add(left, right):
+    if isinstance(left, str):
+        return concat(left, right)
+    if _is_number(left) and _is_number(right):
+        return left + right
+    if type(left) is Rope:
+        return concat(left, right)
+    raise _operands_error("+", left)
+
+
+def subtract(left, right):
+    if _is_number(left) and _is_number(right):
+        return float(left) - float(right)
+    raise _operands_error("-", left)
+
+
+def multiply(left, right):
+    if _is_number(left) and _is_number(right):
+        return float(left) * float(right)
+    raise _operands_error("*", left)
+
+
+def divide(left, right):
+    if not (_is_number(left) and _is_number(right)):
+        raise _operands_error("/", left)
+    try:
+        return float(left) / float(right)
+    except ZeroDivisionError:
+        raise LoxRuntimeError(msg="ZeroDivisionError")
+
+
+def negate(operand):
+    if _is_number(operand):
+        return -(float(operand))
+    raise LoxRuntimeError(msg="Operand for - should be int or float")
+
+
+def undefined_assignment(name):
+    raise LoxRuntimeError(msg=f"Variable '{name}' is accessed but it was never defined")
+
+
+def generator(name):
+    """Decorate the python generator function of the LOX generator `name`,
+    so that calls return a LoxGenerator like the other engines"""
+
+    def decorate(function):
+        def call(*arguments):
+            return LoxGenerator(name, function(*arguments))
+
+        return call
+
+    return decorate
+
+
+class Method:
+    """
+    A method of a transpiled class
+
+    Args:
+        bind (function): Takes an instance and returns the python function
+            of the method with `this` set to it
+    """
+
+    __slots__ = ("bind",)
+
+    def __init__(self, bind):
+        self.bind = bind
+
+
+def define_natives(namespace):
+    """Define the native library in `namespace`, the globals of a generated module"""
+
+    def define_native(name, function, arity):
+        namespace["g_" + name] = NativeFunction(name, function, arity)
+
+    install_natives(define_native)
+
+
+def _lox_line(traceback, filename, lines):
+    """Return the LOX line of the innermost generated frame in `traceback`"""
+    line = "?"
+    while traceback is not None:
+        if traceback.tb_frame.f_code.co_filename == filename:
+            lineno = traceback.tb_lineno
+            if lineno < len(lines):
+                line = lines[lineno]
+        traceback = traceback.tb_next
+    return line
+
+
+def _lox_message(error, parameters):
+    """Translate a Python exception raised by generated code into a LOX message"""
+    if isinstance(error, LoxRuntimeError):
+        return error.msg
+    if isinstance(error, RecursionError):
+        return "Stack overflow"
+    if isinstance(error, NameError):
+        name = getattr(error, "name", None) or str(error).split("'")[1]
+        return f"Token {name[2:]} is not defined"
+    message = str(error)
+    if "object is not callable" in message:
+        return "you can only call functions"
+    match = _TAKES_ARGUMENTS.search(message)
+    if match:
+        return f"Expected {match.group(1)} arguments but got {match.group(2)}"
+    match = _MISSING_ARGUMENTS.search(message)
+    if match:
+        # The first missing parameter tells how many arguments were passed
+        if match.group(1) in parameters:
+            position, arity = parameters[match.group(1)]
+            return f"Expected {arity} arguments but got {position}"
+        return "Not enough arguments in function call"
+    return None
+
+
+def run(main, lines, parameters=None):
+    """Run the `main` function of a generated module
+
+    Runtime errors are reported the way ExpressionInterpreter reports
+    them, with the line number of the LOX source
+
+    Args:
+        main (function): The generated entry point
+        lines (tuple): Maps line numbers of the generated code to LOX lines
+        parameters (dict): Maps the python name of every parameter of the
+            generated functions to its position and the arity of its function
+
+    Returns:
+        bool: False if a runtime error was reported, True otherwise
+    """
+    try:
+        main()
+    except (LoxRuntimeError, NameError, TypeError, RecursionError) as error:
+        message = _lox_message(error, parameters or {})
+        if message is None:
+            raise
+        filename = main.__code__.co_filename
+        _runtime_error(message, _lox_line(error.__traceback__, filename, lines))
+        return False
+    return True
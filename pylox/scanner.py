@@ -1,3 +1,7 @@
+import re
+from array import array
+
+from pylox import tracing
 from pylox.tokens import TokenType
 
 
@@ -26,6 +30,8 @@ class UnterminatedLine(Exception):
 
 
 class LoxToken:
+    __slots__ = ("type_", "lexeme", "literal", "line", "offset")
+
     def __init__(
         self, type_: TokenType, lexeme: str, literal: str, line: int, offset: int
     ):
@@ -48,7 +54,7 @@ class LoxToken:
         return self.__repr__()
 
     def __repr__(self):
-        return f"{self.__class__.__name__}(type={self.type_}, lexeme='{self.lexeme}', literal={self.literal}, line={self.line}, offset={self.offset})"
+        return f"{self.__class__.__name__}(type={TokenType.NAMES.get(self.type_, self.type_)}, lexeme='{self.lexeme}', literal={self.literal}, line={self.line}, offset={self.offset})"
 
     def __hash__(self):
         return hash((self.type_, self.lexeme, self.literal, self.line, self.offset))
@@ -90,6 +96,10 @@ class LoxScanner:
             offset=self._start,
         )
         self.tokens.append(token)
+        if tracing.SCANNER:
+            tracing.trace(
+                "scanner", "%s %r line=%s", TokenType.NAMES[type_], text, self._line
+            )
 
     def scan_token(self):
         """
@@ -118,6 +128,12 @@ class LoxScanner:
             self.add_token(TokenType.SEMICOLON)
         elif char == "*":
             self.add_token(TokenType.STAR)
+        elif char == "[":
+            self.add_token(TokenType.LEFT_BRACKET)
+        elif char == "]":
+            self.add_token(TokenType.RIGHT_BRACKET)
+        elif char == ":":
+            self.add_token(TokenType.COLON)
         elif char == "/":
             if self.match(expected="/"):
                 # We matched a comment
@@ -239,3 +255,267 @@ class LoxScanner:
         Increments the current character offset in the scanner
         """
         self._current += 1
+
+
+# Every character of the source belongs to exactly one match, so offsets
+# are recovered by adding up the length of the lexemes
+_LEXEME_PATTERN = re.compile(
+    r"""
+    [ \t\r]+
+    | \n
+    | [A-Za-z_][A-Za-z0-9_]*
+    | [0-9]+(?:\.[0-9]+)?
+    | //[^\n]*
+    | [!=<>]=?
+    | "[^"]*"
+    | .
+    """,
+    re.VERBOSE | re.DOTALL,
+)
+
+_OPERATORS = {
+    lexeme: type_
+    for type_, lexeme in TokenType.TOKENS_TO_LEXEMES.items()
+    if lexeme not in TokenType.KEYWORDS
+}
+
+
+# What a lexeme is, decided by its first character
+_WHITESPACE = 0
+_NEWLINE = 1
+_IDENTIFIER = 2
+_NUMBER = 3
+_OPERATOR = 4
+_SLASH = 5
+_STRING = 6
+_UNKNOWN = 7
+
+_KINDS = dict.fromkeys(" \t\r", _WHITESPACE)
+_KINDS["\n"] = _NEWLINE
+_KINDS.update(
+    dict.fromkeys("abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ_", _IDENTIFIER)
+)
+_KINDS.update(dict.fromkeys("0123456789", _NUMBER))
+_KINDS.update(dict.fromkeys(_OPERATORS, _OPERATOR))
+_KINDS["/"] = _SLASH
+_KINDS['"'] = _STRING
+
+
+class TokenBuffer:
+    """
+    A token stream stored column by column
+
+    Each token takes an entry in four parallel arrays: its kind, its start
+    offset, its length and its line. Lexemes and literals are sliced from
+    the source only when asked for, and LoxToken objects are built on
+    demand as views of one entry
+
+    Args:
+        source (str): The scanned text
+        base (int): Offset of `source` in the whole LOX source, when it is
+            only a chunk of it
+    """
+
+    __slots__ = ("source", "base", "kinds", "starts", "lengths", "lines")
+
+    def __init__(self, source, base=0):
+        self.source = source
+        self.base = base
+        self.kinds = array("B")
+        self.starts = array("L")
+        self.lengths = array("L")
+        self.lines = array("L")
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def __getitem__(self, index):
+        kind = self.kinds[index]
+        offset = self.starts[index]
+        start = offset - self.base
+        lexeme = self.source[start : start + self.lengths[index]]
+        literal = None
+        if kind == TokenType.NUMBER:
+            literal = float(lexeme) if "." in lexeme else int(lexeme)
+        elif kind == TokenType.STRING:
+            literal = lexeme[1:-1]
+        return LoxToken(kind, lexeme, literal, self.lines[index], offset)
+
+    def __iter__(self):
+        for index in range(len(self.kinds)):
+            yield self[index]
+
+    def kind(self, index):
+        """Return the kind of token `index`, EOF past the end of the stream"""
+        try:
+            return self.kinds[index]
+        except IndexError:
+            return TokenType.EOF
+
+    def line(self, index):
+        """Return the line of token `index`, None past the end of the stream"""
+        try:
+            return self.lines[index]
+        except IndexError:
+            return None
+
+    def lexeme(self, index):
+        start = self.starts[index] - self.base
+        return self.source[start : start + self.lengths[index]]
+
+    def literal(self, index):
+        return self[index].literal
+
+
+class RegexScanner(LoxScanner):
+    """
+    Scanner that splits the source into lexemes with one compiled regular
+    expression and classifies each lexeme with a table keyed on its first
+    character
+
+    It produces exactly the tokens, line numbers and errors of LoxScanner,
+    which steps through the source one character at a time. scan_buffer
+    returns them as a compact TokenBuffer
+    """
+
+    def __init__(self, source):
+        super().__init__(source)
+        self.buffer = TokenBuffer(source)
+
+    def scan_tokens(self):
+        try:
+            self.scan_buffer()
+        finally:
+            self.tokens.extend(self.buffer)
+        return self.tokens
+
+    def scan_buffer(self):
+        self._start = self._current = self._scan(self.source, offset=0, final=True)
+        return self.buffer
+
+    def _scan(self, text, offset, final):
+        """Append the tokens of `text`, which starts at `offset` in the source
+
+        Unless `final` is set, scanning stops before a string that is not
+        terminated within `text`, since its end may follow in the next chunk
+
+        Returns:
+            int: The offset in the source where scanning stopped
+        """
+        buffer = self.buffer
+        add_kind = buffer.kinds.append
+        add_start = buffer.starts.append
+        add_length = buffer.lengths.append
+        add_line = buffer.lines.append
+        keywords = TokenType.KEYWORDS
+        operators = _OPERATORS
+        kinds = _KINDS
+        identifier = TokenType.IDENTIFIER
+        trace = tracing.SCANNER
+        line = self._line
+        start = offset
+
+        for lexeme in _LEXEME_PATTERN.findall(text):
+            kind = kinds.get(lexeme[0], _UNKNOWN)
+            if kind == _IDENTIFIER:
+                type_ = keywords.get(lexeme, identifier)
+            elif kind == _WHITESPACE:
+                offset += len(lexeme)
+                continue
+            elif kind == _OPERATOR:
+                type_ = operators[lexeme]
+            elif kind == _NEWLINE:
+                line += 1
+                offset += 1
+                continue
+            elif kind == _NUMBER:
+                type_ = TokenType.NUMBER
+            elif kind == _SLASH:
+                if lexeme != "/":
+                    # A comment, it never contains the newline ending it
+                    offset += len(lexeme)
+                    continue
+                type_ = TokenType.SLASH
+            elif kind == _STRING and len(lexeme) > 1:
+                line += lexeme.count("\n")
+                type_ = TokenType.STRING
+            elif kind == _STRING and not final:
+                break
+            else:
+                self._fail(kind, text[offset - start :], line, offset)
+            length = len(lexeme)
+            add_kind(type_)
+            add_start(offset)
+            add_length(length)
+            add_line(line)
+            if trace:
+                tracing.trace(
+                    "scanner", "%s %r line=%s", TokenType.NAMES[type_], lexeme, line
+                )
+            offset += length
+
+        self._line = line
+        return offset
+
+    def _fail(self, kind, rest, line, offset):
+        """Report an unterminated string or an unknown character like LoxScanner
+
+        Args:
+            rest (str): The source from the offending lexeme onwards
+        """
+        if kind == _STRING:
+            self._line = line + rest.count("\n")
+            error(line=self._line, message="No matching '\"' found ")
+            raise UnterminatedLine()
+        self._line = line
+        error(line, f"Token at {offset + 1} not recognised")
+        raise TokenNotRecognised(
+            "Line %s offset %s token  not recognised: %s" % (line, offset + 1, rest[0])
+        )
+
+
+CHUNK_SIZE = 64 * 1024
+
+
+def read_chunks(file, size=CHUNK_SIZE):
+    """Yield the contents of the text file `file` in chunks of `size` characters"""
+    with open(file, "r") as sourcefile:
+        while True:
+            chunk = sourcefile.read(size)
+            if not chunk:
+                return
+            yield chunk
+
+
+def stream_tokens(chunks):
+    """Scan LOX source arriving as an iterable of string chunks
+
+    Tokens are yielded as soon as the line holding them is complete, so
+    only the current chunk and the tokens scanned from it are in memory.
+    The tokens, line numbers and errors are those of RegexScanner run on
+    the concatenated source
+
+    Args:
+        chunks (Iterable[str]): Successive pieces of the source
+
+    Yields:
+        LoxToken: The tokens of the source, in order
+    """
+    scanner = RegexScanner(source="")
+    pending = ""
+    offset = 0
+    for chunk in chunks:
+        pending += chunk
+        # Lexemes never span lines, strings aside, which _scan holds back
+        end = pending.rfind("\n") + 1
+        if end == 0 or (pending[0] == '"' and pending.find('"', 1) == -1):
+            continue
+        text = pending[:end]
+        scanner.buffer = TokenBuffer(text, base=offset)
+        stop = scanner._scan(text, offset=offset, final=False)
+        pending = pending[stop - offset :]
+        offset = stop
+        yield from scanner.buffer
+    scanner.buffer = TokenBuffer(pending, base=offset)
+    scanner._scan(pending, offset=offset, final=True)
+    yield from scanner.buffer
@@ -1,16 +1,22 @@
 # This file was autogenerated by pylox
-# on June 22, 2022 11:43:26
+# on October 18, 2026 22:29:08
 from typing import List
 
 from pylox.scanner import LoxToken as Token
 
 
 class Stmt:
+    __slots__ = ()
+    _fields = ()
+
     def accept(self, visitor: "StmtVisitor"):
         raise NotImplementedError("Subclasses should implement this method")
 
 
 class Expression(Stmt):
+    __slots__ = ("expression",)
+    _fields = ("expression",)
+
     def __init__(self, expression: "Expr"):
         self.expression = expression
 
@@ -20,14 +26,11 @@ class Expression(Stmt):
     def __repr__(self):
         return f"{self.__class__.__name__}(expression={self.expression})"
 
-    def __eq__(self, other):
-        return isinstance(other, self.__class__) and self.expression == other.expression
-
-    def __hash__(self):
-        return hash((self.expression,))
-
 
 class Print(Stmt):
+    __slots__ = ("expression",)
+    _fields = ("expression",)
+
     def __init__(self, expression: "Expr"):
         self.expression = expression
 
@@ -37,14 +40,11 @@ class Print(Stmt):
     def __repr__(self):
         return f"{self.__class__.__name__}(expression={self.expression})"
 
-    def __eq__(self, other):
-        return isinstance(other, self.__class__) and self.expression == other.expression
-
-    def __hash__(self):
-        return hash((self.expression,))
-
 
 class Var(Stmt):
+    __slots__ = ("name", "initialiser")
+    _fields = ("name", "initialiser")
+
     def __init__(self, name: "Token", initialiser: "Expr"):
         self.name = name
         self.initialiser = initialiser
@@ -55,25 +55,14 @@ class Var(Stmt):
     def __repr__(self):
         return f"{self.__class__.__name__}(name={self.name}, initialiser={self.initialiser})"
 
-    def __eq__(self, other):
-        return (
-            isinstance(other, self.__class__)
-            and self.name == other.name
-            and self.initialiser == other.initialiser
-        )
-
-    def __hash__(self):
-        return hash(
-            (
-                self.name,
-                self.initialiser,
-            )
-        )
-
 
 class Block(Stmt):
+    __slots__ = ("statements", "flat")
+    _fields = ("statements",)
+
     def __init__(self, statements: "List[Stmt]"):
         self.statements = statements
+        self.flat = None
 
     def accept(self, visitor: "StmtVisitor"):
         return visitor.visit_block_stmt(self)
@@ -81,14 +70,11 @@ class Block(Stmt):
     def __repr__(self):
         return f"{self.__class__.__name__}(statements={self.statements})"
 
-    def __eq__(self, other):
-        return isinstance(other, self.__class__) and self.statements == other.statements
-
-    def __hash__(self):
-        return hash((self.statements,))
-
 
 class If(Stmt):
+    __slots__ = ("condition", "then_branch", "else_branch")
+    _fields = ("condition", "then_branch", "else_branch")
+
     def __init__(self, condition: "Expr", then_branch: "Stmt", else_branch: "Stmt"):
         self.condition = condition
         self.then_branch = then_branch
@@ -100,25 +86,11 @@ class If(Stmt):
     def __repr__(self):
         return f"{self.__class__.__name__}(condition={self.condition}, then_branch={self.then_branch}, else_branch={self.else_branch})"
 
-    def __eq__(self, other):
-        return (
-            isinstance(other, self.__class__)
-            and self.condition == other.condition
-            and self.then_branch == other.then_branch
-            and self.else_branch == other.else_branch
-        )
-
-    def __hash__(self):
-        return hash(
-            (
-                self.condition,
-                self.then_branch,
-                self.else_branch,
-            )
-        )
-
 
 class While(Stmt):
+    __slots__ = ("condition", "statement")
+    _fields = ("condition", "statement")
+
     def __init__(self, condition: "Expr", statement: "Stmt"):
         self.condition = condition
         self.statement = statement
@@ -129,27 +101,17 @@ class While(Stmt):
     def __repr__(self):
         return f"{self.__class__.__name__}(condition={self.condition}, statement={self.statement})"
 
-    def __eq__(self, other):
-        return (
-            isinstance(other, self.__class__)
-            and self.condition == other.condition
-            and self.statement == other.statement
-        )
-
-    def __hash__(self):
-        return hash(
-            (
-                self.condition,
-                self.statement,
-            )
-        )
-
 
 class Function(Stmt):
+    __slots__ = ("name", "body", "params", "pure", "generator")
+    _fields = ("name", "body", "params")
+
     def __init__(self, name: "Token", body: "List[Stmt]", params: "List[Token]"):
         self.name = name
         self.body = body
         self.params = params
+        self.pure = None
+        self.generator = None
 
     def accept(self, visitor: "StmtVisitor"):
         return visitor.visit_function_stmt(self)
@@ -157,28 +119,15 @@ class Function(Stmt):
     def __repr__(self):
         return f"{self.__class__.__name__}(name={self.name}, body={self.body}, params={self.params})"
 
-    def __eq__(self, other):
-        return (
-            isinstance(other, self.__class__)
-            and self.name == other.name
-            and self.body == other.body
-            and self.params == other.params
-        )
-
-    def __hash__(self):
-        return hash(
-            (
-                self.name,
-                self.body,
-                self.params,
-            )
-        )
-
 
 class Return(Stmt):
+    __slots__ = ("keyword", "value", "tail")
+    _fields = ("keyword", "value")
+
     def __init__(self, keyword: "Token", value: "Expr"):
         self.keyword = keyword
         self.value = value
+        self.tail = None
 
     def accept(self, visitor: "StmtVisitor"):
         return visitor.visit_return_stmt(self)
@@ -186,17 +135,67 @@ class Return(Stmt):
     def __repr__(self):
         return f"{self.__class__.__name__}(keyword={self.keyword}, value={self.value})"
 
-    def __eq__(self, other):
-        return (
-            isinstance(other, self.__class__)
-            and self.keyword == other.keyword
-            and self.value == other.value
-        )
-
-    def __hash__(self):
-        return hash(
-            (
-                self.keyword,
-                self.value,
-            )
-        )
+
+class Yield(Stmt):
+    __slots__ = ("keyword", "value")
+    _fields = ("keyword", "value")
+
+    def __init__(self, keyword: "Token", value: "Expr"):
+        self.keyword = keyword
+        self.value = value
+
+    def accept(self, visitor: "StmtVisitor"):
+        return visitor.visit_yield_stmt(self)
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(keyword={self.keyword}, value={self.value})"
+
+
+class ForIn(Stmt):
+    __slots__ = ("keyword", "name", "iterable", "body")
+    _fields = ("keyword", "name", "iterable", "body")
+
+    def __init__(self, keyword: "Token", name: "Token", iterable: "Expr", body: "Stmt"):
+        self.keyword = keyword
+        self.name = name
+        self.iterable = iterable
+        self.body = body
+
+    def accept(self, visitor: "StmtVisitor"):
+        return visitor.visit_forin_stmt(self)
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(keyword={self.keyword}, name={self.name}, iterable={self.iterable}, body={self.body})"
+
+
+class CountedLoop(Stmt):
+    __slots__ = ("condition", "statement", "increment", "step")
+    _fields = ("condition", "statement", "increment")
+
+    def __init__(self, condition: "Expr", statement: "Stmt", increment: "Expr"):
+        self.condition = condition
+        self.statement = statement
+        self.increment = increment
+        self.step = None
+
+    def accept(self, visitor: "StmtVisitor"):
+        return visitor.visit_countedloop_stmt(self)
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(condition={self.condition}, statement={self.statement}, increment={self.increment})"
+
+
+class Class(Stmt):
+    __slots__ = ("name", "superclass", "methods")
+    _fields = ("name", "superclass", "methods")
+
+    def __init__(self, name: "Token", superclass: "Expr", methods: "List[Stmt]"):
+        self.name = name
+        self.superclass = superclass
+        self.methods = methods
+
+    def accept(self, visitor: "StmtVisitor"):
+        return visitor.visit_class_stmt(self)
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(name={self.name}, superclass={self.superclass}, methods={self.methods})"
@@ -1,51 +1,66 @@
 class TokenType:
+    """
+    Kinds of tokens, small ints so token streams can be stored in arrays
+
+    A plain class rather than an IntEnum: looking up enum members costs
+    about ten times as much as a class attribute, and the parser and the
+    tree-walking interpreter look them up on every check
+    """
 
     # Single character tokens
-    LEFT_PAREN = "LEFT_PAREN"
-    RIGHT_PAREN = "RIGHT_PAREN"
-    LEFT_BRACE = "LEFT_BRACE"
-    RIGHT_BRACE = "RIGHT_BRACE"
-    COMMA = "COMMA"
-    DOT = "DOT"
-    MINUS = "MINUS"
-    PLUS = "PLUS"
-    SEMICOLON = "SEMICOLON"
-    SLASH = "SLASH"
-    STAR = "STAR"
+    LEFT_PAREN = 0
+    RIGHT_PAREN = 1
+    LEFT_BRACE = 2
+    RIGHT_BRACE = 3
+    COMMA = 4
+    DOT = 5
+    MINUS = 6
+    PLUS = 7
+    SEMICOLON = 8
+    SLASH = 9
+    STAR = 10
 
     # 1 or 2 character tokens
-    BANG = "BANG"
-    BANG_EQUAL = "BANG_EQUAL"
-    EQUAL = "EQUAL"
-    EQUAL_EQUAL = "EQUAL_EQUAL"
-    GREATER = "GREATER"
-    GREATER_EQUAL = "GREATER_EQUAL"
-    LESS = "LESS"
-    LESS_EQUAL = "LESS_EQUAL"
+    BANG = 11
+    BANG_EQUAL = 12
+    EQUAL = 13
+    EQUAL_EQUAL = 14
+    GREATER = 15
+    GREATER_EQUAL = 16
+    LESS = 17
+    LESS_EQUAL = 18
 
     # Literals
-    IDENTIFIER = "IDENTIFIER"
-    STRING = "STRING"
-    NUMBER = "NUMBER"
+    IDENTIFIER = 19
+    STRING = 20
+    NUMBER = 21
+
+    AND = 22
+    CLASS = 23
+    ELSE = 24
+    FALSE = 25
+    IF = 26
+    FUN = 27
+    FOR = 28
+    NIL = 29
+    OR = 30
+    PRINT = 31
+    RETURN = 32
+    SUPER = 33
+    THIS = 34
+    TRUE = 35
+    VAR = 36
+    WHILE = 37
+    EOF = 38
+
+    # Subscripts and slices, numbered after the others
+    LEFT_BRACKET = 39
+    RIGHT_BRACKET = 40
+    COLON = 41
 
-    AND = "AND"
-    CLASS = "CLASS"
-    ELSE = "ELSE"
-    FALSE = "FALSE"
-    IF = "IF"
-    FUN = "FUN"
-    FOR = "FOR"
-    IF = "IF"
-    NIL = "NIL"
-    OR = "OR"
-    PRINT = "PRINT"
-    RETURN = "RETURN"
-    SUPER = "SUPER"
-    THIS = "THIS"
-    TRUE = "TRUE"
-    VAR = "VAR"
-    WHILE = "WHILE"
-    EOF = "EOF"
+    # Generators and for-in loops
+    IN = 42
+    YIELD = 43
 
     KEYWORDS = {
         "and": AND,
@@ -66,6 +81,8 @@ class TokenType:
         "var": VAR,
         "while": WHILE,
         "eof": EOF,
+        "in": IN,
+        "yield": YIELD,
     }
 
     TOKENS_TO_LEXEMES = {
@@ -106,4 +123,16 @@ class TokenType:
         VAR: "var",
         WHILE: "while",
         EOF: "eof",
+        LEFT_BRACKET: "[",
+        RIGHT_BRACKET: "]",
+        COLON: ":",
+        IN: "in",
+        YIELD: "yield",
     }
+
+
+TokenType.NAMES = {
+    value: name
+    for name, value in vars(TokenType).items()
+    if not name.startswith("_") and isinstance(value, int)
+}
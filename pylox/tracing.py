@@ -0,0 +1,95 @@
+"""
+Opt-in tracing of the interpreter internals
+
+Tracing is off unless categories are enabled with the PYLOX_TRACE
+environment variable or the `--trace` command line flag, both taking a
+comma separated list such as `resolver,env` or `all`.
+
+Call sites guard every record with the category flag, so a disabled
+category costs one attribute lookup:
+
+    if tracing.ENV:
+        tracing.trace("env", "get_at depth=%s slot=%s", depth, slot)
+
+Records are kept unformatted in a ring buffer of the last BUFFER_SIZE
+entries and only formatted when the buffer is flushed, on runtime and
+compiler errors or on demand
+"""
+import os
+import sys
+from collections import deque
+
+CATEGORIES = ("scanner", "resolver", "env", "calls")
+ENV_VAR = "PYLOX_TRACE"
+BUFFER_SIZE = 10000
+
+SCANNER = False
+RESOLVER = False
+ENV = False
+CALLS = False
+
+_buffer = deque(maxlen=BUFFER_SIZE)
+
+
+class TracingError(Exception):
+    pass
+
+
+def enable(categories):
+    """Turn tracing on for `categories`
+
+    Args:
+        categories (str | Iterable[str]): Category names, a comma separated
+            string of them, or "all"
+    """
+    if isinstance(categories, str):
+        categories = [name.strip() for name in categories.split(",")]
+    categories = [name for name in categories if name]
+    if "all" in categories:
+        categories = CATEGORIES
+    for name in categories:
+        if name not in CATEGORIES:
+            raise TracingError(
+                f"Unknown trace category '{name}', expected one of "
+                f"{', '.join(CATEGORIES)} or all"
+            )
+        globals()[name.upper()] = True
+
+
+def disable():
+    """Turn every category off and drop buffered records"""
+    for name in CATEGORIES:
+        globals()[name.upper()] = False
+    _buffer.clear()
+
+
+def enabled():
+    """Return True when at least one category is traced"""
+    return SCANNER or RESOLVER or ENV or CALLS
+
+
+def trace(category, message, *args):
+    """Record `message % args`, formatting is deferred until flush"""
+    _buffer.append((category, message, args))
+
+
+def records():
+    """Return the buffered records as formatted strings, oldest first"""
+    return [
+        f"[{category}] {message % args if args else message}"
+        for category, message, args in _buffer
+    ]
+
+
+def flush(stream=None):
+    """Write the buffered records to `stream`, stderr by default, and clear them"""
+    if not _buffer:
+        return
+    stream = sys.stderr if stream is None else stream
+    for record in records():
+        stream.write(record + "\n")
+    stream.flush()
+    _buffer.clear()
+
+
+enable(os.environ.get(ENV_VAR, ""))
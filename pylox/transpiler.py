@@ -0,0 +1,761 @@
+import warnings
+from datetime import datetime
+from typing import List
+
+from pylox.callable import NativeFunction
+from pylox.expr import Binary, Grouping, Logical, Unary
+from pylox.natives import LIBRARY
+from pylox.resolver import CompilerError
+from pylox.runtime import define_natives, run
+from pylox.tokens import TokenType
+from pylox.visitor import Visitor
+
+INDENT = "    "
+
+RUNTIME_HELPERS = (
+    "add",
+    "subtract",
+    "multiply",
+    "divide",
+    "negate",
+    "is_truthy",
+    "undefined_assignment",
+    "define_natives",
+    "get_item",
+    "set_item",
+    "get_slice",
+    "build_map",
+    "iterate",
+    "generator",
+    "make_class",
+    "Method",
+    "get_property",
+    "set_property",
+    "get_super",
+    "run",
+)
+
+ARITHMETIC = {
+    TokenType.PLUS: "add",
+    TokenType.MINUS: "subtract",
+    TokenType.STAR: "multiply",
+    TokenType.SLASH: "divide",
+}
+
+# Longer chains of binary operations are transpiled by Transpiler._chain
+CHAIN_LIMIT = 32
+
+COMPARISONS = {
+    TokenType.BANG_EQUAL: "!=",
+    TokenType.EQUAL_EQUAL: "==",
+    TokenType.GREATER: ">",
+    TokenType.GREATER_EQUAL: ">=",
+    TokenType.LESS: "<",
+    TokenType.LESS_EQUAL: "<=",
+}
+
+
+class _Binding:
+    """
+    A local LOX variable and the unique python name it is transpiled to
+    """
+
+    __slots__ = ("python_name", "function", "loop", "owner")
+
+    def __init__(self, python_name, function, loop):
+        self.python_name = python_name
+        self.function = function
+        self.loop = loop
+        # Python function that defines the name, known while emitting code
+        self.owner = None
+
+
+class _Analyzer(Visitor):
+    """
+    First pass of the Transpiler
+
+    Binds every variable reference to its declaration, using the same
+    scoping rules as pylox.resolver.Resolver, and finds the loops whose
+    body declares variables captured by a closure. Python closures capture
+    variables per function call and not per loop iteration, so those loop
+    bodies have to become functions of their own
+    """
+
+    def __init__(self):
+        self.scopes = []
+        self.function = None
+        self.loops = []
+        self.counter = 0
+
+        self.references = {}
+        self.declarations = {}
+        self.parameters = {}
+        self.scoped_loops = set()
+        self.global_names = set()
+
+    def analyze(self, statements):
+        self.function = object()
+        self._all(statements)
+
+    def _all(self, nodes):
+        for node in nodes:
+            node.accept(self)
+
+    def _declare(self, stmt, name):
+        if not self.scopes:
+            self.global_names.add(name)
+            self.declarations[id(stmt)] = None
+            return None
+        self.counter += 1
+        loop = self.loops[-1] if self.loops else None
+        binding = _Binding(f"l{self.counter}_{name}", self.function, loop)
+        self.scopes[-1][name] = binding
+        self.declarations[id(stmt)] = binding
+        return binding
+
+    def _reference(self, expr, name):
+        for scope in reversed(self.scopes):
+            binding = scope.get(name)
+            if binding is not None:
+                if binding.function is not self.function and binding.loop:
+                    self.scoped_loops.add(binding.loop)
+                self.references[id(expr)] = binding
+                return
+        self.references[id(expr)] = None
+
+    def visit_literal_expr(self, expr: "Expr"):
+        pass
+
+    def visit_binary_expr(self, expr: "Expr"):
+        self._all((expr.left, expr.right))
+
+    def visit_unary_expr(self, expr: "Expr"):
+        expr.right.accept(self)
+
+    def visit_grouping_expr(self, expr: "Expr"):
+        expr.expression.accept(self)
+
+    def visit_logical_expr(self, expr: "Expr"):
+        self._all((expr.left, expr.right))
+
+    def visit_variable_expr(self, expr: "Expr"):
+        self._reference(expr, expr.name.lexeme)
+
+    def visit_assign_expr(self, expr: "Expr"):
+        expr.to_assign.accept(self)
+        self._reference(expr, expr.assign_to.lexeme)
+
+    def visit_call_expr(self, expr: "Expr"):
+        expr.callee.accept(self)
+        self._all(expr.arguments)
+
+    def visit_get_expr(self, expr: "Expr"):
+        expr.object.accept(self)
+
+    def visit_set_expr(self, expr: "Expr"):
+        self._all((expr.object, expr.value))
+
+    def visit_this_expr(self, expr: "Expr"):
+        self._reference(expr, "this")
+
+    def visit_super_expr(self, expr: "Expr"):
+        self._reference(expr, "super")
+        # The instance the method is bound to
+        self._reference(expr.method, "this")
+
+    def visit_subscript_expr(self, expr: "Expr"):
+        self._all((expr.object, expr.index))
+
+    def visit_setsubscript_expr(self, expr: "Expr"):
+        self._all((expr.object, expr.index, expr.value))
+
+    def visit_map_expr(self, expr: "Expr"):
+        self._all(expr.keys)
+        self._all(expr.values)
+
+    def visit_slice_expr(self, expr: "Expr"):
+        self._all(bound for bound in (expr.object, expr.start, expr.stop) if bound)
+
+    def visit_print_stmt(self, stmt: "Stmt"):
+        stmt.expression.accept(self)
+
+    def visit_expression_stmt(self, stmt: "Stmt"):
+        stmt.expression.accept(self)
+
+    def visit_var_stmt(self, stmt: "Stmt"):
+        if stmt.initialiser is not None:
+            stmt.initialiser.accept(self)
+        self._declare(stmt, stmt.name)
+
+    def visit_block_stmt(self, stmt: "Stmt"):
+        self.scopes.append({})
+        self._all(stmt.statements)
+        self.scopes.pop()
+
+    def visit_if_stmt(self, stmt: "Stmt"):
+        self._all((stmt.condition, stmt.then_branch))
+        if stmt.else_branch:
+            stmt.else_branch.accept(self)
+
+    def visit_while_stmt(self, stmt: "Stmt"):
+        stmt.condition.accept(self)
+        self.loops.append(id(stmt))
+        stmt.statement.accept(self)
+        self.loops.pop()
+
+    def visit_countedloop_stmt(self, stmt: "Stmt"):
+        self.visit_while_stmt(stmt)
+        stmt.increment.accept(self)
+
+    def visit_forin_stmt(self, stmt: "Stmt"):
+        stmt.iterable.accept(self)
+        self.loops.append(id(stmt))
+        self.scopes.append({})
+        self._declare(stmt, stmt.name.lexeme)
+        stmt.body.accept(self)
+        self.scopes.pop()
+        self.loops.pop()
+
+    def visit_class_stmt(self, stmt: "Stmt"):
+        self._declare(stmt, stmt.name.lexeme)
+        if stmt.superclass is not None:
+            stmt.superclass.accept(self)
+            self.scopes.append({})
+            self._declare(stmt.superclass, "super")
+        for method in stmt.methods:
+            # `this` is the parameter of a function making the method
+            self.scopes.append({})
+            self._declare(method.name, "this")
+            self._function(method)
+            self.scopes.pop()
+        if stmt.superclass is not None:
+            self.scopes.pop()
+
+    def visit_function_stmt(self, stmt: "Stmt"):
+        self._declare(stmt, stmt.name.name.lexeme)
+        self._function(stmt)
+
+    def _function(self, stmt):
+        enclosing = (self.function, self.loops)
+        self.function = object()
+        self.loops = []
+
+        self.scopes.append({})
+        self.parameters[id(stmt)] = [
+            self._declare(param, param.name.lexeme) for param in stmt.params
+        ]
+        self._all(stmt.body)
+        self.scopes.pop()
+        self.function, self.loops = enclosing
+
+    def visit_return_stmt(self, stmt: "Stmt"):
+        if stmt.value is not None:
+            stmt.value.accept(self)
+
+    def visit_yield_stmt(self, stmt: "Stmt"):
+        if stmt.value is not None:
+            stmt.value.accept(self)
+
+
+class _PythonFunction:
+    """
+    A python function being emitted, with the names it has to declare
+    `global` or `nonlocal` because it assigns them, and whether it yields,
+    which makes it a python generator function
+    """
+
+    def __init__(self, is_loop_body=False):
+        self.is_loop_body = is_loop_body
+        self.globals = set()
+        self.nonlocals = set()
+        self.yields = False
+
+    def declarations(self, depth, line):
+        lines = []
+        if self.globals:
+            lines.append((depth, "global " + ", ".join(sorted(self.globals)), line))
+        if self.nonlocals:
+            lines.append((depth, "nonlocal " + ", ".join(sorted(self.nonlocals)), line))
+        return lines
+
+
+class Transpiler(Visitor):
+    """
+    Transpile a resolved LOX program into the source of a python module
+
+    LOX functions become python functions and local variables become
+    python locals with unique names, so CPython's own bytecode runs the
+    program. The module imports its arithmetic and truthiness helpers from
+    pylox.runtime and exposes `_lox_main` together with `_LOX_LINES`, the
+    mapping of generated lines back to LOX lines, and `_LOX_PARAMETERS`,
+    the position and arity of every parameter, used for error reports
+    """
+
+    def __init__(self, source_name="<lox>", known_globals=()):
+        self.source_name = source_name
+        # The generated module defines the native library itself
+        self.known_globals = set(known_globals) | set(LIBRARY)
+        self.analyzer = None
+        self.function = None
+        self.line = 0
+        self.temporaries = 0
+        self.loop_bodies = 0
+        # python parameter name -> (position, arity of its function)
+        self.parameters = {}
+
+    def transpile(self, statements: List["Stmt"]):
+        self.analyzer = _Analyzer()
+        self.analyzer.analyze(statements)
+        self.known_globals |= self.analyzer.global_names
+
+        self.function = _PythonFunction()
+        body = self._block(statements, depth=1)
+        main = [(0, "def _lox_main():", 0)]
+        main += self.function.declarations(1, 0)
+        main += body or [(1, "pass", 0)]
+
+        header = [
+            "# This file was generated by pylox from " + self.source_name,
+            "# on " + datetime.now().strftime("%B %d, %Y %H:%M:%S"),
+        ]
+        header += [
+            f"from pylox.runtime import {helper} as _lox_{helper}"
+            for helper in RUNTIME_HELPERS
+        ]
+        header.append("")
+        header.append("")
+
+        source = list(header)
+        lines = [0] * (len(header) + 1)
+        for depth, text, line in main:
+            source.append(INDENT * depth + text)
+            lines.append(line)
+        source.append("")
+        source.append("_LOX_LINES = " + repr(tuple(lines)))
+        source.append("_LOX_PARAMETERS = " + repr(self.parameters))
+        source.append("")
+        source.append('if __name__ == "__main__":')
+        source.append(INDENT + "_lox_define_natives(globals())")
+        source.append(INDENT + "_lox_run(_lox_main, _LOX_LINES, _LOX_PARAMETERS)")
+        return "\n".join(source) + "\n"
+
+    def _block(self, statements, depth):
+        lines = []
+        for statement in statements:
+            lines += self._statement(statement, depth)
+        return lines
+
+    def _statement(self, statement, depth):
+        return [
+            (depth + relative, text, line)
+            for relative, text, line in statement.accept(self)
+        ]
+
+    def _expression(self, expr):
+        return expr.accept(self)
+
+    def _temporary(self):
+        self.temporaries += 1
+        return f"_lox_t{self.temporaries}"
+
+    def _truthy(self, expr):
+        source = self._expression(expr)
+        if _is_boolean(expr):
+            return source
+        return f"_lox_is_truthy({source})"
+
+    def _declared_name(self, stmt, name):
+        binding = self.analyzer.declarations[id(stmt)]
+        if binding is None:
+            self.function.globals.add("g_" + name)
+            return "g_" + name
+        binding.owner = self.function
+        return binding.python_name
+
+    def visit_literal_expr(self, expr: "Expr"):
+        return repr(expr.value)
+
+    def visit_grouping_expr(self, expr: "Expr"):
+        return f"({self._expression(expr.expression)})"
+
+    def visit_variable_expr(self, expr: "Expr"):
+        self.line = expr.name.line
+        binding = self.analyzer.references[id(expr)]
+        if binding is None:
+            return "g_" + expr.name.lexeme
+        return binding.python_name
+
+    def visit_assign_expr(self, expr: "Expr"):
+        value = self._expression(expr.to_assign)
+        self.line = expr.assign_to.line
+        name = expr.assign_to.lexeme
+        binding = self.analyzer.references[id(expr)]
+        if binding is None:
+            if name not in self.known_globals:
+                return f"({value}, _lox_undefined_assignment({name!r}))[1]"
+            self.function.globals.add("g_" + name)
+            return f"(g_{name} := {value})"
+        if binding.owner is not self.function:
+            self.function.nonlocals.add(binding.python_name)
+        return f"({binding.python_name} := {value})"
+
+    def visit_logical_expr(self, expr: "Expr"):
+        left = self._expression(expr.left)
+        right = self._expression(expr.right)
+        if _is_boolean(expr.left):
+            keyword = "or" if expr.operator == TokenType.OR else "and"
+            return f"({left} {keyword} {right})"
+        temporary = self._temporary()
+        if expr.operator == TokenType.OR:
+            return (
+                f"({temporary} if _lox_is_truthy({temporary} := {left}) else {right})"
+            )
+        return f"({right} if _lox_is_truthy({temporary} := {left}) else {temporary})"
+
+    def visit_unary_expr(self, expr: "Expr"):
+        self.line = expr.operator.line
+        if expr.operator.type_ == TokenType.BANG:
+            return f"(not {self._truthy(expr.right)})"
+        return f"_lox_negate({self._expression(expr.right)})"
+
+    def visit_binary_expr(self, expr: "Expr"):
+        operations = _left_chain(expr)
+        if len(operations) > CHAIN_LIMIT:
+            return self._chain(operations)
+        left = self._expression(expr.left)
+        right = self._expression(expr.right)
+        self.line = expr.operator.line
+        return self._operation(expr.operator, left, right)
+
+    def _operation(self, operator, left, right):
+        if operator.type_ in ARITHMETIC:
+            return f"_lox_{ARITHMETIC[operator.type_]}({left}, {right})"
+        return f"({left} {COMPARISONS[operator.type_]} {right})"
+
+    def _chain(self, operations):
+        """
+        A long chain such as `a + b + c + ...`, each operation nesting the
+        previous one, as a tuple that steps a temporary through the chain.
+        Nested calls would soon exceed the nesting CPython can parse
+        """
+        temporary = self._temporary()
+        steps = [f"{temporary} := {self._expression(operations[0].left)}"]
+        for operation in operations:
+            right = self._expression(operation.right)
+            self.line = operation.operator.line
+            value = self._operation(operation.operator, temporary, right)
+            steps.append(f"{temporary} := {value}")
+        return f"({', '.join(steps)})[-1]"
+
+    def visit_call_expr(self, expr: "Expr"):
+        callee = self._expression(expr.callee)
+        arguments = ", ".join(self._expression(argument) for argument in expr.arguments)
+        self.line = expr.paren.line
+        return f"{callee}({arguments})"
+
+    def visit_subscript_expr(self, expr: "Expr"):
+        collection = self._expression(expr.object)
+        index = self._expression(expr.index)
+        self.line = expr.bracket.line
+        return f"_lox_get_item({collection}, {index})"
+
+    def visit_setsubscript_expr(self, expr: "Expr"):
+        collection = self._expression(expr.object)
+        index = self._expression(expr.index)
+        value = self._expression(expr.value)
+        self.line = expr.bracket.line
+        return f"_lox_set_item({collection}, {index}, {value})"
+
+    def visit_slice_expr(self, expr: "Expr"):
+        collection = self._expression(expr.object)
+        start = "None" if expr.start is None else self._expression(expr.start)
+        stop = "None" if expr.stop is None else self._expression(expr.stop)
+        self.line = expr.bracket.line
+        return f"_lox_get_slice({collection}, {start}, {stop})"
+
+    def visit_map_expr(self, expr: "Expr"):
+        items = []
+        for key, value in zip(expr.keys, expr.values):
+            items.append(self._expression(key))
+            items.append(self._expression(value))
+        self.line = expr.brace.line
+        return f"_lox_build_map([{', '.join(items)}])"
+
+    def visit_get_expr(self, expr: "Expr"):
+        instance = self._expression(expr.object)
+        self.line = expr.name.line
+        return f"_lox_get_property({instance}, {expr.name.lexeme!r})"
+
+    def visit_set_expr(self, expr: "Expr"):
+        instance = self._expression(expr.object)
+        value = self._expression(expr.value)
+        self.line = expr.name.line
+        return f"_lox_set_property({instance}, {expr.name.lexeme!r}, {value})"
+
+    def visit_this_expr(self, expr: "Expr"):
+        self.line = expr.keyword.line
+        return self.analyzer.references[id(expr)].python_name
+
+    def visit_super_expr(self, expr: "Expr"):
+        self.line = expr.keyword.line
+        superclass = self.analyzer.references[id(expr)].python_name
+        this = self.analyzer.references[id(expr.method)].python_name
+        return f"_lox_get_super({superclass}, {this}, {expr.method.lexeme!r})"
+
+    def visit_print_stmt(self, stmt: "Stmt"):
+        value = self._expression(stmt.expression)
+        return [(0, f"print({value})", self.line)]
+
+    def visit_expression_stmt(self, stmt: "Stmt"):
+        value = self._expression(stmt.expression)
+        return [(0, value, self.line)]
+
+    def visit_var_stmt(self, stmt: "Stmt"):
+        value = "None"
+        if stmt.initialiser is not None:
+            value = self._expression(stmt.initialiser)
+        name = self._declared_name(stmt, stmt.name)
+        return [(0, f"{name} = {value}", self.line)]
+
+    def visit_block_stmt(self, stmt: "Stmt"):
+        return self._block(stmt.statements, depth=0)
+
+    def visit_if_stmt(self, stmt: "Stmt"):
+        lines = [(0, f"if {self._truthy(stmt.condition)}:", self.line)]
+        lines += self._statement(stmt.then_branch, 1) or [(1, "pass", self.line)]
+        if stmt.else_branch:
+            lines.append((0, "else:", self.line))
+            lines += self._statement(stmt.else_branch, 1) or [(1, "pass", self.line)]
+        return lines
+
+    def visit_while_stmt(self, stmt: "Stmt"):
+        condition = self._truthy(stmt.condition)
+        line = self.line
+        if id(stmt) not in self.analyzer.scoped_loops:
+            lines = [(0, f"while {condition}:", line)]
+            return lines + (self._statement(stmt.statement, 1) or [(1, "pass", line)])
+
+        # Run the body in a function of its own, so that every iteration
+        # gets fresh variables for the closures it creates
+        lines, iteration = self._loop_body(stmt.statement, line)
+        return lines + [(0, f"while {condition}:", line)] + iteration
+
+    def visit_countedloop_stmt(self, stmt: "Stmt"):
+        # A python `while` over a local is as fast as python counts, the
+        # increment only goes back to the end of the loop
+        lines = self.visit_while_stmt(stmt)
+        return lines + [(1, self._expression(stmt.increment), self.line)]
+
+    def visit_forin_stmt(self, stmt: "Stmt"):
+        values = f"_lox_iterate({self._expression(stmt.iterable)})"
+        self.line = stmt.keyword.line
+        line = self.line
+        if id(stmt) not in self.analyzer.scoped_loops:
+            name = self._declared_name(stmt, stmt.name.lexeme)
+            lines = [(0, f"for {name} in {values}:", line)]
+            return lines + (self._statement(stmt.body, 1) or [(1, "pass", line)])
+
+        # The loop variable is a parameter of the body function
+        value = self._temporary()
+        lines, iteration = self._loop_body(
+            stmt.body, line, self.analyzer.declarations[id(stmt)], value
+        )
+        return lines + [(0, f"for {value} in {values}:", line)] + iteration
+
+    def _loop_body(self, statement, line, parameter=None, argument=""):
+        """Emit `statement` as a python function called once per iteration
+
+        Returns:
+            tuple: The lines defining the function and the lines, one level
+                deeper, of an iteration
+        """
+        self.loop_bodies += 1
+        name = f"_lox_body{self.loop_bodies}"
+        enclosing = self.function
+        self.function = _PythonFunction(is_loop_body=True)
+        signature = ""
+        if parameter is not None:
+            parameter.owner = self.function
+            signature = parameter.python_name
+        body = self._statement(statement, 1)
+        declarations = self.function.declarations(1, line)
+        call = f"{name}({argument})"
+        if self.function.yields:
+            # The body of a generator runs its iterations as sub-generators
+            call = f"(yield from {call})"
+            enclosing.yields = True
+        self.function = enclosing
+
+        completion = f"_lox_r{self.loop_bodies}"
+        returned = completion if enclosing.is_loop_body else f"{completion}[0]"
+        lines = [(0, f"def {name}({signature}):", line)]
+        lines += declarations + body + [(1, "return None", line)]
+        iteration = [
+            (1, f"{completion} = {call}", line),
+            (1, f"if {completion} is not None:", line),
+            (2, f"return {returned}", line),
+        ]
+        return lines, iteration
+
+    def visit_class_stmt(self, stmt: "Stmt"):
+        self.line = stmt.name.line
+        line = self.line
+        lines = []
+        superclass = "None"
+        if stmt.superclass is not None:
+            value = self._expression(stmt.superclass)
+            superclass = self._declared_name(stmt.superclass, "super")
+            lines.append((0, f"{superclass} = {value}", line))
+        # Every method is made by a function whose parameter is `this`,
+        # binding a method to an instance calls it
+        methods = []
+        for method in stmt.methods:
+            self.temporaries += 1
+            maker = f"_lox_method{self.temporaries}"
+            this = self.analyzer.declarations[id(method.name)]
+            this.owner = self.function
+            self.line = method.name.name.line
+            lines.append((0, f"def {maker}({this.python_name}):", line))
+            lines += [
+                (depth + 1, text, source_line)
+                for depth, text, source_line in self._function(method, "method")
+            ]
+            lines.append((1, "return method", line))
+            methods.append(f"{method.name.name.lexeme!r}: _lox_Method({maker})")
+        name = self._declared_name(stmt, stmt.name.lexeme)
+        lines.append(
+            (
+                0,
+                f"{name} = _lox_make_class({stmt.name.lexeme!r}, {superclass}, "
+                + "{"
+                + ", ".join(methods)
+                + "})",
+                line,
+            )
+        )
+        return lines
+
+    def visit_function_stmt(self, stmt: "Stmt"):
+        self.line = stmt.name.name.line
+        name = self._declared_name(stmt, stmt.name.name.lexeme)
+        return self._function(stmt, name)
+
+    def _function(self, stmt, name):
+        """The lines defining the LOX function `stmt` as the python function `name`"""
+        line = self.line
+        enclosing = self.function
+        self.function = _PythonFunction()
+        parameters = self.analyzer.parameters[id(stmt)]
+        for position, parameter in enumerate(parameters):
+            parameter.owner = self.function
+            self.parameters[parameter.python_name] = (position, len(parameters))
+        body = self._block(stmt.body, depth=1)
+        declarations = self.function.declarations(1, line)
+        yields = self.function.yields
+        self.function = enclosing
+
+        signature = ", ".join(parameter.python_name for parameter in parameters)
+        lines = [(0, f"def {name}({signature}):", line)]
+        if stmt.generator:
+            lox_name = stmt.name.name.lexeme
+            lines.insert(0, (0, f"@_lox_generator({lox_name!r})", line))
+            if not yields:
+                # The optimizer removed every `yield`, it is still a generator
+                body.append((1, "yield from ()", line))
+        return lines + declarations + (body or [(1, "pass", line)])
+
+    def visit_return_stmt(self, stmt: "Stmt"):
+        self.line = stmt.keyword.line
+        value = "None"
+        if stmt.value is not None:
+            value = self._expression(stmt.value)
+        if self.function.is_loop_body:
+            return [(0, f"return ({value},)", self.line)]
+        return [(0, f"return {value}", self.line)]
+
+    def visit_yield_stmt(self, stmt: "Stmt"):
+        self.line = stmt.keyword.line
+        value = "None"
+        if stmt.value is not None:
+            value = self._expression(stmt.value)
+        self.function.yields = True
+        return [(0, f"yield {value}", self.line)]
+
+
+def _left_chain(expr):
+    """
+    The binary operations down the left operands of `expr`, innermost
+    first, looking through parentheses
+    """
+    operations = []
+    while isinstance(expr, Binary):
+        operations.append(expr)
+        expr = expr.left
+        while isinstance(expr, Grouping):
+            expr = expr.expression
+    operations.reverse()
+    return operations
+
+
+def compile_module(source, filename):
+    """Compile the python `source` of a transpiled LOX program
+
+    Raises:
+        CompilerError: When CPython cannot compile the source, such as
+            when LOX expressions nest deeper than python's parser allows
+    """
+    try:
+        # Such as for calls of literals, which fail at run time like in LOX
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", SyntaxWarning)
+            return compile(source, filename, "exec")
+    except (SyntaxError, RecursionError, MemoryError) as error:
+        message = getattr(error, "msg", None) or type(error).__name__
+        raise CompilerError(f"Cannot transpile the program to python: {message}")
+
+
+def _is_boolean(expr):
+    """
+    Return True when `expr` always evaluates to a python bool, whose
+    python truthiness then matches LOX truthiness
+    """
+    if isinstance(expr, Binary):
+        return expr.operator.type_ in COMPARISONS
+    if isinstance(expr, Unary):
+        return expr.operator.type_ == TokenType.BANG
+    if isinstance(expr, Grouping):
+        return _is_boolean(expr.expression)
+    if isinstance(expr, Logical):
+        return _is_boolean(expr.left) and _is_boolean(expr.right)
+    return False
+
+
+class TranspiledInterpreter:
+    """
+    Execution engine that transpiles every program and runs it with exec
+    """
+
+    def __init__(self):
+        self.namespace = {"__name__": "__lox__"}
+        self.runs = 0
+        self.had_runtime_error = False
+        define_natives(self.namespace)
+
+    def define_native(self, name, function, arity):
+        """See ExpressionInterpreter.define_native"""
+        self.namespace["g_" + name] = NativeFunction(name, function, arity)
+
+    def interpret(self, statements: List["Stmt"]):
+        self.runs += 1
+        filename = f"<lox-{self.runs}>"
+        known_globals = [name[2:] for name in self.namespace if name.startswith("g_")]
+        source = Transpiler(
+            source_name=filename, known_globals=known_globals
+        ).transpile(statements)
+        exec(compile_module(source, filename), self.namespace)
+        if not run(
+            self.namespace["_lox_main"],
+            self.namespace["_LOX_LINES"],
+            self.namespace["_LOX_PARAMETERS"],
+        ):
+            self.had_runtime_error = True
@@ -0,0 +1,36 @@
+"""
+Helpers shared by the syntax tree classes generated by pylox._tool
+"""
+
+
+def ast_equal(left, right) -> bool:
+    """Compare two syntax trees field by field
+
+    Nodes themselves compare by identity, this walks both trees and
+    compares the fields listed in each class' `_fields`. Resolver
+    annotations such as `depth` and `slot` are not part of `_fields`
+    """
+    if isinstance(left, list) or isinstance(right, list):
+        return (
+            isinstance(left, list)
+            and isinstance(right, list)
+            and len(left) == len(right)
+            and all(ast_equal(a, b) for a, b in zip(left, right))
+        )
+    fields = getattr(type(left), "_fields", None)
+    if fields is None:
+        return left == right
+    if type(left) is not type(right):
+        return False
+    return all(ast_equal(getattr(left, f), getattr(right, f)) for f in fields)
+
+
+def walk(node):
+    """Yield `node` and every node under it, expressions and statements,
+    through the fields listed in each class' `_fields`"""
+    yield node
+    for field in getattr(type(node), "_fields", ()):
+        value = getattr(node, field)
+        for child in value if isinstance(value, list) else (value,):
+            if hasattr(type(child), "_fields"):
+                yield from walk(child)
@@ -0,0 +1,23 @@
+"""
+The truthiness, equality and number tests of LOX values
+
+Every engine evaluates with these, and the optimizer folds constants with
+them, so they are part of the front end whose changes invalidate cached
+programs, see pylox.cache
+"""
+
+
+def _is_number(value):
+    return isinstance(value, (int, float))
+
+
+def _isTruthy(object_):
+    if object_ in ("false", "nil", None):
+        return False
+    if isinstance(object_, bool):
+        return bool(object_)
+    return True
+
+
+def _isEqual(left, right):
+    return left == right
@@ -71,3 +71,51 @@ class Visitor(ABC):
     @abstractmethod
     def visit_return_stmt(self, stmt: "Stmt"):
         raise NotImplementedError("Subclasses should implement this method")
+
+    @abstractmethod
+    def visit_subscript_expr(self, expr: "Expr"):
+        raise NotImplementedError("Subclasses should implement this method")
+
+    @abstractmethod
+    def visit_setsubscript_expr(self, expr: "Expr"):
+        raise NotImplementedError("Subclasses should implement this method")
+
+    @abstractmethod
+    def visit_slice_expr(self, expr: "Expr"):
+        raise NotImplementedError("Subclasses should implement this method")
+
+    @abstractmethod
+    def visit_map_expr(self, expr: "Expr"):
+        raise NotImplementedError("Subclasses should implement this method")
+
+    @abstractmethod
+    def visit_get_expr(self, expr: "Expr"):
+        raise NotImplementedError("Subclasses should implement this method")
+
+    @abstractmethod
+    def visit_set_expr(self, expr: "Expr"):
+        raise NotImplementedError("Subclasses should implement this method")
+
+    @abstractmethod
+    def visit_this_expr(self, expr: "Expr"):
+        raise NotImplementedError("Subclasses should implement this method")
+
+    @abstractmethod
+    def visit_super_expr(self, expr: "Expr"):
+        raise NotImplementedError("Subclasses should implement this method")
+
+    @abstractmethod
+    def visit_yield_stmt(self, stmt: "Stmt"):
+        raise NotImplementedError("Subclasses should implement this method")
+
+    @abstractmethod
+    def visit_forin_stmt(self, stmt: "Stmt"):
+        raise NotImplementedError("Subclasses should implement this method")
+
+    @abstractmethod
+    def visit_countedloop_stmt(self, stmt: "Stmt"):
+        raise NotImplementedError("Subclasses should implement this method")
+
+    @abstractmethod
+    def visit_class_stmt(self, stmt: "Stmt"):
+        raise NotImplementedError("Subclasses should implement this method")
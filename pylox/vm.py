@@ -0,0 +1,433 @@
+from pylox import tracing
+from pylox.arrays import get_item, get_slice, set_item
+from pylox.callable import NativeFunction
+from pylox.classes import LoxClass, LoxInstance, get_property, get_super, set_property
+from pylox.compiler import CompiledFunction, OpCode
+from pylox.expr_eval import LoxRuntimeError, _runtime_error
+from pylox.iterators import iterate
+from pylox.maps import build_map
+from pylox.natives import install as install_natives
+from pylox.rope import Rope, concat
+from pylox.values import _is_number, _isTruthy
+
+FRAMES_MAX = 10000
+
+CONSTANT = OpCode.CONSTANT
+NIL = OpCode.NIL
+POP = OpCode.POP
+GET_LOCAL = OpCode.GET_LOCAL
+SET_LOCAL = OpCode.SET_LOCAL
+GET_GLOBAL = OpCode.GET_GLOBAL
+DEFINE_GLOBAL = OpCode.DEFINE_GLOBAL
+SET_GLOBAL = OpCode.SET_GLOBAL
+GET_UPVALUE = OpCode.GET_UPVALUE
+SET_UPVALUE = OpCode.SET_UPVALUE
+CLOSE_UPVALUE = OpCode.CLOSE_UPVALUE
+EQUAL = OpCode.EQUAL
+NOT_EQUAL = OpCode.NOT_EQUAL
+GREATER = OpCode.GREATER
+GREATER_EQUAL = OpCode.GREATER_EQUAL
+LESS = OpCode.LESS
+LESS_EQUAL = OpCode.LESS_EQUAL
+ADD = OpCode.ADD
+SUBTRACT = OpCode.SUBTRACT
+MULTIPLY = OpCode.MULTIPLY
+DIVIDE = OpCode.DIVIDE
+NOT = OpCode.NOT
+NEGATE = OpCode.NEGATE
+PRINT = OpCode.PRINT
+JUMP = OpCode.JUMP
+POP_JUMP_IF_FALSE = OpCode.POP_JUMP_IF_FALSE
+JUMP_IF_FALSE_OR_POP = OpCode.JUMP_IF_FALSE_OR_POP
+JUMP_IF_TRUE_OR_POP = OpCode.JUMP_IF_TRUE_OR_POP
+CALL = OpCode.CALL
+CLOSURE = OpCode.CLOSURE
+RETURN = OpCode.RETURN
+GET_SUBSCRIPT = OpCode.GET_SUBSCRIPT
+SET_SUBSCRIPT = OpCode.SET_SUBSCRIPT
+SLICE = OpCode.SLICE
+BUILD_MAP = OpCode.BUILD_MAP
+GET_ITER = OpCode.GET_ITER
+FOR_ITER = OpCode.FOR_ITER
+CLASS = OpCode.CLASS
+INHERIT = OpCode.INHERIT
+METHOD = OpCode.METHOD
+GET_PROPERTY = OpCode.GET_PROPERTY
+SET_PROPERTY = OpCode.SET_PROPERTY
+GET_SUPER = OpCode.GET_SUPER
+
+# Returned by next() when FOR_ITER exhausts an iterator
+_DONE = object()
+
+SYMBOLS = {
+    SUBTRACT: "-",
+    MULTIPLY: "*",
+    DIVIDE: "/",
+}
+
+
+class Upvalue:
+    """
+    A variable captured by a closure
+
+    While the variable is still alive on the VM stack `cells` is the stack
+    itself and `index` its slot. Closing the upvalue moves the value into
+    a private one element list, so reads never have to check which case
+    they are in
+    """
+
+    __slots__ = ("cells", "index")
+
+    def __init__(self, cells, index):
+        self.cells = cells
+        self.index = index
+
+
+class Closure:
+    __slots__ = ("function", "upvalues")
+
+    def __init__(self, function: CompiledFunction, upvalues):
+        self.function = function
+        self.upvalues = upvalues
+
+    def bind(self, instance):
+        return BoundMethod(instance, self)
+
+    def __repr__(self):
+        return repr(self.function)
+
+
+class BoundMethod:
+    """
+    A method read from an instance, called with `receiver` in slot zero
+    """
+
+    __slots__ = ("receiver", "method")
+
+    def __init__(self, receiver, method: Closure):
+        self.receiver = receiver
+        self.method = method
+
+    def __repr__(self):
+        return repr(self.method)
+
+
+def _operands_error(symbol, left, right):
+    return LoxRuntimeError(
+        msg=f"Operands for {symbol} should be int or float not {type(left)}"
+    )
+
+
+class VM:
+    """
+    Stack based virtual machine executing code from pylox.compiler.Compiler
+
+    Lox calls do not recurse in Python, every call pushes a frame on
+    `frames` and the dispatch loop carries on with the callee's code
+
+    Instances are laid out by the shapes of pylox.classes, properties are
+    looked up in the slots of the shape on every access
+    """
+
+    def __init__(self):
+        self.globals = {}
+        self.stack = []
+        self.frames = []
+        self.open_upvalues = {}
+        self.had_runtime_error = False
+        install_natives(self.define_native)
+
+    def define_native(self, name, function, arity):
+        """See ExpressionInterpreter.define_native"""
+        self.globals[name] = NativeFunction(name, function, arity)
+
+    def interpret(self, function: CompiledFunction):
+        script = Closure(function, [])
+        self.stack = [script]
+        self.frames = []
+        return self._run(script)
+
+    def _capture_upvalue(self, index):
+        upvalue = self.open_upvalues.get(index)
+        if upvalue is None:
+            upvalue = Upvalue(self.stack, index)
+            self.open_upvalues[index] = upvalue
+        return upvalue
+
+    def _close_upvalues(self, last):
+        stack = self.stack
+        for index in [index for index in self.open_upvalues if index >= last]:
+            upvalue = self.open_upvalues.pop(index)
+            upvalue.cells = [stack[index]]
+            upvalue.index = 0
+
+    def _run(self, closure: Closure):
+        stack = self.stack
+        frames = self.frames
+        globals_ = self.globals
+        push = stack.append
+        pop = stack.pop
+        trace_calls = tracing.CALLS
+
+        function = closure.function
+        code = function.chunk.code
+        constants = function.chunk.constants
+        base = 0
+        ip = 0
+
+        try:
+            while True:
+                op = code[ip]
+                ip += 1
+
+                if op == GET_LOCAL:
+                    push(stack[base + code[ip]])
+                    ip += 1
+                elif op == CONSTANT:
+                    push(constants[code[ip]])
+                    ip += 1
+                elif op == GET_GLOBAL:
+                    name = constants[code[ip]]
+                    ip += 1
+                    try:
+                        push(globals_[name])
+                    except KeyError:
+                        raise LoxRuntimeError(msg=f"Token {name} is not defined")
+                elif op == POP_JUMP_IF_FALSE:
+                    if _isTruthy(pop()):
+                        ip += 1
+                    else:
+                        ip = code[ip]
+                elif op == JUMP:
+                    ip = code[ip]
+                elif op == POP:
+                    pop()
+                elif op == ADD:
+                    right = pop()
+                    left = stack[-1]
+                    if isinstance(left, str):
+                        stack[-1] = concat(left, right)
+                    elif _is_number(left) and _is_number(right):
+                        stack[-1] = left + right
+                    elif type(left) is Rope:
+                        stack[-1] = concat(left, right)
+                    else:
+                        raise _operands_error("+", left, right)
+                elif op == SUBTRACT or op == MULTIPLY or op == DIVIDE:
+                    right = pop()
+                    left = stack[-1]
+                    if not (_is_number(left) and _is_number(right)):
+                        raise _operands_error(SYMBOLS[op], left, right)
+                    if op == SUBTRACT:
+                        stack[-1] = float(left) - float(right)
+                    elif op == MULTIPLY:
+                        stack[-1] = float(left) * float(right)
+                    elif right == 0:
+                        raise LoxRuntimeError(msg="ZeroDivisionError")
+                    else:
+                        stack[-1] = float(left) / float(right)
+                elif op == LESS_EQUAL:
+                    right = pop()
+                    stack[-1] = stack[-1] <= right
+                elif op == LESS:
+                    right = pop()
+                    stack[-1] = stack[-1] < right
+                elif op == GREATER:
+                    right = pop()
+                    stack[-1] = stack[-1] > right
+                elif op == GREATER_EQUAL:
+                    right = pop()
+                    stack[-1] = stack[-1] >= right
+                elif op == EQUAL:
+                    right = pop()
+                    stack[-1] = stack[-1] == right
+                elif op == NOT_EQUAL:
+                    right = pop()
+                    stack[-1] = stack[-1] != right
+                elif op == SET_LOCAL:
+                    stack[base + code[ip]] = stack[-1]
+                    ip += 1
+                elif op == GET_UPVALUE:
+                    upvalue = closure.upvalues[code[ip]]
+                    push(upvalue.cells[upvalue.index])
+                    ip += 1
+                elif op == SET_UPVALUE:
+                    upvalue = closure.upvalues[code[ip]]
+                    upvalue.cells[upvalue.index] = stack[-1]
+                    ip += 1
+                elif op == CALL:
+                    argc = code[ip]
+                    ip += 1
+                    callee = stack[-1 - argc]
+                    if type(callee) is not Closure:
+                        if type(callee) is BoundMethod:
+                            stack[-1 - argc] = callee.receiver
+                            callee = callee.method
+                        elif type(callee) is LoxClass:
+                            # The instance takes the place of the class, as
+                            # `this` of the initializer, which returns it
+                            stack[-1 - argc] = LoxInstance(callee.shape)
+                            if callee.initializer is None:
+                                if argc:
+                                    raise LoxRuntimeError(
+                                        msg=f"Expected 0 arguments but got {argc}"
+                                    )
+                                continue
+                            callee = callee.initializer
+                        elif type(callee) is NativeFunction:
+                            result = callee.call(self, stack[len(stack) - argc :])
+                            del stack[-1 - argc :]
+                            push(result)
+                            continue
+                        else:
+                            raise LoxRuntimeError(msg="you can only call functions")
+                    if argc != callee.function.arity:
+                        raise LoxRuntimeError(
+                            msg=f"Expected {callee.function.arity} arguments but got {argc}"
+                        )
+                    if len(frames) >= FRAMES_MAX:
+                        raise LoxRuntimeError(msg="Stack overflow")
+                    if trace_calls:
+                        tracing.trace(
+                            "calls",
+                            "call %s args=%s",
+                            callee,
+                            stack[len(stack) - argc :],
+                        )
+                    frames.append((closure, ip, base))
+                    closure = callee
+                    function = closure.function
+                    code = function.chunk.code
+                    constants = function.chunk.constants
+                    base = len(stack) - argc - 1
+                    ip = 0
+                elif op == RETURN:
+                    result = pop()
+                    if self.open_upvalues:
+                        self._close_upvalues(base)
+                    del stack[base:]
+                    if not frames:
+                        return result
+                    closure, ip, base = frames.pop()
+                    function = closure.function
+                    code = function.chunk.code
+                    constants = function.chunk.constants
+                    push(result)
+                elif op == NIL:
+                    push(None)
+                elif op == JUMP_IF_FALSE_OR_POP:
+                    if _isTruthy(stack[-1]):
+                        pop()
+                        ip += 1
+                    else:
+                        ip = code[ip]
+                elif op == JUMP_IF_TRUE_OR_POP:
+                    if _isTruthy(stack[-1]):
+                        ip = code[ip]
+                    else:
+                        pop()
+                        ip += 1
+                elif op == NOT:
+                    stack[-1] = not _isTruthy(stack[-1])
+                elif op == NEGATE:
+                    if not _is_number(stack[-1]):
+                        raise LoxRuntimeError(
+                            msg="Operand for - should be int or float"
+                        )
+                    stack[-1] = -(float(stack[-1]))
+                elif op == PRINT:
+                    print(pop())
+                elif op == DEFINE_GLOBAL:
+                    globals_[constants[code[ip]]] = pop()
+                    ip += 1
+                elif op == SET_GLOBAL:
+                    name = constants[code[ip]]
+                    ip += 1
+                    if name not in globals_:
+                        raise LoxRuntimeError(
+                            msg=f"Variable '{name}' is accessed but it was never defined"
+                        )
+                    globals_[name] = stack[-1]
+                elif op == CLOSURE:
+                    compiled = constants[code[ip]]
+                    ip += 1
+                    upvalues = []
+                    for _ in range(compiled.upvalue_count):
+                        if code[ip]:
+                            upvalues.append(self._capture_upvalue(base + code[ip + 1]))
+                        else:
+                            upvalues.append(closure.upvalues[code[ip + 1]])
+                        ip += 2
+                    push(Closure(compiled, upvalues))
+                elif op == CLOSE_UPVALUE:
+                    self._close_upvalues(len(stack) - 1)
+                    pop()
+                elif op == GET_SUBSCRIPT:
+                    index = pop()
+                    stack[-1] = get_item(stack[-1], index)
+                elif op == SET_SUBSCRIPT:
+                    value = pop()
+                    index = pop()
+                    stack[-1] = set_item(stack[-1], index, value)
+                elif op == SLICE:
+                    stop = pop()
+                    start = pop()
+                    stack[-1] = get_slice(stack[-1], start, stop)
+                elif op == BUILD_MAP:
+                    start = len(stack) - 2 * code[ip]
+                    ip += 1
+                    table = build_map(stack[start:])
+                    del stack[start:]
+                    push(table)
+                elif op == GET_ITER:
+                    stack[-1] = iterate(stack[-1])
+                elif op == FOR_ITER:
+                    # Push the next value of the iterator on the top of the
+                    # stack, or jump out of the loop when there is none
+                    value = next(stack[-1], _DONE)
+                    if value is _DONE:
+                        ip = code[ip]
+                    else:
+                        push(value)
+                        ip += 1
+                elif op == GET_PROPERTY:
+                    stack[-1] = get_property(stack[-1], constants[code[ip]])
+                    ip += 1
+                elif op == SET_PROPERTY:
+                    value = pop()
+                    stack[-1] = set_property(stack[-1], constants[code[ip]], value)
+                    ip += 1
+                elif op == GET_SUPER:
+                    superclass = pop()
+                    stack[-1] = get_super(superclass, stack[-1], constants[code[ip]])
+                    ip += 1
+                elif op == CLASS:
+                    push(LoxClass(constants[code[ip]], None, {}))
+                    ip += 1
+                elif op == INHERIT:
+                    # The class is built one method at a time, before it
+                    # has any instance
+                    klass = pop()
+                    superclass = stack[-1]
+                    if type(superclass) is not LoxClass:
+                        raise LoxRuntimeError(msg="Superclass must be a class")
+                    klass.superclass = superclass
+                    klass.initializer = superclass.initializer
+                elif op == METHOD:
+                    name = constants[code[ip]]
+                    ip += 1
+                    method = pop()
+                    klass = stack[-1]
+                    klass.methods[name] = method
+                    if name == "init":
+                        klass.initializer = method
+                else:
+                    raise LoxRuntimeError(msg=f"Unknown instruction {op}")
+        except LoxRuntimeError as error:
+            self.had_runtime_error = True
+            _runtime_error(error.msg, function.chunk.lines[ip - 1])
+            self._close_upvalues(0)
+            self.stack = []
+            self.frames = []
+            self.open_upvalues = {}
+            return None
@@ -0,0 +1,15 @@
+from .context import pylox
+from pylox.parser import Parser
+from pylox.scanner import RegexScanner
+
+
+def run(source, engine="ast", optimize=True):
+    """Run LOX `source` on `engine` and return the LoxIntepreter"""
+    interpreter = pylox.LoxIntepreter(engine=engine, optimize=optimize)
+    interpreter.run(source=source)
+    return interpreter
+
+
+def parse(source):
+    """Parse LOX `source` into its statements, without resolving them"""
+    return Parser(tokens=RegexScanner(source).scan_buffer()).parse()
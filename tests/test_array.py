@@ -0,0 +1,126 @@
+import pytest
+
+from .helpers import run
+from .context import pylox
+from pylox.arrays import LoxArray, get_item, get_slice, set_item
+from pylox.callable import LoxRuntimeError
+
+ENGINES = pylox.pylox.ENGINES
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_subscripts(engine, capsys):
+    source = """
+    var a = array(4);
+    var i = 0;
+    while (i < len(a)) { a[i] = i * i; i = i + 1; }
+    print a;
+    print a[1] + a[-1];
+    print a[i - 1] = 7;
+    print a[3];
+    """
+    run(source, engine)
+    assert capsys.readouterr().out.splitlines() == [
+        "[0.0, 1.0, 4.0, 9.0]",
+        "10.0",
+        "7",
+        "7.0",
+    ]
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_slices_are_views(engine, capsys):
+    source = """
+    var a = array(5);
+    var view = a[1:4];
+    view[0] = 1;
+    a[3] = 3;
+    print view;
+    print len(a[:2]) + len(a[3:]) + len(a[:]) + len(a[4:1]);
+    var separate = copy(view);
+    separate[0] = 2;
+    print a[1];
+    """
+    run(source, engine)
+    assert capsys.readouterr().out == "[1.0, 0.0, 3.0]\n9\n1.0\n"
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_vectorized_operations(engine, capsys):
+    source = """
+    var a = array(3);
+    a[0] = 1; a[1] = 4; a[2] = 9;
+    print add(a, 1);
+    print add(a, a);
+    print mul(a, 2);
+    print sum(a);
+    print dot(a, a[:]);
+    print map(sqrt, a);
+    """
+    run(source, engine)
+    assert capsys.readouterr().out.splitlines() == [
+        "[2.0, 5.0, 10.0]",
+        "[2.0, 8.0, 18.0]",
+        "[2.0, 8.0, 18.0]",
+        "14.0",
+        "98.0",
+        "[1.0, 2.0, 3.0]",
+    ]
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+@pytest.mark.parametrize(
+    "source, message",
+    [
+        ("var a = array(2); print a[2];", "Array index 2 is out of range for length 2"),
+        (
+            "var a = array(2); print a[0.5];",
+            "Array indices should be whole numbers, not 0.5",
+        ),
+        ("print nil[0];", "Only arrays, maps and vectors can be subscripted, not None"),
+        ('var a = array(1); a[0] = "x";', "Arrays can only hold numbers, not 'x'"),
+        (
+            "print add(array(2), array(3));",
+            "add expects arrays of the same length, not 2 and 3",
+        ),
+        (
+            "fun f(x) { return x; } print map(f, array(1));",
+            "map expects a native function of 1 argument",
+        ),
+        ("print array(-1);", "array expects a length of 0 or more, not -1"),
+    ],
+)
+def test_errors(engine, source, message, capsys):
+    interpreter = run(source, engine)
+    engine_ = interpreter.vm if engine == "vm" else interpreter.interpreter
+    assert engine_.had_runtime_error
+    assert capsys.readouterr().out.startswith(message + " @ [line 1]")
+
+
+def test_functions_returning_arrays_are_not_memoized(capsys):
+    source = """
+    fun make(n) { var a = array(1); a[0] = n; return a; }
+    var first = make(1);
+    var second = make(1);
+    second[0] = 2;
+    print first[0];
+    """
+    run(source)
+    assert capsys.readouterr().out == "1.0\n"
+
+
+def test_slice_shares_the_buffer():
+    values = LoxArray.of([1, 2, 3, 4])
+    view = get_slice(values, 1, None)
+    assert set_item(view, -1, 5) == 5
+    assert list(values) == [1.0, 2.0, 3.0, 5.0]
+    assert view.data.obj is values.data.obj
+    assert get_item(values, 3.0) == 5.0
+    assert str(view) == "[2.0, 3.0, 5.0]"
+    assert repr(view) == "<array len=3>"
+
+
+def test_zeros():
+    assert list(LoxArray.zeros(3)) == [0.0, 0.0, 0.0]
+    with pytest.raises(LoxRuntimeError):
+        get_item(LoxArray.zeros(0), 0)
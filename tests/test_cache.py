@@ -0,0 +1,93 @@
+import pathlib
+
+from .context import pylox
+
+from pylox import cache
+from pylox.tree import ast_equal
+
+SOURCE = pathlib.Path("examples/fib.lox").read_text()
+
+
+def write_script(tmp_path, source=SOURCE):
+    script = tmp_path / "script.lox"
+    script.write_text(source)
+    return script
+
+
+def test_cache_round_trips_resolved_statements(tmp_path):
+    script = write_script(tmp_path)
+    statements = pylox.LoxIntepreter()._front_end(source=SOURCE)
+    assert cache.store(script, SOURCE, statements)
+    loaded = cache.load(script, SOURCE)
+    assert ast_equal(loaded, statements)
+
+
+def test_cache_keeps_resolver_annotations(tmp_path):
+    source = "fun f(a) { return a; }"
+    script = write_script(tmp_path, source)
+    cache.store(script, source, pylox.LoxIntepreter()._front_end(source=source))
+    returned = cache.load(script, source)[0].body[0].value
+    assert (returned.depth, returned.slot) == (0, 0)
+
+
+def test_changed_source_misses(tmp_path):
+    script = write_script(tmp_path)
+    cache.store(script, SOURCE, pylox.LoxIntepreter()._front_end(source=SOURCE))
+    assert cache.load(script, SOURCE + "\nprint 1;") is None
+
+
+def test_corrupt_cache_misses(tmp_path):
+    script = write_script(tmp_path)
+    cache.store(script, SOURCE, pylox.LoxIntepreter()._front_end(source=SOURCE))
+    path = cache.cache_path(script)
+    path.write_bytes(path.read_bytes()[:-10])
+    assert cache.load(script, SOURCE) is None
+
+
+def test_missing_cache_misses(tmp_path):
+    assert cache.load(write_script(tmp_path), SOURCE) is None
+
+
+def test_run_file_writes_then_loads_cache(tmp_path, capsys, monkeypatch):
+    script = write_script(tmp_path)
+    pylox.LoxIntepreter().run_file(file=script, cache=True)
+    expected = capsys.readouterr().out
+    assert cache.cache_path(script).exists()
+    assert list(cache.cache_path(script).parent.iterdir()) == [cache.cache_path(script)]
+
+    def front_end(self, source):
+        raise AssertionError("the cached program should be used")
+
+    monkeypatch.setattr(pylox.LoxIntepreter, "_front_end", front_end)
+    pylox.LoxIntepreter().run_file(file=script, cache=True)
+    assert capsys.readouterr().out == expected
+
+
+def test_run_file_does_not_cache_compiler_errors(tmp_path, capsys):
+    script = write_script(tmp_path, "print (;")
+    interpreter = pylox.LoxIntepreter()
+    interpreter.run_file(file=script, cache=True)
+    assert interpreter.had_error
+    assert "Compiler error" in capsys.readouterr().out
+    assert not cache.cache_path(script).exists()
+
+
+def test_run_file_without_cache_writes_nothing(tmp_path):
+    script = write_script(tmp_path)
+    pylox.LoxIntepreter().run_file(file=script)
+    assert not cache.cache_path(script).parent.exists()
+
+
+def test_changed_front_end_changes_the_digest(tmp_path, monkeypatch):
+    package = pathlib.Path(pylox.__path__[0])
+    for name in cache._FRONT_END:
+        (tmp_path / f"{name}.py").write_bytes((package / f"{name}.py").read_bytes())
+    monkeypatch.setattr(cache, "_PACKAGE", tmp_path)
+    monkeypatch.setattr(cache, "_signature", None)
+    digest = cache.source_digest(SOURCE)
+
+    # The optimizer folds constants with the helpers of values
+    values = tmp_path / "values.py"
+    values.write_text(values.read_text() + "\n# changed\n")
+    monkeypatch.setattr(cache, "_signature", None)
+    assert cache.source_digest(SOURCE) != digest
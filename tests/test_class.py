@@ -0,0 +1,265 @@
+import pytest
+
+from .helpers import parse, run
+from .context import pylox
+from pylox.classes import LoxClass, LoxInstance, field_cache, property_cache
+from pylox.expr import Get, Set, This
+from pylox.stmt import Class, Return
+
+ENGINES = pylox.pylox.ENGINES
+
+SHAPES = """
+class Point {
+    init(x, y) {
+        this.x = x;
+        this.y = y;
+    }
+    norm2() { return this.x * this.x + this.y * this.y; }
+    moved(dx) { return Point(this.x + dx, this.y); }
+}
+"""
+
+
+def test_parses_classes():
+    (klass,) = parse(
+        "class B < A { init() { this.x = 1; return; } get() { return this.x; } }"
+    )
+    assert isinstance(klass, Class)
+    assert klass.name.lexeme == "B" and klass.superclass.name.lexeme == "A"
+    init, get = klass.methods
+    assert isinstance(init.body[0].expression, Set)
+    # `init` returns `this`, however it returns
+    assert [type(statement.value) for statement in init.body[1:]] == [This, This]
+    assert all(isinstance(statement, Return) for statement in init.body[1:])
+    assert isinstance(get.body[0].value, Get)
+
+
+@pytest.mark.parametrize("optimize", [True, False])
+@pytest.mark.parametrize("engine", ENGINES)
+def test_fields_and_methods(engine, optimize, capsys):
+    source = (
+        SHAPES
+        + """
+    var p = Point(3, 4);
+    print p;
+    print Point;
+    print p.norm2();
+    var norm2 = p.norm2;
+    p.x = 0;
+    print norm2();
+    print p.moved(1).x + p.y;
+    print p.init(1, 1) == p;
+    p.label = "p";
+    print p.label;
+    fun twice() { return 2; }
+    p.f = twice;
+    print p.f();
+    """
+    )
+    run(source, engine, optimize)
+    assert capsys.readouterr().out.splitlines() == [
+        "Point instance",
+        "Point",
+        "25.0",
+        "16.0",
+        "5",
+        "True",
+        "p",
+        "2",
+    ]
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_inheritance(engine, capsys):
+    source = (
+        SHAPES
+        + """
+    class Point3 < Point {
+        init(x, y, z) {
+            super.init(x, y);
+            this.z = z;
+        }
+        norm2() { return super.norm2() + this.z * this.z; }
+    }
+    class Named < Point3 {
+        name() {
+            fun name() { return "named " + this.norm2(); }
+            return name;
+        }
+    }
+    print Point3(1, 2, 2).norm2();
+    var n = Named(0, 0, 2);
+    print n.name()();
+    print n.moved(1);
+    """
+    )
+    run(source, engine)
+    assert capsys.readouterr().out.splitlines() == [
+        "9.0",
+        "named 4.0",
+        "Point instance",
+    ]
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_local_classes_and_closures(engine, capsys):
+    source = """
+    fun counter(start) {
+        class Counter {
+            init() { this.count = start; }
+            next() {
+                this.count = this.count + 1;
+                return this.count;
+            }
+        }
+        return Counter();
+    }
+    var a = counter(10);
+    var b = counter(0);
+    a.next();
+    print a.next();
+    print b.next();
+    {
+        var n = 2;
+        class Twice < Point {
+            moved(dx) { return super.moved(dx * n); }
+        }
+        print Twice(1, 0).moved(1).x;
+    }
+    """
+    run(SHAPES + source, engine)
+    assert capsys.readouterr().out.split() == ["12", "1", "3.0"]
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_many_instances(engine, capsys):
+    source = (
+        SHAPES
+        + """
+    var total = 0;
+    for (var i = 0; i < 2000; i = i + 1) {
+        var p = Point(i, 1);
+        if (i == floor(i / 2) * 2) p.even = true;
+        total = total + p.norm2();
+    }
+    print total;
+    """
+    )
+    run(source, engine)
+    assert capsys.readouterr().out == "2664669000.0\n"
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+@pytest.mark.parametrize(
+    "source, message",
+    [
+        ("var x = 1;\nprint x.y;", "Only instances have properties, not 1"),
+        ("var x = 1;\nx.y = 2;", "Only instances have fields, not 1"),
+        ("class A {}\nprint A().y;", "Undefined property 'y'"),
+        ("var A = 1;\nclass B < A {}", "Superclass must be a class"),
+        (
+            "class A { m() {} }\nclass B < A { m() { return super.n(); } }\nB().m();",
+            "Undefined property 'n'",
+        ),
+    ],
+)
+def test_runtime_errors(engine, source, message, capsys):
+    interpreter = run(source, engine)
+    engine_ = interpreter.vm if engine == "vm" else interpreter.interpreter
+    assert engine_.had_runtime_error
+    output = capsys.readouterr().out
+    assert output.startswith(message) and "@ [line " in output
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+@pytest.mark.parametrize(
+    "source, message",
+    [
+        ("class A {}\nA(1);", "Expected 0 arguments but got 1"),
+        ("class A { init(a) {} }\nA(1, 2);", "Expected 1 arguments but got 2"),
+        ("class A { m(a) {} }\nA().m(1, 2);", "Expected 1 arguments but got 2"),
+    ],
+)
+def test_arity_errors(engine, source, message, capsys):
+    run(source, engine)
+    assert capsys.readouterr().out.startswith(message + " @ [line 2]")
+
+
+@pytest.mark.parametrize(
+    "source, message",
+    [
+        ("print this;", "Can't use 'this' outside of a class"),
+        ("fun f() { return super.x; }", "Can't use 'super' outside of a class"),
+        (
+            "class A { f() { super.f(); } }",
+            "Can't use 'super' in a class with no superclass",
+        ),
+        ("class A < A {}", "A class can't inherit from itself"),
+    ],
+)
+def test_compiler_errors(source, message, capsys):
+    interpreter = run(source)
+    assert interpreter.had_error
+    assert capsys.readouterr().out == f"Compiler error: {message}\n"
+
+
+def test_initializer_cannot_return_a_value(capsys):
+    interpreter = run("class A { init() { return 1; } }")
+    assert interpreter.had_error
+    assert "Can't return a value from an initializer" in capsys.readouterr().out
+
+
+def test_initializers_are_not_memoized(capsys):
+    source = """
+    class Box { init(v) { this.v = v; } }
+    var a = Box(1);
+    var b = Box(1);
+    a.v = 2;
+    print b.v;
+    print a == b;
+    """
+    run(source)
+    assert capsys.readouterr().out.split() == ["1", "False"]
+
+
+def test_instances_share_shapes():
+    klass = LoxClass("A", None, {})
+    first, second = LoxInstance(klass.shape), LoxInstance(klass.shape)
+    for instance in (first, second):
+        for name in ("x", "y"):
+            shape, index, next_shape = field_cache(instance, name)
+            assert shape is instance.shape and index == len(instance.fields)
+            instance.fields.append(name)
+            instance.shape = next_shape
+    assert first.shape is second.shape
+    assert first.shape.slots == {"x": 0, "y": 1}
+    assert field_cache(first, "x") == (first.shape, 0, None)
+    # Fields added in another order make another shape
+    third = LoxInstance(klass.shape)
+    for name in ("y", "x"):
+        _, _, third.shape = field_cache(third, name)
+    assert third.shape is not first.shape
+
+
+def test_property_cache_finds_inherited_methods():
+    method = object()
+    base = LoxClass("A", None, {"m": method})
+    klass = LoxClass("B", base, {})
+    instance = LoxInstance(klass.shape)
+    assert property_cache(instance, "m") == (klass.shape, None, method)
+    assert klass.shape is not base.shape
+
+
+def test_get_caches_the_shape():
+    source = (
+        SHAPES
+        + """
+    fun xs(a, b) { return a.x + b.x; }
+    print xs(Point(1, 2), Point(3, 4));
+    """
+    )
+    interpreter = run(source)
+    klass = interpreter.interpreter.globals["Point"]
+    get = interpreter.interpreter.globals["xs"].declaration.body[0].value.left
+    shape, index, method = get.cache
+    assert shape.klass is klass and index == 0 and method is None
@@ -0,0 +1,59 @@
+import pytest
+
+from .context import pylox
+from .test_vm import PROGRAMS, run
+
+from pylox.closure_eval import ClosureFunction
+
+
+@pytest.mark.parametrize("name", sorted(PROGRAMS))
+def test_closure_engine_matches_tree_walker(name, capsys):
+    """
+    Ensure that the closure compiler prints exactly what the tree-walking interpreter prints
+    """
+    source = PROGRAMS[name]
+    assert run("closure", source, capsys) == run("ast", source, capsys)
+
+
+def test_runtime_error_reports_line(capsys):
+    source = 'var a = 1;\n\nprint a - "b";\nprint "unreachable";'
+    output = run("closure", source, capsys)
+    assert "@ [line 3]" in output
+    assert "unreachable" not in output
+
+
+@pytest.mark.parametrize(
+    "source",
+    [
+        "fun r(n) { if (n == 0) return 0; return 1 + r(n - 1); }\nprint r(5000);",
+        "fun loop(n) { if (n == 0) return 0; return loop(n - 1); }\nprint loop(20000);",
+    ],
+)
+def test_deep_recursion_reports_stack_overflow(source, capsys):
+    """
+    Ensure that running out of python stack is a lox runtime error at the call
+    """
+    output = run("closure", source, capsys)
+    assert output.startswith("Stack overflow @ [line 1]")
+    assert "Traceback" not in output
+
+
+def test_functions_are_closure_functions():
+    interpreter = pylox.LoxIntepreter(engine="closure")
+    interpreter.run(source="fun f(a, b) { return a * b; }")
+    function = interpreter.interpreter.globals["f"]
+    assert isinstance(function, ClosureFunction)
+    assert function.call(interpreter.interpreter, [3, 4]) == 12.0
+
+
+def test_distances_are_bound_at_compile_time():
+    """
+    Ensure that resolver distances are not looked up while the program runs
+    """
+    interpreter = pylox.LoxIntepreter(engine="closure")
+    engine = interpreter.interpreter
+    statements = interpreter._front_end(source="fun f(a) { return a; }")
+    interpreter._execute(statements)
+    variable = statements[0].body[0].value
+    variable.depth = variable.slot = None
+    assert engine.globals["f"].call(engine, ["value"]) == "value"
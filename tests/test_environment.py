@@ -1,5 +1,27 @@
+from .context import pylox
 
+from pylox.expr import Variable
 from pylox.expr_eval import Environment
+from pylox.environment import new_frame
+from pylox.resolver import Resolver
+from pylox.scanner import LoxScanner
+
+
+def resolve(source):
+    statements = pylox.Parser(tokens=LoxScanner(source=source).scan_tokens()).parse()
+    Resolver(interpreter=None).resolve_all(statements)
+    return statements
+
+
+def variables(node):
+    """Yield every Variable node below `node`"""
+    if isinstance(node, list):
+        for item in node:
+            yield from variables(item)
+    elif isinstance(node, Variable):
+        yield node
+    for field in getattr(type(node), '_fields', ()):
+        yield from variables(getattr(node, field))
 
 class TestEnvironment:
 
@@ -27,3 +49,40 @@ class TestEnvironment:
         assert great_grandchild.ancestor(depth=3) == parent
         assert great_grandchild.ancestor(depth=2) == child
         assert great_grandchild.ancestor(depth=1) == grandchild
+
+
+class TestFrame:
+
+    def test_stores_values_by_slot(self):
+        frame = new_frame(None, [1, 2])
+        frame.define(3)
+        assert frame.get_at(0, 0) == 1
+        assert frame.get_at(0, 2) == 3
+
+    def test_reads_and_writes_ancestors(self):
+        parent = new_frame(None, ['outer'])
+        child = new_frame(parent)
+        grandchild = new_frame(child, ['inner'])
+
+        assert grandchild.ancestor(depth=2) is parent
+        assert grandchild.get_at(2, 0) == 'outer'
+        grandchild.assign_at(2, 0, 'changed')
+        assert parent[0] == 'changed'
+
+    def test_frames_have_no_instance_dict(self):
+        assert not hasattr(new_frame(None), '__dict__')
+
+
+class TestResolverSlots:
+
+    def test_locals_get_depth_and_slot(self):
+        source = "fun f(a, b) { var c = a; { var d = b; print c + d; } }"
+        resolved = {}
+        for expr in variables(resolve(source)):
+            if expr.depth is not None:
+                resolved[expr.name.lexeme] = (expr.depth, expr.slot)
+        assert resolved == {'a': (0, 0), 'b': (1, 1), 'c': (1, 2), 'd': (0, 0)}
+
+    def test_globals_are_not_annotated(self):
+        variable = resolve("var a = 1; print a;")[1].expression
+        assert (variable.depth, variable.slot) == (None, None)
@@ -0,0 +1,319 @@
+import pytest
+
+from .helpers import parse, run
+from .context import pylox
+from pylox.iterators import LoxGenerator, LoxRange, iterate
+from pylox.stmt import ForIn, Yield
+
+ENGINES = pylox.pylox.ENGINES
+GENERATOR_ENGINES = [engine for engine in ENGINES if engine != "vm"]
+
+COUNT = """
+fun count(n) {
+    var i = 0;
+    while (i < n) {
+        yield i;
+        i = i + 1;
+    }
+}
+"""
+
+
+def test_parses_yield_and_for_in():
+    function, loop = parse("fun f() { yield 1; yield; } for (x in f()) print x;")
+    first, second = function.body
+    assert isinstance(first, Yield) and first.value.value == 1
+    assert isinstance(second, Yield) and second.value is None
+    assert isinstance(loop, ForIn)
+    assert loop.name.lexeme == "x"
+    assert loop.iterable.callee.name.lexeme == "f"
+
+
+def test_for_statement_still_parses():
+    # `in` is only looked for right after the identifier
+    (block,) = parse("for (i = 0; i < 2; i = i + 1) print i;")
+    assert not isinstance(block, ForIn)
+
+
+@pytest.mark.parametrize("optimize", [True, False])
+@pytest.mark.parametrize("engine", GENERATOR_ENGINES)
+def test_pipeline(engine, optimize, capsys):
+    source = (
+        COUNT
+        + """
+    fun evens(source) {
+        for (x in source) if (x == floor(x / 2) * 2) yield x;
+    }
+    fun squares(source) {
+        for (x in source) yield x * x;
+    }
+    var total = 0;
+    for (v in squares(evens(count(10)))) {
+        print v;
+        total = total + v;
+    }
+    print total;
+    """
+    )
+    run(source, engine, optimize)
+    assert capsys.readouterr().out.split() == [
+        "0.0",
+        "4.0",
+        "16.0",
+        "36.0",
+        "64.0",
+        "120.0",
+    ]
+
+
+@pytest.mark.parametrize("engine", GENERATOR_ENGINES)
+def test_generators_are_lazy_and_run_once(engine, capsys):
+    source = """
+    fun noisy() {
+        print "start";
+        yield 1;
+        print "middle";
+        yield 2;
+        print "end";
+    }
+    var g = noisy();
+    print g;
+    for (x in g) print x;
+    for (x in g) print "again";
+    """
+    run(source, engine)
+    assert capsys.readouterr().out.splitlines() == [
+        "<generator noisy>",
+        "start",
+        "1",
+        "middle",
+        "2",
+        "end",
+    ]
+
+
+@pytest.mark.parametrize("engine", GENERATOR_ENGINES)
+def test_return_stops_a_generator(engine, capsys):
+    source = (
+        COUNT
+        + """
+    fun until(source, stop) {
+        for (x in source) {
+            if (x == stop) return;
+            yield x;
+        }
+        yield "unreachable";
+    }
+    for (x in until(count(10), 2)) print x;
+    fun first(source) {
+        for (x in source) return x;
+    }
+    print first(count(5));
+    """
+    )
+    run(source, engine)
+    assert capsys.readouterr().out.split() == ["0", "1", "0"]
+
+
+@pytest.mark.parametrize("engine", GENERATOR_ENGINES)
+def test_generator_scopes(engine, capsys):
+    source = """
+    var a = "global";
+    fun scopes() {
+        var a = "outer";
+        {
+            var b = "inner";
+            yield a + " " + b;
+            {
+                var c = "innermost";
+                yield b + " " + c;
+            }
+            yield a;
+        }
+    }
+    for (x in scopes()) {
+        var a = "loop";
+        print x;
+    }
+    print a;
+    fun makers(n) {
+        var i = 0;
+        while (i < n) {
+            var j = i;
+            fun get() { return j; }
+            yield get;
+            i = i + 1;
+        }
+    }
+    var total = 0;
+    for (get in makers(3)) total = total + get();
+    print total;
+    """
+    run(source, engine)
+    assert capsys.readouterr().out.splitlines() == [
+        "outer inner",
+        "inner innermost",
+        "outer",
+        "global",
+        "3",
+    ]
+
+
+@pytest.mark.parametrize("engine", GENERATOR_ENGINES)
+def test_optimized_away_yield(engine, capsys):
+    source = """
+    fun never() {
+        print "run";
+        if (false) yield 1;
+    }
+    var g = never();
+    print "called";
+    for (x in g) print x;
+    """
+    run(source, engine)
+    assert capsys.readouterr().out.split() == ["called", "run"]
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_for_in_collections(engine, capsys):
+    source = """
+    for (x in push(push(pvec(), 1), 2)) print x;
+    var a = array(2);
+    a[1] = 5;
+    for (x in a) print x;
+    var m = {"a": 1, "b": 2};
+    for (k in m) { m[k + k] = 0; print k; }
+    print len(m);
+    for (k in assoc(pmap(), "p", 1)) print k;
+    fun closures() {
+        var out = {};
+        var n = 0;
+        for (k in {"x": 1, "y": 2}) {
+            fun get() { return k; }
+            out[n] = get;
+            n = n + 1;
+        }
+        return out;
+    }
+    var c = closures();
+    print c[0]() + c[1]();
+    """
+    run(source, engine)
+    assert capsys.readouterr().out.split() == [
+        "1",
+        "2",
+        "0.0",
+        "5.0",
+        "a",
+        "b",
+        "4",
+        "p",
+        "xy",
+    ]
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_for_in_ranges(engine, capsys):
+    source = """
+    var r = range(0, 10, 4);
+    print r;
+    print len(r);
+    for (i in r) print i;
+    for (x in range(1, 0, -0.5)) print x;
+    print sum(range(0, 1001, 1));
+    print len(range(3, 0, 1));
+    """
+    run(source, engine)
+    assert capsys.readouterr().out.split() == [
+        "range(0,",
+        "10,",
+        "4)",
+        "3",
+        "0",
+        "4",
+        "8",
+        "1.0",
+        "0.5",
+        "500500",
+        "0",
+    ]
+
+
+@pytest.mark.parametrize(
+    "source, message",
+    [
+        ("range(0, 1, 0);", "range expects a step other than 0"),
+        ('range(0, "a", 1);', "range expects a number, not 'a'"),
+        (
+            "range(0, pow(10, 300) * pow(10, 300), 1);",
+            "range expects finite numbers",
+        ),
+    ],
+)
+def test_range_errors(source, message, capsys):
+    run(source)
+    assert capsys.readouterr().out.startswith(message)
+
+
+@pytest.mark.parametrize(
+    "start, stop, step",
+    [(0, 5, 1), (0, 5.5, 2), (5, -1.5, -2), (0, 1, 0.1), (1.5, 0, -0.25), (3, 3, 1)],
+)
+def test_range_values(start, stop, step):
+    values = list(LoxRange(start, stop, step))
+    assert len(LoxRange(start, stop, step)) == len(values)
+    expected = []
+    while (step > 0 and start + len(expected) * step < stop) or (
+        step < 0 and start + len(expected) * step > stop
+    ):
+        expected.append(start + len(expected) * step)
+    assert values == expected
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_for_in_needs_an_iterable(engine, capsys):
+    run("var x = 1;\nfor (y in x) print y;", engine)
+    assert capsys.readouterr().out == (
+        "Only generators, ranges, arrays, maps and vectors can be iterated, not 1 @ [line 2]\n"
+    )
+
+
+@pytest.mark.parametrize(
+    "source, message",
+    [
+        ("yield 1;", "Cannot yield outside of a function"),
+        (
+            "fun g() { yield 1; return 2; }",
+            "Cannot return a value from generator 'g'",
+        ),
+    ],
+)
+def test_compiler_errors(source, message, capsys):
+    interpreter = run(source)
+    assert interpreter.had_error
+    assert capsys.readouterr().out == f"Compiler error: {message}\n"
+
+
+def test_vm_rejects_generators(capsys):
+    interpreter = run(COUNT + "for (x in count(2)) print x;", engine="vm")
+    assert interpreter.had_error
+    assert "not supported by the vm engine" in capsys.readouterr().out
+
+
+def test_generators_are_not_memoized(capsys):
+    source = (
+        COUNT
+        + """
+    for (x in count(2)) print x;
+    for (x in count(2)) print x;
+    """
+    )
+    run(source)
+    assert capsys.readouterr().out.split() == ["0", "1", "0", "1"]
+
+
+def test_iterate():
+    generator = LoxGenerator("g", iter([1, 2]))
+    assert list(iterate(generator)) == [1, 2]
+    assert list(iterate(generator)) == []
+    assert str(generator) == "<generator g>"
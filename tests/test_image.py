@@ -0,0 +1,75 @@
+import pytest
+
+from .context import pylox
+
+from pylox.compiler import Compiler
+from pylox.image import Image, ImageError, load_image, write_image
+
+from .test_vm import PROGRAMS, run
+
+
+def compile_image(source, tmp_path, name="program"):
+    script = tmp_path / f"{name}.lox"
+    script.write_text(source)
+    return pylox.LoxIntepreter().compile_file(file=script, target="image")
+
+
+@pytest.mark.parametrize("name", sorted(PROGRAMS))
+def test_image_matches_vm(name, tmp_path, capsys):
+    image = compile_image(PROGRAMS[name], tmp_path, name)
+    capsys.readouterr()
+    pylox.LoxIntepreter().load_compiled(path=image)
+    assert capsys.readouterr().out == run("vm", PROGRAMS[name], capsys)
+
+
+def test_image_defaults_to_loxb_next_to_script(tmp_path):
+    image = compile_image("print 1;", tmp_path)
+    assert image == tmp_path / "program.loxb"
+
+
+def test_runtime_error_reports_line(tmp_path, capsys):
+    image = compile_image('print 1;\nprint -"a";', tmp_path)
+    interpreter = pylox.LoxIntepreter()
+    interpreter.load_compiled(path=image)
+    assert capsys.readouterr().out.splitlines()[-1].endswith("@ [line 2]")
+    assert interpreter.vm.had_runtime_error
+
+
+def test_constants_round_trip(tmp_path):
+    function = Compiler().compile([])
+    function.chunk.constants.extend([1, 2.5, "naïve", -(2**40), True])
+    write_image(function, tmp_path / "constants.loxb")
+    constants = load_image(tmp_path / "constants.loxb").chunk.constants
+    assert constants == [1, 2.5, "naïve", -(2**40), True]
+    assert constants[-1] is True
+
+
+def test_functions_are_decoded_on_first_use(tmp_path):
+    image = Image(compile_image("fun f() { return 1; } fun g() { return 2; } print f();", tmp_path))
+    script = image.script()
+    assert "constants" not in vars(script.chunk)
+    script.chunk.constants
+    functions = [constant for constant in script.chunk.constants if hasattr(constant, "arity")]
+    assert [function.name for function in functions] == ["f", "g"]
+    assert all("code" not in vars(function.chunk) for function in functions)
+
+
+def test_rejects_other_files(tmp_path):
+    other = tmp_path / "other.loxb"
+    other.write_bytes(b"print 1;" * 100)
+    with pytest.raises(ImageError):
+        Image(other)
+    with pytest.raises(pylox.LoxException):
+        pylox.LoxIntepreter().load_compiled(path=other)
+
+
+def test_rejects_truncated_image(tmp_path):
+    image = compile_image("fun f() { return 1; } print f();", tmp_path)
+    image.write_bytes(image.read_bytes()[:-8])
+    with pytest.raises(ImageError):
+        Image(image)
+
+
+def test_rejects_unknown_target(tmp_path):
+    with pytest.raises(pylox.LoxException):
+        pylox.LoxIntepreter().compile_file(file="examples/fib.lox", target="jvm")
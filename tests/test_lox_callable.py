@@ -1,4 +1,12 @@
+import pytest
+
+from .context import pylox
+from pylox import tracing
 from pylox.callable import LoxCallable
+from pylox.expr import Call, Literal
+from pylox.expr_eval import ExpressionInterpreter as Interpreter
+from pylox.expr_eval import LoxRuntimeError
+from pylox.stmt import Block, Print, Return
 
 
 class TestLoxCallable:
@@ -9,3 +17,209 @@ class TestLoxCallable:
     def test_can_call(self):
         """"""
 
+
+def _calls(node, found):
+    """Collect the Call nodes under `node`"""
+    if isinstance(node, Call):
+        found.append(node)
+    for name in getattr(node, "_fields", ()):
+        value = getattr(node, name)
+        for child in value if isinstance(value, list) else [value]:
+            if hasattr(child, "_fields"):
+                _calls(child, found)
+    return found
+
+
+class TestInlineCache:
+    """
+    Tests for the inline caches of call sites in the tree walking interpreter
+    """
+
+    def run(self, source):
+        interpreter = pylox.LoxIntepreter()
+        statements = interpreter._front_end(source=source)
+        interpreter._execute(statements=statements)
+        found = []
+        for statement in statements:
+            _calls(statement, found)
+        return found
+
+    def test_call_fills_cache(self, capsys):
+        (call,) = [
+            call
+            for call in self.run("fun f(a, b) { return a + b; } print f(1, 2);")
+            if call.cache is not None
+        ]
+        declaration, body, arity, _ = call.cache
+        assert declaration.name.name.lexeme == "f"
+        assert body is declaration.body
+        assert arity == 2
+        assert capsys.readouterr().out == "3\n"
+
+    def test_recursion_uses_cache(self, capsys):
+        self.run(
+            "fun fib(n) { if (n < 2) return n; return fib(n - 1) + fib(n - 2); }"
+            "print fib(15);"
+        )
+        assert capsys.readouterr().out == "610.0\n"
+
+    def test_new_callee_refills_cache(self, capsys):
+        source = """
+        fun f(a) { return a + 1; }
+        fun h(a) { return a * 2; }
+        var g = f;
+        var i = 0;
+        while (i < 4) {
+            print g(i);
+            if (i == 1) g = h;
+            if (i == 2) g = f;
+            i = i + 1;
+        }
+        """
+        calls = self.run(source)
+        assert capsys.readouterr().out == "1\n2\n4.0\n4\n"
+        assert [call.cache[0].name.name.lexeme for call in calls] == ["f"]
+
+    def test_closures_share_cache(self, capsys):
+        source = """
+        fun make(n) { fun add(x) { return x + n; } return add; }
+        var one = make(1);
+        var two = make(2);
+        var i = 0;
+        while (i < 2) {
+            print one(i);
+            print two(i);
+            i = i + 1;
+        }
+        """
+        self.run(source)
+        assert capsys.readouterr().out == "1\n2\n2\n3\n"
+
+    def test_extra_arguments_raise(self, capsys):
+        """
+        Calls with too many arguments used to drop the extra ones here, they
+        now fail like on the other engines
+        """
+        self.run(
+            "fun f(a) { return a; } var i = 0; while (i < 2) { print f(i, i); i = i + 1; }"
+        )
+        assert capsys.readouterr().out == "Expected 1 arguments but got 2 @ [line 1]\n"
+
+    def test_calling_non_function_raises(self):
+        interpreter = Interpreter()
+        call = Call(callee=Literal(value=1.0), paren=None, arguments=[])
+        with pytest.raises(LoxRuntimeError):
+            interpreter.evaluate(call)
+
+
+class TestTailCalls:
+    """
+    Tests for returned calls, which the tree walking interpreter runs on a
+    trampoline
+    """
+
+    COUNT = "fun count(n, acc) { if (n < 1) return acc; return count(n - 1, acc + 1); }"
+
+    def test_resolver_marks_returned_calls(self):
+        source = (
+            "fun f(n) { if (n) return n; return f(n) + 1; } fun g(n) { return f(n); }"
+        )
+        f, g = pylox.LoxIntepreter(optimize=False)._front_end(source=source)
+        assert [f.body[0].then_branch.tail, f.body[1].tail, g.body[0].tail] == [
+            False,
+            False,
+            True,
+        ]
+
+    def test_tail_recursion_runs_in_constant_stack(self, capsys):
+        pylox.LoxIntepreter().run(self.COUNT + " print count(20000, 0);")
+        assert capsys.readouterr().out == "20000\n"
+
+    def test_mutual_tail_recursion(self, capsys):
+        source = """
+        fun even(n) { if (n < 1) return true; return odd(n - 1); }
+        fun odd(n) { if (n < 1) return false; return even(n - 1); }
+        print even(20001);
+        """
+        pylox.LoxIntepreter().run(source)
+        assert capsys.readouterr().out == "false\n"
+
+    def test_tail_call_to_closure(self, capsys):
+        source = """
+        fun make(n) { fun get() { return n; } return get; }
+        fun call(f) { return f(); }
+        print call(make(3));
+        """
+        pylox.LoxIntepreter().run(source)
+        assert capsys.readouterr().out == "3\n"
+
+    def test_tail_call_of_non_function_raises(self):
+        interpreter = Interpreter()
+        returned = Return(
+            keyword=None,
+            value=Call(callee=Literal(value=1.0), paren=None, arguments=[]),
+        )
+        returned.tail = True
+        with pytest.raises(LoxRuntimeError):
+            interpreter._execute(returned)
+
+    def test_traced_tail_calls_record_every_call(self, capsys):
+        tracing.enable("calls")
+        try:
+            pylox.LoxIntepreter().run(self.COUNT + " print count(3, 0);")
+            calls = [
+                record for record in tracing.records() if record.startswith("[calls]")
+            ]
+        finally:
+            tracing.disable()
+        assert capsys.readouterr().out == "3\n"
+        assert len(calls) == 4
+
+
+class TestCompletions:
+    """
+    Tests for the completions statements return in the tree walking
+    interpreter
+    """
+
+    def test_return_completes_with_its_value(self):
+        returned = Return(keyword=None, value=Literal(value=1.0))
+        assert Interpreter()._execute(returned) == (1.0,)
+
+    def test_block_stops_at_return(self):
+        block = Block(
+            statements=[
+                Return(keyword=None, value=Literal(value=1.0)),
+                Print(expression=Literal(value=2.0)),
+            ]
+        )
+        assert Interpreter()._execute(block) == (1.0,)
+
+    def test_return_from_loop(self, capsys):
+        source = """
+        fun first(limit) {
+            var i = 0;
+            while (i < 100) {
+                { if (i == limit) return i; }
+                i = i + 1;
+            }
+            return nil;
+        }
+        print first(3);
+        print first(200);
+        """
+        pylox.LoxIntepreter(optimize=False).run(source)
+        assert capsys.readouterr().out == "3\nNone\n"
+
+    def test_return_restores_environment(self, capsys):
+        source = """
+        var a = "global";
+        fun f() { { var a = "block"; return a; } }
+        {
+            var a = "local";
+            print f();
+            print a;
+        }
+        """
+        pylox.LoxIntepreter().run(source)
+        assert capsys.readouterr().out == "block\nlocal\n"
@@ -0,0 +1,107 @@
+import pytest
+
+from .helpers import run
+from .context import pylox
+from pylox.callable import LoxRuntimeError
+from pylox.maps import LoxMap, build_map, map_key
+from pylox.rope import ROPE_MINIMUM, concat
+
+ENGINES = pylox.pylox.ENGINES
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_literals_and_subscripts(engine, capsys):
+    source = """
+    var m = {"a": 1, 2: "two", nil: 3,};
+    m["b"] = m["a"] + 1;
+    print m;
+    print m[2.0] + m[nil];
+    print {};
+    print len(m) + len({1: {1: 1}}[1]);
+    """
+    run(source, engine)
+    assert capsys.readouterr().out.splitlines() == [
+        "{a: 1, 2: two, None: 3, b: 2}",
+        "two3",
+        "{}",
+        "5",
+    ]
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_natives(engine, capsys):
+    source = """
+    var m = {"a": 1};
+    print set(m, "b", 2);
+    print get(m, "b");
+    print get(m, "c");
+    print has(m, "a");
+    print delete(m, "a");
+    print delete(m, "a");
+    print has(m, "a");
+    m["c"] = 3;
+    var names = keys(m);
+    var i = 0;
+    while (i < len(names)) { print names[i]; i = i + 1; }
+    """
+    run(source, engine)
+    assert capsys.readouterr().out.splitlines() == [
+        "2",
+        "2",
+        "None",
+        "True",
+        "1",
+        "None",
+        "False",
+        "b",
+        "c",
+    ]
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_large_tables(engine, capsys):
+    source = """
+    var m = {};
+    var i = 0;
+    while (i < 5000) { m["k" + i] = i; m[i] = "v" + i; i = i + 1; }
+    print len(m);
+    print m[4999.0] + m["k4999"];
+    """
+    run(source, engine)
+    assert capsys.readouterr().out == "10000\nv49994999\n"
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+@pytest.mark.parametrize(
+    "source, message",
+    [
+        ('print {}["x"];', "Key 'x' is not in the map"),
+        (
+            "print {array(1): 1};",
+            "Map keys should be numbers, strings, booleans or nil, not <array len=1>",
+        ),
+        ("var m = {}; m[{}] = 1;", "Map keys should be numbers"),
+        ("print get(1, 2);", "get expects a map, not 1"),
+        ("print {}[1:2];", "Only arrays can be sliced, not <map len=0>"),
+    ],
+)
+def test_errors(engine, source, message, capsys):
+    interpreter = run(source, engine)
+    engine_ = interpreter.vm if engine == "vm" else interpreter.interpreter
+    assert engine_.had_runtime_error
+    output = capsys.readouterr().out
+    assert output.startswith(message) and "@ [line 1]" in output
+
+
+def test_keys_compare_like_equality():
+    table = build_map([1, "one", "a", "letter"])
+    assert table.get_item(1.0) == "one"
+    table.set_item(concat("x" * ROPE_MINIMUM, ""), 2)
+    assert type(list(table.entries)[-1]) is str
+    assert table.get_item("x" * ROPE_MINIMUM) == 2
+
+
+def test_map_key_rejects_objects():
+    assert map_key(None) is None
+    with pytest.raises(LoxRuntimeError):
+        map_key(LoxMap())
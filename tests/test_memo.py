@@ -0,0 +1,158 @@
+import pytest
+
+from .context import pylox
+from pylox.memo import MISSING, Memo, memo_key
+from pylox.parser import Parser
+from pylox.resolver import PureFunctions, Resolver
+from pylox.scanner import RegexScanner
+
+FIB = "fun fib(n) { if (n < 2) return n; return fib(n - 2) + fib(n - 1); }"
+
+
+def resolve(source, pure_functions=None):
+    """Return the top level functions of `source` by name, once resolved"""
+    statements = Parser(tokens=RegexScanner(source=source).scan_buffer()).parse()
+    Resolver(interpreter=None, pure_functions=pure_functions).resolve_all(statements)
+    return {
+        statement.name.name.lexeme: statement
+        for statement in statements
+        if type(statement).__name__ == "Function"
+    }
+
+
+def test_key_tells_apart_values_that_print_differently():
+    keys = [memo_key(arguments) for arguments in ([1], [1.0], [True], [0.0], [-0.0])]
+    assert len(set(keys)) == len(keys)
+    assert memo_key(["a", None, 2.5]) == memo_key(["a", None, 2.5])
+
+
+def test_key_of_objects_is_none():
+    assert memo_key([1.0, object()]) is None
+
+
+def test_memo_counts_hits_and_misses():
+    memo = Memo(name="f")
+    assert memo.lookup((float, 1.0)) is MISSING
+    memo.store((float, 1.0), 2.0)
+    assert memo.lookup((float, 1.0)) == 2.0
+    assert (memo.hits, memo.misses) == (1, 1)
+
+
+def test_memo_evicts_least_recently_used():
+    memo = Memo(name="f", maxsize=2)
+    memo.store("a", 1)
+    memo.store("b", 2)
+    memo.lookup("a")
+    memo.store("c", 3)
+    assert len(memo) == 2
+    assert memo.lookup("b") is MISSING
+    assert memo.lookup("a") == 1
+
+
+def test_memo_keeps_no_objects():
+    memo = Memo(name="f")
+    memo.store("a", object())
+    assert len(memo) == 0
+
+
+@pytest.mark.parametrize(
+    "source",
+    [
+        FIB,
+        "fun f(a, b) { var c = a * b; { var d = c + 1; c = d; } return c; }",
+        "fun f(n) { return n; } fun g(n) { return f(n) + f(n + 1); }",
+    ],
+)
+def test_pure_functions(source):
+    functions = resolve(source)
+    assert all(function.pure for function in functions.values())
+
+
+@pytest.mark.parametrize(
+    "source, name",
+    [
+        ("fun f(n) { print n; return n; }", "f"),
+        ("var x = 1; fun f(n) { return n + x; }", "f"),
+        ("var x = 1; fun f(n) { x = n; return n; }", "f"),
+        ("fun f(n) { fun g() { return 1; } return g(); }", "f"),
+        ("fun f(n) { return g(n); } fun g(n) { return n; }", "f"),
+        ("fun p(n) { print n; } fun f(n) { p(n); return n; }", "f"),
+        (FIB + " fib = nil;", "fib"),
+        (FIB + " var fib = 1;", "fib"),
+    ],
+)
+def test_impure_functions(source, name):
+    assert resolve(source)[name].pure is False
+
+
+def test_closure_reading_enclosing_locals_is_impure():
+    source = """
+    fun outer(n) {
+        fun inner() { return n; }
+        fun alone(m) { return m; }
+        return inner;
+    }
+    """
+    statements = Parser(tokens=RegexScanner(source=source).scan_buffer()).parse()
+    Resolver(interpreter=None).resolve_all(statements)
+    inner, alone, _ = statements[0].body
+    assert inner.pure is False
+    assert alone.pure is True
+
+
+def test_assignment_invalidates_readers():
+    pure_functions = PureFunctions()
+    functions = resolve(FIB + " fun f(n) { return fib(n); }", pure_functions)
+    assert functions["f"].pure
+    resolve("fib = nil;", pure_functions)
+    assert functions["fib"].pure is False
+    assert functions["f"].pure is False
+    assert "f" not in pure_functions.functions
+
+
+def test_memoized_fib_is_linear(capsys):
+    interpreter = pylox.LoxIntepreter()
+    interpreter.run(FIB + " print fib(90);")
+    assert capsys.readouterr().out == "2.880067194370816e+18\n"
+    (memo,) = interpreter.interpreter.memos.values()
+    assert memo.misses < 200
+
+
+@pytest.mark.parametrize("memoize", [True, False])
+def test_memoization_keeps_output(memoize, capsys):
+    source = (
+        FIB
+        + """
+    fun half(n) { if (n < 1) return n; return half(n / 2); }
+    var i = 0;
+    while (i < 15) { print fib(i); print half(-0.0 * i); i = i + 1; }
+    """
+    )
+    pylox.LoxIntepreter(memoize=memoize).run(source)
+    output = capsys.readouterr().out
+    pylox.LoxIntepreter(engine="closure").run(source)
+    assert output == capsys.readouterr().out
+
+
+def test_no_memo(capsys):
+    interpreter = pylox.LoxIntepreter(memoize=False)
+    interpreter.run(FIB + " print fib(10);")
+    assert capsys.readouterr().out == "55.0\n"
+    assert interpreter.interpreter.memos == {}
+
+
+def test_memo_size_bounds_tables(capsys):
+    interpreter = pylox.LoxIntepreter(memo_size=4)
+    interpreter.run(FIB + " print fib(15);")
+    assert capsys.readouterr().out == "610.0\n"
+    (memo,) = interpreter.interpreter.memos.values()
+    assert len(memo) == 4
+
+
+def test_redefinition_in_later_run_stops_memoization(capsys):
+    interpreter = pylox.LoxIntepreter()
+    interpreter.run("fun one() { return 1; } fun f(n) { return one() + n; }")
+    interpreter.run("print f(1);")
+    interpreter.run("fun one() { return 2; }")
+    interpreter.run("print f(1);")
+    assert capsys.readouterr().out == "2\n3\n"
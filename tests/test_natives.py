@@ -0,0 +1,121 @@
+import pytest
+
+from .helpers import run
+from .context import pylox
+from pylox.callable import LoxRuntimeError, NativeFunction
+from pylox.natives import LIBRARY
+
+ENGINES = pylox.pylox.ENGINES
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_library(engine, capsys):
+    source = """
+    print sqrt(16);
+    print abs(-2);
+    print floor(2.5) + ceil(2.5);
+    print pow(2, 10);
+    print min(3, 4) + max(3, 4);
+    print len("hello");
+    print substr("hello", 1, 3);
+    print substr("hello", -3, 5);
+    print fixed(3.14159, 2);
+    print str(1) + str(nil);
+    print num("2.5") * 2;
+    print num("7") + 1;
+    var start = clock();
+    print clock() - start >= 0;
+    """
+    run(source, engine)
+    assert capsys.readouterr().out.splitlines() == [
+        "4.0",
+        "2.0",
+        "5",
+        "1024.0",
+        "7",
+        "5",
+        "el",
+        "llo",
+        "3.14",
+        "1None",
+        "5.0",
+        "8",
+        "True",
+    ]
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_natives_called_from_functions(engine, capsys):
+    source = """
+    fun hypot(a, b) { return sqrt(a * a + b * b); }
+    fun twice(s) { return s + s; }
+    print hypot(3, 4);
+    print len(twice("ab"));
+    """
+    run(source, engine)
+    assert capsys.readouterr().out == "5.0\n4\n"
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_define_native(engine, capsys):
+    interpreter = pylox.LoxIntepreter(engine=engine)
+    interpreter.define_native("add3", lambda a, b, c: a + b + c, 3)
+    interpreter.run("print add3(1, 2, 3);")
+    assert capsys.readouterr().out == "6\n"
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_natives_get_python_strings(engine, capsys):
+    interpreter = pylox.LoxIntepreter(engine=engine)
+    interpreter.define_native("upper", lambda s: s.upper(), 1)
+    interpreter.run(
+        """
+        var s = "";
+        for (var i = 0; i < 100; i = i + 1) s = s + "abc";
+        print len(upper(s));
+        print substr(upper(s), 0, 3);
+        """
+    )
+    assert capsys.readouterr().out == "300\nABC\n"
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+@pytest.mark.parametrize(
+    "source, message",
+    [
+        ("print sqrt(1, 2);", "Expected 1 arguments but got 2"),
+        ('print sqrt("a");', "sqrt expects a number, not 'a'"),
+        ("print sqrt(-1);", "sqrt: math domain error"),
+        ('print substr("abc", 0.5, 1);', "substr expects a whole number, not 0.5"),
+        ('print num("abc");', "num cannot read a number from 'abc'"),
+    ],
+)
+def test_errors(engine, source, message, capsys):
+    interpreter = run(source, engine)
+    engine_ = interpreter.vm if engine == "vm" else interpreter.interpreter
+    assert engine_.had_runtime_error
+    assert capsys.readouterr().out.startswith(message + " @ [line 1]")
+
+
+def test_natives_can_be_redefined(capsys):
+    run('fun len(s) { return 42; } print len("a");')
+    assert capsys.readouterr().out == "42\n"
+
+
+def test_functions_calling_natives_are_not_pure():
+    interpreter = run("fun f(x) { return sqrt(x); } print f(4);")
+    assert interpreter.interpreter.memos == {}
+
+
+def test_native_function():
+    native = NativeFunction("twice", lambda value: value * 2, 1)
+    assert native(2) == 4
+    assert native.call(None, [3]) == 6
+    assert repr(native) == "<native fn twice>"
+    with pytest.raises(LoxRuntimeError):
+        native.call(None, [])
+
+
+def test_library_arities():
+    for name, (function, arity) in LIBRARY.items():
+        assert function.__code__.co_argcount == arity, name
@@ -0,0 +1,195 @@
+import pathlib
+
+import pytest
+
+from .context import pylox
+
+from pylox.expr import Binary, Grouping, Literal, Variable
+from pylox.optimizer import CountedLoops, optimize
+from pylox.stmt import Block, CountedLoop, Expression, If, Print, While
+from pylox.tree import walk
+
+from .test_vm import PROGRAMS
+
+CONSTANTS = """
+print 60 * 60 * 24;
+print 1 + 2 - 3 / 4;
+print -(2 + 3);
+print "a" + "b" + 1;
+print 1 < 2; print 2 <= 1; print "a" < "b"; print 1 == 1.0; print nil != false;
+print !nil; print !"false"; print true and "yes"; print nil or "no";
+print 1 / 0;
+"""
+
+DEAD_BRANCHES = """
+if (true) print "then"; else print "else";
+if (1 > 2) print "then"; else print "else";
+if (nil) print "never";
+while (false) print "never";
+var a = 1;
+{ print a; { print a + 1; } }
+for (var i = 0; i < 3; i = i + 1) { print i; }
+for (var i = 0; i < 2; i = i + 1) { var j = i; fun get() { return j; } print get(); }
+fun f(n) { if (n < 1) { return "small"; } { return "big"; } }
+print f(0); print f(2);
+"""
+
+COUNTED = """
+fun total(n) { var sum = 0; for (var i = 0; i < n; i = i + 1) sum = sum + i; return sum; }
+print total(10);
+for (var i = 10; i > 0; i = i + -3) print i;
+for (var x = 0.5; x <= 2; x = x + 0.5) print x;
+fun first(limit) { for (var i = 0; i < 100; i = i + 1) if (i * i > limit) return i; }
+print first(50);
+{ var n = 0; while (n < 5) n = n + 2; print n; }
+{
+    var k = 0;
+    fun jump() { k = "a"; }
+    while (k != "a1") { if (k == 3) jump(); k = k + 1; }
+    print k;
+}
+{ var s = "a"; while (s != "a11") s = s + 1; print s; }
+"""
+
+# Counted loops whose body is a single declaration besides the increment
+COUNTED_DECLARATIONS = """
+{ var i = 0; while (i < 3) { var x = i * 2; i = i + 1; } var y = "after"; print y; }
+{
+    var s = "z";
+    for (var i = 0; i < 2; i = i + 1) { fun f() { return s; } }
+    var t = "zz";
+    print t;
+}
+"""
+
+SOURCES = dict(
+    PROGRAMS,
+    constants=CONSTANTS,
+    dead_branches=DEAD_BRANCHES,
+    counted=COUNTED,
+    counted_declarations=COUNTED_DECLARATIONS,
+)
+SOURCES.update(
+    (path.stem, path.read_text())
+    for path in sorted(pathlib.Path("examples").glob("*.lox"))
+    if not path.stem.startswith(("bad", "scoping"))
+)
+
+
+def front_end(source, optimized=True):
+    interpreter = pylox.LoxIntepreter(optimize=optimized)
+    statements = interpreter._front_end(source=source)
+    assert not interpreter.had_error
+    return statements
+
+
+def run(engine, source, capsys, optimized):
+    pylox.LoxIntepreter(engine=engine, optimize=optimized).run(source=source)
+    return capsys.readouterr().out
+
+
+@pytest.mark.parametrize("engine", pylox.pylox.ENGINES)
+@pytest.mark.parametrize("name", sorted(SOURCES))
+def test_output_is_unchanged(engine, name, capsys):
+    source = SOURCES[name]
+    expected = run(engine, source, capsys, optimized=False)
+    assert run(engine, source, capsys, optimized=True) == expected
+
+
+@pytest.mark.parametrize("engine", pylox.pylox.ENGINES)
+def test_counted_loops_keep_the_scope_of_declarations(engine, capsys):
+    assert run(engine, COUNTED_DECLARATIONS, capsys, optimized=True) == "after\nzz\n"
+
+
+class TestOptimizer:
+
+    def test_folds_constant_arithmetic(self):
+        expression = front_end("print 60 * 60 * 24;")[0].expression
+        assert isinstance(expression, Literal) and expression.value == 86400.0
+
+    def test_folds_string_concatenation(self):
+        assert front_end('print "a" + "b" + 1;')[0].expression.value == "ab1"
+
+    def test_folds_comparisons(self):
+        assert front_end("print 1 < 2 == (2 >= 3);")[0].expression.value is False
+
+    @pytest.mark.parametrize("source", ["print 1 / 0;", 'print 1 < "a";', 'print "x" - 1;', 'print -"a";'])
+    def test_leaves_runtime_errors_unfolded(self, source):
+        assert not isinstance(front_end(source)[0].expression, Literal)
+
+    def test_folds_around_variables(self):
+        expression = front_end("var a = 1; print a + (2 * 3);")[1].expression
+        assert isinstance(expression, Binary) and isinstance(expression.left, Variable)
+        assert expression.right.value == 6.0
+
+    def test_drops_groupings(self):
+        expression = front_end("var a; print (a);")[1].expression
+        assert isinstance(expression, Variable)
+        assert not isinstance(front_end("var a; print (a);", optimized=False)[1].expression, Variable)
+
+    def test_keeps_the_branch_taken(self):
+        statements = front_end('if (1 < 2) print "yes"; else print "no"; if (nil) print "never";')
+        assert len(statements) == 1
+        assert isinstance(statements[0], Print) and statements[0].expression.value == "yes"
+
+    def test_removes_while_false(self):
+        assert front_end("while (false) print 1;") == []
+
+    def test_splices_blocks_without_declarations(self):
+        statements = front_end("{ print 1; { print 2; } } { var a = 3; print a; }")
+        assert [type(statement) for statement in statements] == [Print, Print, Block]
+
+    def test_for_loop_body_runs_without_an_environment(self):
+        loop = front_end("for (var i = 0; i < 3; i = i + 1) { print i; }")[0]
+        body = loop.statements[1].statement
+        assert isinstance(body, Print)
+
+    def test_counts_for_loops(self):
+        loop = front_end("for (var i = 0; i < 3; i = i + 2) { var j = i; print j; }")[0].statements[1]
+        assert isinstance(loop, CountedLoop) and loop.step == 2
+        assert not loop.statement.flat
+        assert (loop.condition.left.depth, loop.increment.depth) == (0, 0)
+
+    @pytest.mark.parametrize(
+        "source",
+        [
+            "var i = 0; while (i < 3) i = i + 1;",
+            "{ var i = 0; while (i < 3) { i = i + 1; print i; } }",
+            "{ var i = 0; while (i < 3) { i = 2; i = i + 1; } }",
+            "{ var i = 0; while (i < 3) { fun i() {} i = i + 1; } }",
+            "{ var i = 0; while (i < 3) { fun f(i) {} i = i + 1; } }",
+            "{ var i = 0; while (i < 3) { var i = 1; i = i + 1; } }",
+            "{ var i = 0; while (i < (i = 3)) i = i + 1; }",
+            "{ var i = 0; while (i < 3) i = i * 2; }",
+            "{ var i = 0; while (i < 3) i = i + i; }",
+            "{ var i = 0; while (i == 3) i = i + 1; }",
+            "fun f() { var i = 0; while (i < 3) { yield i; i = i + 1; } }",
+        ],
+    )
+    def test_leaves_other_loops(self, source):
+        loops = [node for statement in front_end(source) for node in walk(statement)]
+        assert not any(isinstance(node, CountedLoop) for node in loops)
+        assert any(isinstance(node, While) for node in loops)
+
+    def test_counted_loops_run_alone(self):
+        statements = CountedLoops().optimize(front_end("{ var i = 0; while (i < 3) { print i; i = i + 1; } }", optimized=False))
+        assert isinstance(statements[0].statements[1], CountedLoop)
+
+    def test_reresolves_moved_variables(self):
+        statements = front_end("{ var a = 1; { { print a; } } }")
+        variable = statements[0].statements[1].expression
+        assert (variable.depth, variable.slot) == (0, 0)
+
+    def test_errors_in_dead_code_are_still_reported(self, capsys):
+        interpreter = pylox.LoxIntepreter()
+        interpreter.run(source="if (false) { var a = 1; var a = 2; }")
+        assert interpreter.had_error
+        assert "Compiler error" in capsys.readouterr().out
+
+    def test_optimize_runs_every_pass(self):
+        class Reverse:
+            def optimize(self, statements):
+                return statements[::-1]
+
+        statements = front_end("print 1; print 2;", optimized=False)
+        assert [statement.expression.value for statement in optimize(statements, passes=[Reverse])] == [2, 1]
@@ -1,10 +1,15 @@
+import pathlib
+
+import pytest
+
 from .context import pylox
 
-from pylox.expr import Literal, Binary, Unary, Variable
+from pylox.expr import Assign, Binary, Call, Grouping, Literal, Logical, Map, SetSubscript, Slice, Subscript, Unary, Variable
 from pylox.tokens import TokenType
-from pylox.scanner import LoxToken
-from pylox.parser import Parser
+from pylox.scanner import LoxScanner, LoxToken, RegexScanner
+from pylox.parser import Parser, TokenWindow
 from pylox.stmt import Expression, Stmt, Print, Function, Var
+from pylox.tree import ast_equal
 
 
 def create_number_token(value, line=1, offset=0):
@@ -41,7 +46,7 @@ class TestParser:
         expected = [Expression(expression=create_literal(value=value))]
         parser = pylox.Parser(tokens=tokens)
         expr = parser.parse()
-        assert expr == expected
+        assert ast_equal(expr, expected)
 
     def test_parses_equality(self):
         """
@@ -51,7 +56,7 @@ class TestParser:
         expected = [Expression(expression=Binary(left=create_literal(value=1), operator=create_token(type_=TokenType.BANG_EQUAL), right=create_literal(value=1)))]
         parser = Parser(tokens=tokens)
         expr = parser.parse()
-        assert expr == expected
+        assert ast_equal(expr, expected)
 
     def test_parses_comparison(self):
         """
@@ -61,7 +66,7 @@ class TestParser:
         expected = [Expression(expression=Binary(left=create_literal(value=1), operator=create_token(type_=TokenType.GREATER_EQUAL), right=create_literal(value=1)))]
         parser = Parser(tokens=tokens)
         expr = parser.parse()
-        assert expr == expected
+        assert ast_equal(expr, expected)
 
     def test_parses_term(self):
         """
@@ -71,7 +76,7 @@ class TestParser:
         expected = [Expression(expression=Binary(left=create_literal(value=1), operator=create_token(type_=TokenType.PLUS), right=create_literal(value=1)))]
         parser = Parser(tokens=tokens)
         expr = parser.parse()
-        assert expr == expected
+        assert ast_equal(expr, expected)
 
     def test_parses_factor(self):
         """
@@ -81,7 +86,7 @@ class TestParser:
         expected = [Expression(expression=Binary(left=create_literal(value=1), operator=create_token(type_=TokenType.STAR), right=create_literal(value=1)))]
         parser = Parser(tokens=tokens)
         expr = parser.parse()
-        assert expr == expected
+        assert ast_equal(expr, expected)
 
     def test_parses_unary(self):
         """
@@ -91,7 +96,7 @@ class TestParser:
         expected = [Expression(expression=Unary(operator=create_token(type_=TokenType.MINUS), right=create_literal(value=123)))]
         parser = Parser(tokens=tokens)
         expr = parser.parse()
-        assert expr == expected
+        assert ast_equal(expr, expected)
 
     def test_parses_primary(self):
         """
@@ -101,7 +106,7 @@ class TestParser:
         expected = [Expression(expression=create_literal(value=1))]
         parser = Parser(tokens=tokens)
         expr = parser.parse()
-        assert expr == expected
+        assert ast_equal(expr, expected)
 
     def test_parses_primary_string(self):
         """
@@ -111,7 +116,7 @@ class TestParser:
         expected = [Expression(expression=create_literal(value="imastring"))]
         parser = Parser(tokens=tokens)
         expr = parser.parse()
-        assert expr == expected
+        assert ast_equal(expr, expected)
     
     def test_parses_function(self):
         """
@@ -121,5 +126,186 @@ class TestParser:
         expected = [Function(name=Variable(name=LoxToken(type_=TokenType.IDENTIFIER, lexeme='myFun', literal=None, line=1, offset=0)), body=[], params=[])]
         parser = Parser(tokens=tokens)
         expr = parser.parse()
-        assert expr == expected
+        assert ast_equal(expr, expected)
+
+
+
+class TestNodes:
+
+    """
+    Tests for the generated syntax tree classes and pylox.tree
+    """
+
+    def test_nodes_compare_by_identity(self):
+        """
+        Ensure that structurally equal nodes are distinct dictionary keys
+        """
+        first, second = create_literal(value=1), create_literal(value=1)
+        assert first != second
+        assert len({first: 1, second: 2}) == 2
+
+    def test_ast_equal_compares_fields(self):
+        """
+        Ensure that ast_equal walks both trees and ignores resolver annotations
+        """
+        left = Variable(name=create_identifier('a'))
+        right = Variable(name=create_identifier('a'))
+        left.depth, left.slot = 0, 1
+        assert ast_equal([Print(expression=left)], [Print(expression=right)])
+        assert not ast_equal(left, Variable(name=create_identifier('b')))
+        assert not ast_equal([left], [left, right])
+
+    def test_nodes_have_no_instance_dict(self):
+        assert not hasattr(create_literal(value=1), '__dict__')
+
+
+class TestTokenWindow:
+
+    """
+    Tests for pylox.parser.TokenWindow
+    """
+
+    def test_parses_lazily_pulled_tokens(self):
+        """
+        Ensure that the parser gives the same statements for a window as for a list
+        """
+        tokens = [create_token(TokenType.PRINT), create_number_token(value=1), create_token(TokenType.SEMICOLON)] * 3
+        expected = pylox.Parser(tokens=tokens).parse()
+        assert ast_equal(pylox.Parser(tokens=TokenWindow(iter(tokens))).parse(), expected)
+
+    def test_keeps_the_previous_token_only(self):
+        window = TokenWindow(create_number_token(value=i) for i in range(5))
+        assert window[0].literal == 0
+        assert window[3].literal == 3
+        assert window[2].literal == 2
+        with pytest.raises(IndexError):
+            window[1]
+        with pytest.raises(IndexError):
+            window[5]
+
+    def test_declarations_are_yielded_one_at_a_time(self):
+        def tokens():
+            yield from [create_token(TokenType.PRINT), create_number_token(value=1), create_token(TokenType.SEMICOLON)]
+            # The parser looks one token ahead
+            yield create_token(TokenType.PRINT)
+            raise AssertionError("read past the first declaration")
+
+        declarations = pylox.Parser(tokens=TokenWindow(tokens())).parse_declarations()
+        assert isinstance(next(declarations), Print)
+
+
+def test_parses_token_buffer_like_token_list():
+    """
+    Ensure that parsing a TokenBuffer gives the statements of parsing the list of its tokens
+    """
+    source = pathlib.Path("examples/fib.lox").read_text()
+    expected = Parser(tokens=LoxScanner(source=source).scan_tokens()).parse()
+    assert ast_equal(Parser(tokens=RegexScanner(source=source).scan_buffer()).parse(), expected)
+
+
+def parse_expression(source):
+    return Parser(tokens=RegexScanner(source=f"{source};").scan_buffer()).parse()[0].expression
+
+
+class TestPrecedence:
+
+    """
+    Tests for the precedence climbing expression parser
+    """
+
+    def test_binds_factors_tighter_than_terms(self):
+        expr = parse_expression("1 + 2 * 3 - 4")
+        assert isinstance(expr, Binary) and expr.operator.lexeme == '-'
+        assert expr.left.operator.lexeme == '+'
+        assert expr.left.right.operator.lexeme == '*'
+
+    def test_nests_and_to_the_right_and_or_to_the_left(self):
+        expr = parse_expression("a and b and c or d or e")
+        assert isinstance(expr, Logical) and expr.operator == TokenType.OR
+        assert expr.left.operator == TokenType.OR
+        and_chain = expr.left.left
+        assert and_chain.operator == TokenType.AND
+        assert isinstance(and_chain.left, Variable)
+        assert and_chain.right.operator == TokenType.AND
+
+    def test_assignment_is_right_associative(self):
+        expr = parse_expression("a = b = c")
+        assert isinstance(expr, Assign) and expr.assign_to.lexeme == 'a'
+        assert isinstance(expr.to_assign, Assign) and expr.to_assign.assign_to.lexeme == 'b'
+
+    def test_assignment_targets_the_token_before_equal(self):
+        expr = parse_expression("x = 1 + y = 2")
+        assert expr.assign_to.lexeme == 'x'
+        assert expr.to_assign.assign_to.lexeme == 'y'
+
+    def test_parses_calls_groupings_and_unaries(self):
+        expr = parse_expression("-f(1)(2, (3))()")
+        assert isinstance(expr, Unary)
+        call = expr.right
+        assert isinstance(call, Call) and call.arguments == []
+        assert isinstance(call.callee.arguments[1], Grouping)
+        assert isinstance(call.callee.callee.callee, Variable)
+
+    def test_parses_subscripts_and_slices(self):
+        expr = parse_expression("f(a)[i + 1][1:n - 1][:2]")
+        assert isinstance(expr, Slice) and expr.start is None
+        assert expr.stop.value == 2
+        assert isinstance(expr.object, Slice)
+        assert expr.object.start.value == 1 and isinstance(expr.object.stop, Binary)
+        subscript = expr.object.object
+        assert isinstance(subscript, Subscript) and isinstance(subscript.index, Binary)
+        assert isinstance(subscript.object, Call)
+
+    @pytest.mark.parametrize('source, start, stop', [
+        ("a[:]", False, False),
+        ("a[1:]", True, False),
+        ("a[:1]", False, True),
+        ("a[(1):1]", True, True),
+    ])
+    def test_slice_bounds_are_optional(self, source, start, stop):
+        expr = parse_expression(source)
+        assert isinstance(expr, Slice)
+        assert (expr.start is not None, expr.stop is not None) == (start, stop)
+
+    def test_assignment_to_subscript(self):
+        expr = parse_expression("a[0] = b[1] = c")
+        assert isinstance(expr, SetSubscript) and expr.index.value == 0
+        assert isinstance(expr.value, SetSubscript)
+        assert isinstance(expr.value.value, Variable)
+
+    def test_parses_maps(self):
+        expr = parse_expression('x = {"a": 1, b: {}, }["a"]').to_assign
+        assert isinstance(expr, Subscript) and isinstance(expr.object, Map)
+        table = expr.object
+        assert [key.__class__ for key in table.keys] == [Literal, Variable]
+        assert table.values[0].value == 1
+        assert isinstance(table.values[1], Map) and table.values[1].keys == []
+
+    def test_braces_start_blocks_in_statements(self):
+        (block,) = Parser(tokens=RegexScanner(source="{ 1; }").scan_buffer()).parse()
+        assert block.statements[0].expression.value == 1
+
+    @pytest.mark.parametrize('source', ["x = {1}", "x = {1: 2 3: 4}", "x = {1: 2"])
+    def test_reports_malformed_maps(self, source):
+        with pytest.raises(pylox.parser.ParserError):
+            parse_expression(source)
+
+    def test_reports_an_unclosed_subscript(self):
+        with pytest.raises(pylox.parser.ParserError):
+            parse_expression("a[1:2")
+
+    def test_reports_a_missing_operand(self):
+        with pytest.raises(pylox.parser.ParserError):
+            parse_expression("1 + ")
 
+    @pytest.mark.parametrize('source', [
+        " and ".join(["a"] * 20000),
+        " + ".join(["1"] * 20000),
+        "(" * 20000 + "1" + ")" * 20000,
+        "-" * 20000 + "1",
+        "f(" * 20000 + "1" + ")" * 20000,
+        "a[" * 20000 + "1" + "]" * 20000,
+        "x = " + "{1: " * 20000 + "1" + "}" * 20000,
+    ])
+    def test_long_and_deep_expressions_do_not_recurse(self, source):
+        assert parse_expression(source) is not None
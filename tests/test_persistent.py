@@ -0,0 +1,156 @@
+import random
+
+import pytest
+
+from .helpers import run
+from .context import pylox
+from pylox.persistent import PersistentMap, PersistentVector
+
+ENGINES = pylox.pylox.ENGINES
+
+
+class Key:
+    """A key whose hash is chosen, to force collisions"""
+
+    def __init__(self, value, hash_):
+        self.value = value
+        self.hash = hash_
+
+    def __hash__(self):
+        return self.hash
+
+    def __eq__(self, other):
+        return type(other) is Key and other.value == self.value
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_versions_share_nothing_visible(engine, capsys):
+    source = """
+    var empty = pmap();
+    var one = assoc(empty, "a", 1);
+    var two = assoc(one, "b", 2);
+    var changed = assoc(two, "a", 10);
+    print len(empty) + len(one) + len(two);
+    print one["a"] + two["a"] + changed["a"];
+    print has(one, "b");
+    print get(dissoc(two, "b"), "b");
+    var v = push(push(pvec(), "x"), "y");
+    var w = assoc(v, 0, "z");
+    print v[0] + w[0] + w[-1];
+    print pop(w);
+    print len(keys(two));
+    """
+    run(source, engine)
+    assert capsys.readouterr().out.splitlines() == [
+        "3",
+        "12",
+        "False",
+        "None",
+        "xzy",
+        "[z]",
+        "2",
+    ]
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_history_of_a_state_map(engine, capsys):
+    source = """
+    var history = pvec();
+    var state = pmap();
+    var i = 0;
+    while (i < 2000) {
+        state = assoc(state, "k" + floor(i - floor(i / 10) * 10), i);
+        history = push(history, state);
+        i = i + 1;
+    }
+    print len(history);
+    print history[5]["k5"];
+    print history[-1]["k5"];
+    """
+    run(source, engine)
+    assert capsys.readouterr().out == "2000\n5\n1995\n"
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+@pytest.mark.parametrize(
+    "source, message",
+    [
+        ('var m = pmap(); m["a"] = 1;', "Persistent values cannot be changed"),
+        ("print pvec()[0];", "Vector index 0 is out of range for length 0"),
+        ("print assoc(pvec(), 1, 1);", "assoc: index 1 is out of range for length 0"),
+        ("print pop(pvec());", "pop: pop from an empty vector"),
+        ("print push({}, 1);", "push expects a persistent value"),
+        ("print assoc(pmap(), pvec(), 1);", "Map keys should be numbers"),
+    ],
+)
+def test_errors(engine, source, message, capsys):
+    interpreter = run(source, engine)
+    engine_ = interpreter.vm if engine == "vm" else interpreter.interpreter
+    assert engine_.had_runtime_error
+    output = capsys.readouterr().out
+    assert output.startswith(message) and "@ [line 1]" in output
+
+
+@pytest.mark.parametrize("buckets", [None, 3])
+def test_map_matches_dict(buckets, monkeypatch):
+    # Keys are checked by pylox.maps.map_key, which refuses the test keys
+    monkeypatch.setattr("pylox.persistent.map_key", lambda key: key)
+    rng = random.Random(buckets)
+    table, expected = PersistentMap(), {}
+    versions = []
+    for step in range(2000):
+        value = rng.randrange(500)
+        key = Key(value, value % buckets if buckets else hash(str(value)))
+        if rng.random() < 0.7:
+            table = table.assoc(key, step)
+            expected[key] = step
+        else:
+            table = table.dissoc(key)
+            expected.pop(key, None)
+        if step % 100 == 0:
+            versions.append((table, dict(expected)))
+    versions.append((table, expected))
+    for table, expected in versions:
+        assert len(table) == len(expected)
+        assert dict(table.entries()) == expected
+        assert all(table.get(key) == value for key, value in expected.items())
+
+
+def test_vector_matches_list():
+    rng = random.Random(0)
+    vector, expected = PersistentVector(), []
+    versions = []
+    for step in range(5000):
+        choice = rng.random()
+        if choice < 0.6 or not expected:
+            vector = vector.push(step)
+            expected.append(step)
+        elif choice < 0.8:
+            index = rng.randrange(len(expected))
+            vector = vector.assoc(index, -step)
+            expected[index] = -step
+        else:
+            vector = vector.pop()
+            expected.pop()
+        if step % 250 == 0:
+            versions.append((vector, list(expected)))
+    versions.append((vector, expected))
+    for vector, expected in versions:
+        assert list(vector) == expected
+        assert [vector.nth(index) for index in range(len(expected))] == expected
+
+
+def test_updates_share_structure():
+    vector = PersistentVector()
+    for value in range(40000):
+        vector = vector.push(value)
+    changed = vector.assoc(0, "first")
+    assert changed.tail is vector.tail
+    assert (
+        sum(a is b for a, b in zip(changed.root, vector.root)) == len(vector.root) - 1
+    )
+    table = PersistentMap()
+    for value in range(40000):
+        table = table.assoc(value, value)
+    assert table.assoc(0, 0) is table
+    assert table.dissoc("missing") is table
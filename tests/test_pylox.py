@@ -1,3 +1,5 @@
+import pathlib
+
 import pytest
 
 from .context import pylox
@@ -79,3 +81,55 @@ def test_print_statements(interpreter):
     source = "print 1;\nprint 2;"
     interpreter.run(source=source)
     assert not interpreter.had_error
+
+
+def chunked(source, size):
+    return [source[i:i + size] for i in range(0, len(source), size)]
+
+
+@pytest.mark.parametrize("engine", pylox.pylox.ENGINES)
+def test_stream_matches_run(engine, capsys):
+    """
+    Ensure that streaming a file prints what running it all at once prints
+    """
+    source = pathlib.Path("examples/fib.lox").read_text()
+    pylox.LoxIntepreter(engine=engine).run(source=source)
+    expected = capsys.readouterr().out
+    pylox.LoxIntepreter(engine=engine).run_stream(chunks=chunked(source, 7))
+    assert capsys.readouterr().out == expected
+
+
+def test_stream_executes_before_parsing_everything(capsys):
+    interpreter = pylox.LoxIntepreter()
+    interpreter.run_stream(chunks=["print 1;\nprint 2;\n", "print (;\n", "print 3;\n"])
+    output = capsys.readouterr().out
+    assert output.startswith("1\n2\n")
+    assert "Compiler error" in output
+    assert "3" not in output.split("Compiler error")[1]
+    assert interpreter.had_error
+
+
+def test_stream_stops_at_runtime_error(capsys):
+    interpreter = pylox.LoxIntepreter(engine="vm")
+    interpreter.run_stream(chunks=['print 1;\nprint -"a";\nprint 2;\n'])
+    output = capsys.readouterr().out.splitlines()
+    assert output[0] == "1"
+    assert output[1].endswith("@ [line 2]")
+    assert len(output) == 2
+
+
+def test_run_file_can_stream(interpreter, capsys):
+    interpreter.run_file(file="examples/test_script.lox")
+    expected = capsys.readouterr().out
+    pylox.LoxIntepreter().run_file(file="examples/test_script.lox", stream=True)
+    assert capsys.readouterr().out == expected
+
+
+@pytest.mark.parametrize("engine", pylox.pylox.ENGINES)
+def test_return_outside_function_is_compiler_error(engine, capsys):
+    interpreter = pylox.LoxIntepreter(engine=engine)
+    interpreter.run_file(file="examples/bad_return.lox")
+    assert capsys.readouterr().out == (
+        "Compiler error: Cannot return outside of a function\n"
+    )
+    assert interpreter.had_error
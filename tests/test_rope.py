@@ -0,0 +1,66 @@
+import pytest
+
+from .context import pylox
+from pylox.rope import ROPE_MINIMUM, Rope, concat
+
+ENGINES = pylox.pylox.ENGINES
+
+LONG = "x" * ROPE_MINIMUM
+
+
+def test_short_results_are_strings():
+    assert concat("a", 1) == "a1"
+    assert type(concat("a", None)) is str
+
+
+def test_long_results_are_ropes():
+    rope = concat(LONG, 1)
+    assert type(rope) is Rope
+    assert len(rope) == ROPE_MINIMUM + 1
+    assert str(rope) == LONG + "1"
+
+
+def test_appending_in_a_loop_shares_pieces():
+    rope = concat(LONG, "")
+    for i in range(100):
+        rope = concat(rope, i)
+    assert str(rope) == LONG + "".join(map(str, range(100)))
+
+
+def test_ropes_never_change():
+    base = concat(LONG, "a")
+    first = concat(base, "b")
+    second = concat(base, "c")
+    assert str(second) == LONG + "ac"
+    assert str(first) == LONG + "ab"
+    assert str(base) == LONG + "a"
+    assert str(concat(first, "d")) == LONG + "abd"
+
+
+def test_ropes_compare_and_hash_like_strings():
+    rope = concat(LONG, "a")
+    assert rope == LONG + "a" and LONG + "a" == rope
+    assert rope != LONG + "b"
+    assert rope == concat(LONG, "a")
+    assert {LONG + "a": 1}[rope] == 1
+    assert rope < LONG + "b" and LONG + "b" > rope
+    assert rope != None
+    assert repr(rope) == repr(LONG + "a")
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_building_a_report(engine, capsys):
+    source = """
+    var report = "";
+    var i = 0;
+    while (i < 200) { report = report + "line " + i + "\n"; i = i + 1; }
+    var copy = report + "";
+    print len(report);
+    print report == copy;
+    print substr(report, 0, 7);
+    print report + "end";
+    """
+    pylox.LoxIntepreter(engine=engine).run(source)
+    report = "".join(f"line {i}\n" for i in range(200))
+    expected = f"{len(report)}\nTrue\nline 0\n\n{report}end\n"
+    assert capsys.readouterr().out == expected
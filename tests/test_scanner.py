@@ -1,7 +1,9 @@
 
+import pathlib
+
 import pytest
 
-from pylox.scanner import LoxScanner, LoxToken, UnterminatedLine
+from pylox.scanner import LoxScanner, LoxToken, RegexScanner, TokenNotRecognised, UnterminatedLine, stream_tokens
 from pylox.scanner import TokenType, is_digit, is_alpha
 
 def test_scans_empty():
@@ -417,3 +419,110 @@ class TestKeywords:
         scanner = LoxScanner(source=source)
         tokens = scanner.scan_tokens()
         assert tokens == [LoxToken(offset=0, type_=TokenType.EOF, lexeme='eof', literal=None, line=1)]
+
+
+SOURCES = [
+    "",
+    "var a = 1;\nvar b = 2.5;\nprint a + b; // trailing comment\n",
+    "fun f(x) {\n\treturn x <= 2 and x >= 0 or !x != nil;\n}\r\n",
+    "1. .5 1.2.3 123abc _a1 a_b while1",
+    '"one\ntwo" + "three";\nprint "four";',
+    "eof true false this super class",
+    "a/b//c\n/d",
+    "==!<>=(){},.-+;*/",
+    "a[i:j] = b[:];",
+    "for (x in items) yield x; index inside",
+]
+
+
+@pytest.mark.parametrize("source", SOURCES)
+def test_regex_scanner_matches_scanner(source):
+    """
+    Ensure that RegexScanner produces exactly the tokens of LoxScanner
+    """
+    expected = LoxScanner(source=source).scan_tokens()
+    assert RegexScanner(source=source).scan_tokens() == expected
+
+
+@pytest.mark.parametrize("source, exception", [
+    ('print 1;\n"never\nclosed', UnterminatedLine),
+    ("var a = 1;\nvar b = @;", TokenNotRecognised),
+    ("a\n\x0c", TokenNotRecognised),
+])
+def test_regex_scanner_reports_the_same_errors(source, exception, capsys):
+    scanner = LoxScanner(source=source)
+    with pytest.raises(exception) as expected:
+        scanner.scan_tokens()
+    expected_output = capsys.readouterr().out
+
+    regex_scanner = RegexScanner(source=source)
+    with pytest.raises(exception) as actual:
+        regex_scanner.scan_tokens()
+    assert capsys.readouterr().out == expected_output
+    assert str(actual.value) == str(expected.value)
+    assert regex_scanner.tokens == scanner.tokens
+
+
+def test_regex_scanner_scans_examples():
+    for path in pathlib.Path("examples").glob("*.lox"):
+        source = path.read_text()
+        assert RegexScanner(source=source).scan_tokens() == LoxScanner(source=source).scan_tokens()
+
+
+@pytest.mark.parametrize("size", [1, 2, 5, 64])
+@pytest.mark.parametrize("source", SOURCES)
+def test_stream_tokens_matches_regex_scanner(source, size):
+    """
+    Ensure that scanning in chunks gives the tokens of scanning all at once
+    """
+    chunks = [source[i:i + size] for i in range(0, len(source), size)]
+    assert list(stream_tokens(chunks)) == RegexScanner(source=source).scan_tokens()
+
+
+def test_stream_tokens_reports_unterminated_string(capsys):
+    source = 'print 1;\n"never\nclosed'
+    with pytest.raises(UnterminatedLine):
+        RegexScanner(source=source).scan_tokens()
+    expected = capsys.readouterr().out
+    with pytest.raises(UnterminatedLine):
+        list(stream_tokens([source[:10], source[10:]]))
+    assert capsys.readouterr().out == expected
+
+
+def test_stream_tokens_yields_complete_lines_first():
+    tokens = stream_tokens(["print 1;\nprint", " 2;"])
+    assert [next(tokens).lexeme for _ in range(3)] == ["print", "1", ";"]
+
+
+@pytest.mark.parametrize("source", SOURCES)
+def test_token_buffer_views_match_tokens(source):
+    """
+    Ensure that the LoxToken views of a TokenBuffer are the tokens of LoxScanner
+    """
+    buffer = RegexScanner(source=source).scan_buffer()
+    assert list(buffer) == LoxScanner(source=source).scan_tokens()
+    assert len(buffer) == len(buffer.kinds) == len(buffer.starts) == len(buffer.lines)
+
+
+def test_token_buffer_materializes_lexemes_and_literals():
+    buffer = RegexScanner(source='var a = 1.5;\nprint "b" + 2;').scan_buffer()
+    assert [buffer.lexeme(i) for i in range(len(buffer))] == ['var', 'a', '=', '1.5', ';', 'print', '"b"', '+', '2', ';']
+    assert buffer.literal(3) == 1.5
+    assert buffer.literal(6) == 'b'
+    assert buffer.literal(8) == 2
+    assert buffer.literal(1) is None
+    assert buffer.kind(1) == TokenType.IDENTIFIER
+    assert buffer.line(6) == 2
+
+
+def test_token_buffer_past_the_end():
+    buffer = RegexScanner(source='print 1;').scan_buffer()
+    assert buffer.kind(3) == TokenType.EOF
+    assert buffer.line(3) is None
+    with pytest.raises(IndexError):
+        buffer[3]
+
+
+def test_token_kinds_are_small_ints():
+    assert all(0 <= kind < 256 for kind in TokenType.NAMES)
+    assert TokenType.NAMES[TokenType.PLUS] == 'PLUS'
@@ -0,0 +1,83 @@
+import io
+
+import pytest
+
+from .context import pylox
+
+from pylox import tracing
+
+
+@pytest.fixture(autouse=True)
+def _reset_tracing():
+    tracing.disable()
+    yield
+    tracing.disable()
+
+
+def test_nothing_is_recorded_when_disabled():
+    pylox.LoxIntepreter().run(source="fun f(a) { return a; } print f(1);")
+    assert tracing.records() == []
+
+
+def test_enabled_categories_are_recorded():
+    tracing.enable("resolver,calls")
+    pylox.LoxIntepreter().run(source="fun f(a) { return a; } print f(1);")
+    records = tracing.records()
+    assert "[calls] call f args=[1]" in records
+    assert "[resolver] local a line=1 depth=0 slot=0" in records
+    assert not any(record.startswith("[env]") for record in records)
+
+
+def test_all_enables_every_category():
+    tracing.enable("all")
+    assert tracing.SCANNER and tracing.RESOLVER and tracing.ENV and tracing.CALLS
+
+
+def test_unknown_category_raises():
+    with pytest.raises(tracing.TracingError):
+        tracing.enable("scanner,bogus")
+
+
+def test_buffer_keeps_the_latest_records():
+    tracing.enable("env")
+    for i in range(tracing.BUFFER_SIZE + 5):
+        tracing.trace("env", "record %s", i)
+    records = tracing.records()
+    assert len(records) == tracing.BUFFER_SIZE
+    assert records[-1] == f"[env] record {tracing.BUFFER_SIZE + 4}"
+
+
+def test_flush_writes_and_clears():
+    tracing.enable("scanner")
+    tracing.trace("scanner", "token %r", "a")
+    stream = io.StringIO()
+    tracing.flush(stream)
+    assert stream.getvalue() == "[scanner] token 'a'\n"
+    assert tracing.records() == []
+
+
+def test_runtime_errors_flush_the_buffer(capsys):
+    tracing.enable("calls")
+    pylox.LoxIntepreter(engine="vm").run(source="fun f() { return -nil; } f();")
+    captured = capsys.readouterr()
+    assert "[calls] call <fn f> args=[]" in captured.err
+    assert tracing.records() == []
+
+
+def test_tracing_calls_keeps_tail_calls_and_memos(capsys):
+    tracing.enable("calls")
+    interpreter = pylox.LoxIntepreter()
+    interpreter.run(
+        source="""
+        fun loop(n) { if (n == 0) return "done"; return loop(n - 1); }
+        print loop(5000);
+        fun square(x) { return x * x; }
+        print square(3) + square(3);
+        """
+    )
+    assert capsys.readouterr().out.split() == ["done", "18.0"]
+    records = tracing.records()
+    assert records[-2:] == [
+        "[calls] call loop args=[0.0]",
+        "[calls] call square args=[3]",
+    ]
@@ -0,0 +1,132 @@
+import subprocess
+import sys
+
+import pytest
+
+from .context import pylox
+from .test_vm import PROGRAMS, run
+
+from pylox.transpiler import Transpiler
+
+
+@pytest.mark.parametrize("name", sorted(PROGRAMS))
+def test_transpiled_program_matches_tree_walker(name, capsys):
+    """
+    Ensure that the transpiled program prints exactly what the tree-walking interpreter prints
+    """
+    source = PROGRAMS[name]
+    assert run("python", source, capsys) == run("ast", source, capsys)
+
+
+def test_runtime_error_reports_line(capsys):
+    source = 'var a = 1;\n\nprint a - "b";\nprint "unreachable";'
+    output = run("python", source, capsys)
+    assert output.startswith("Operands for - should be int or float")
+    assert "@ [line 3]" in output
+    assert "unreachable" not in output
+
+
+def test_undefined_variable(capsys):
+    output = run("python", "print 1;\nprint missing;", capsys)
+    assert output == "1\nToken missing is not defined @ [line 2]\n"
+
+
+def test_assigning_undeclared_global(capsys):
+    output = run("python", "missing = 1;", capsys)
+    assert (
+        output == "Variable 'missing' is accessed but it was never defined @ [line 1]\n"
+    )
+
+
+def test_globals_survive_between_runs(capsys):
+    interpreter = pylox.LoxIntepreter(engine="python")
+    interpreter.run(source="var a = 41;")
+    interpreter.run(source="a = a + 1; print a;")
+    assert capsys.readouterr().out == "42\n"
+
+
+def test_locals_become_python_locals():
+    """
+    Ensure that shadowed LOX locals get distinct python names
+    """
+    scanner = pylox.scanner.LoxScanner(
+        source="{ var a = 1; { var a = 2; print a; } print a; }"
+    )
+    statements = pylox.Parser(tokens=scanner.scan_tokens()).parse()
+    source = Transpiler().transpile(statements)
+    assert "l1_a = 1" in source
+    assert "l2_a = 2" in source
+    assert "print(l2_a)" in source
+
+
+def test_compile_command_writes_runnable_module(tmp_path):
+    script = tmp_path / "script.lox"
+    script.write_text(
+        'fun greet(name) { return "Hello " + name; }\nprint greet("World");\n'
+    )
+    output = tmp_path / "script_lox.py"
+
+    subprocess.run(
+        [sys.executable, "-m", "pylox", "compile", str(script), "-o", str(output)],
+        check=True,
+    )
+    result = subprocess.run(
+        [sys.executable, str(output)],
+        check=True,
+        capture_output=True,
+        text=True,
+        env={"PYTHONPATH": str(pylox.__path__[0] + "/..")},
+    )
+    assert result.stdout == "Hello World\n"
+
+
+@pytest.fixture
+def deep_recursion():
+    # The front end walks a chain of 500 operations recursively
+    limit = sys.getrecursionlimit()
+    sys.setrecursionlimit(10000)
+    yield
+    sys.setrecursionlimit(limit)
+
+
+@pytest.mark.parametrize("engine", pylox.pylox.ENGINES)
+def test_long_chains_of_operations(engine, deep_recursion, capsys):
+    terms = " + ".join(["x"] * 500)
+    comparisons = " == ".join(["x < 2"] * 300)
+    source = f"var x = 1; print {terms}; print ({terms}) - x; print {comparisons};"
+    assert run(engine, source, capsys) == "500\n499.0\nTrue\n"
+
+
+def test_programs_python_cannot_compile(deep_recursion, capsys, tmp_path):
+    source = "var x = 1; print " + " + (".join(["x"] * 250) + ")" * 249 + ";"
+    assert run("ast", source, capsys) == "250\n"
+    message = "Compiler error: Cannot transpile the program to python: "
+    assert run("python", source, capsys).startswith(message)
+
+    script = tmp_path / "nested.lox"
+    script.write_text(source)
+    interpreter = pylox.LoxIntepreter()
+    assert interpreter.compile_file(script) is None
+    assert capsys.readouterr().out.startswith(message)
+    assert not (tmp_path / "nested_lox.py").exists()
+
+
+@pytest.mark.parametrize("engine", pylox.pylox.ENGINES)
+@pytest.mark.parametrize(
+    "call, message",
+    [
+        ("f(1, 2, 3)", "Expected 2 arguments but got 3"),
+        ("f(1)", "Expected 2 arguments but got 1"),
+        ("g()(1)", "Expected 2 arguments but got 1"),
+    ],
+)
+def test_arity_is_checked(engine, call, message, capsys):
+    source = f"fun f(a, b) {{ return a; }}\nfun g() {{ return f; }}\nprint {call};"
+    assert run(engine, source, capsys) == f"{message} @ [line 3]\n"
+
+
+@pytest.mark.parametrize("engine", pylox.pylox.ENGINES)
+@pytest.mark.parametrize("callee", ['"a"', "1", "(1)", "nil"])
+def test_calling_a_literal_reports_its_line(engine, callee, capsys):
+    source = f"print 1;\n\nprint {callee}(\n2);"
+    assert run(engine, source, capsys) == "1\nyou can only call functions @ [line 4]\n"
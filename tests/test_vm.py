@@ -0,0 +1,118 @@
+import pytest
+
+from .context import pylox
+
+from pylox.compiler import Compiler, OpCode
+
+
+PROGRAMS = {
+    "arithmetic": 'print 1 + 2; print 7 - 2; print 3 * 4; print 1 / 4; print -3; print "a" + 1;',
+    "comparison": "print 1 < 2; print 2 <= 1; print 3 > 2; print 3 >= 4; print 1 == 1; print 1 != 1;",
+    "logical": 'print nil or "yes"; print false and "no"; print !true; print "a" and "b";',
+    "globals": "var a = 1; var b; a = a + 1; print a; print b;",
+    "blocks": 'var a = "global"; { var a = "outer"; { var a = "inner"; print a; } print a; } print a;',
+    "if_else": 'if (1 < 2) print "then"; else print "else"; if (nil) print "then"; else print "else";',
+    "while": "var i = 0; while (i < 3) { print i; i = i + 1; }",
+    "for": "for (var i = 0; i < 3; i = i + 1) print i;",
+    "functions": "fun add(a, b) { return a + b; } print add(1, 2); fun nothing() { return; } print nothing();",
+    "recursion": "fun fib(n) { if (n <= 1) return n; return fib(n - 2) + fib(n - 1); } print fib(15);",
+    "closures": """
+        fun makeCounter() {
+            var i = 0;
+            fun count() { i = i + 1; return i; }
+            return count;
+        }
+        var counter = makeCounter();
+        counter();
+        print counter();
+    """,
+    "closure_per_iteration": """
+        var first;
+        var second;
+        for (var i = 0; i < 2; i = i + 1) {
+            var j = i;
+            fun get() { return j; }
+            if (i == 0) first = get; else second = get;
+        }
+        print first();
+        print second();
+    """,
+    "shared_upvalue": """
+        fun pair() {
+            var value = "before";
+            fun set() { value = "after"; }
+            fun get() { return value; }
+            set();
+            print get();
+        }
+        pair();
+    """,
+    "scoping": 'var a = "global"; { fun showA() { print a; } showA(); var a = "block"; showA(); }',
+}
+
+
+def run(engine, source, capsys):
+    interpreter = pylox.LoxIntepreter(engine=engine)
+    interpreter.run(source=source)
+    return capsys.readouterr().out
+
+
+@pytest.mark.parametrize("name", sorted(PROGRAMS))
+def test_vm_matches_tree_walker(name, capsys):
+    """
+    Ensure that the VM prints exactly what the tree-walking interpreter prints
+    """
+    source = PROGRAMS[name]
+    assert run("vm", source, capsys) == run("ast", source, capsys)
+
+
+def test_rejects_unknown_engine():
+    with pytest.raises(pylox.LoxException):
+        pylox.LoxIntepreter(engine="jit")
+
+
+def test_runtime_error_reports_line(capsys):
+    source = 'var a = 1;\n\nprint a - "b";\nprint "unreachable";'
+    output = run("vm", source, capsys)
+    assert "@ [line 3]" in output
+    assert "unreachable" not in output
+
+
+def test_undefined_variable(capsys):
+    output = run("vm", "print missing;", capsys)
+    assert output == "Token missing is not defined @ [line 1]\n"
+
+
+def test_arity_is_checked(capsys):
+    output = run("vm", "fun f(a) { return a; }\nf(1, 2);", capsys)
+    assert output == "Expected 1 arguments but got 2 @ [line 2]\n"
+
+
+def test_deep_recursion_does_not_use_python_stack(capsys):
+    source = "fun down(n) { if (n == 0) return 0; return down(n - 1); } print down(5000);"
+    assert run("vm", source, capsys) == "0\n"
+
+
+def test_globals_survive_between_runs(capsys):
+    interpreter = pylox.LoxIntepreter(engine="vm")
+    interpreter.run(source="var a = 41;")
+    interpreter.run(source="print a + 1;")
+    assert capsys.readouterr().out == "42\n"
+
+
+class TestCompiler:
+    """
+    Tests for pylox.compiler.Compiler
+    """
+
+    def test_deduplicates_constants(self):
+        """
+        Ensure that repeated constants share one slot in the constant pool
+        """
+        scanner = pylox.scanner.LoxScanner(source="print 1 + 1;")
+        statements = pylox.Parser(tokens=scanner.scan_tokens()).parse()
+        function = Compiler().compile(statements)
+        assert function.chunk.constants == [1]
+        assert function.chunk.code == [
+            OpCode.CONSTANT, 0, OpCode.CONSTANT, 0, OpCode.ADD, OpCode.PRINT, OpCode.NIL, OpCode.RETURN
+        ]